@@ -0,0 +1,93 @@
+"""
+Output script utilities for Bitcoin addresses.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import base58
+import bech32
+
+# Constants for version bytes
+P2PKH_VERSION_BYTE = 0x00  # Mainnet P2PKH
+P2SH_VERSION_BYTE = 0x05   # Mainnet P2SH
+
+# Checksum constant of bech32m (BIP350), used by witness version 1+ addresses
+BECH32M_CONST = 0x2bc830a3
+
+
+def _decode_bech32m(address: str) -> Tuple[Optional[int], Optional[List[int]]]:
+    """
+    Decode a bech32m (taproot) segwit address.
+
+    The bech32 package only verifies the original bech32 checksum, so witness
+    version 1+ addresses are verified here.
+
+    Args:
+        address: The segwit address
+
+    Returns:
+        Tuple of (witness version, witness program) or (None, None) if invalid
+    """
+    address = address.lower()
+    pos = address.rfind('1')
+    if pos < 1 or pos + 7 > len(address) or address[:pos] != 'bc':
+        return None, None
+
+    data = [bech32.CHARSET.find(c) for c in address[pos + 1:]]
+    if -1 in data:
+        return None, None
+
+    if bech32.bech32_polymod(bech32.bech32_hrp_expand('bc') + data) != BECH32M_CONST:
+        return None, None
+
+    witver = data[0]
+    witprog = bech32.convertbits(data[1:-6], 5, 8, False)
+    if witprog is None or witver < 1 or witver > 16 or len(witprog) < 2 or len(witprog) > 40:
+        return None, None
+
+    return witver, witprog
+
+
+@lru_cache(maxsize=None)
+def address_to_script(address: str) -> bytes:
+    """
+    Get the output script (scriptPubKey) locking coins to an address.
+
+    Args:
+        address: A mainnet Bitcoin address (P2PKH, P2SH or segwit)
+
+    Returns:
+        The scriptPubKey bytes
+
+    Raises:
+        ValueError: If the address cannot be decoded
+    """
+    if address.lower().startswith('bc1'):
+        witver, witprog = bech32.decode('bc', address)
+        if witver is None:
+            witver, witprog = _decode_bech32m(address)
+        if witver is None:
+            raise ValueError(f"Invalid segwit address: {address}")
+
+        # OP_0 or OP_1..OP_16 followed by a push of the witness program
+        opcode = 0x00 if witver == 0 else 0x50 + witver
+        return bytes([opcode, len(witprog)]) + bytes(witprog)
+
+    try:
+        decoded = base58.b58decode_check(address)
+    except ValueError as e:
+        raise ValueError(f"Invalid base58 address: {address}") from e
+
+    if len(decoded) != 21:
+        raise ValueError(f"Invalid base58 address length: {address}")
+
+    version, payload = decoded[0], decoded[1:]
+    if version == P2PKH_VERSION_BYTE:
+        # OP_DUP OP_HASH160 <20 bytes> OP_EQUALVERIFY OP_CHECKSIG
+        return b'\x76\xa9\x14' + payload + b'\x88\xac'
+    elif version == P2SH_VERSION_BYTE:
+        # OP_HASH160 <20 bytes> OP_EQUAL
+        return b'\xa9\x14' + payload + b'\x87'
+
+    raise ValueError(f"Unsupported address version: {version}")
@@ -0,0 +1,18 @@
+"""
+Serialization utilities for Bitcoin transactions and filters.
+"""
+
+import struct
+from typing import Tuple
+
+
+def read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Read a Bitcoin compact size integer, returning (value, new offset)."""
+    prefix = data[offset]
+    if prefix < 0xfd:
+        return prefix, offset + 1
+    if prefix == 0xfd:
+        return struct.unpack_from('<H', data, offset + 1)[0], offset + 3
+    if prefix == 0xfe:
+        return struct.unpack_from('<I', data, offset + 1)[0], offset + 5
+    return struct.unpack_from('<Q', data, offset + 1)[0], offset + 9
@@ -4,12 +4,11 @@ Web routes for the SatSentry application.
 
 import json
 import time
-from datetime import datetime, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 
 from app.services.address_monitor import (
     add_single_address,
-    add_extended_public_key,
+    check_new_extended_key,
     get_all_addresses,
     get_all_extended_keys,
     delete_address,
@@ -18,8 +17,14 @@ from app.services.address_monitor import (
     refresh_address
 )
 from app.services.settings import get_settings, update_settings, DEFAULT_SETTINGS
-from app.services.scheduler import get_scheduler_status, pause_scheduler, resume_scheduler
-from app.services import mempool_api
+from app.services.scheduler import (
+    get_scheduler_status,
+    pause_scheduler,
+    resume_scheduler,
+    trigger_check as trigger_scheduler_check,
+    notify_settings_changed
+)
+from app.services import mempool_api, chain_info, confirmation_tracker, job_queue, metrics, profiler
 from app.btc_addr_gen.utils.validation import is_valid_extended_key
 
 main_bp = Blueprint('main', __name__)
@@ -43,8 +48,32 @@ def index():
 def scheduler_status():
     """API endpoint for getting current scheduler status."""
     status = get_scheduler_status()
+    try:
+        status['tip_height'] = chain_info.get_tip_height()
+    except ValueError:
+        status['tip_height'] = None
     return jsonify(status)
 
+@main_bp.route('/api/metrics')
+def api_metrics():
+    """API endpoint for getting a snapshot of the in-process metrics."""
+    return jsonify(metrics.snapshot())
+
+@main_bp.route('/api/cycle-profiles')
+def cycle_profiles():
+    """API endpoint for getting the phase timings of the last check cycles."""
+    return jsonify(profiler.get_cycle_profiles())
+
+@main_bp.route('/api/pending-transactions')
+def pending_transactions():
+    """API endpoint for getting the transactions waiting for their confirmation milestones."""
+    return jsonify(confirmation_tracker.get_pending_transactions())
+
+@main_bp.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint, in the text exposition format."""
+    return Response(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @main_bp.route('/api/scheduler-events')
 def scheduler_events():
     """Server-Sent Events endpoint for real-time scheduler updates."""
@@ -90,28 +119,22 @@ def scheduler_events():
 def trigger_check():
     """API endpoint for triggering an immediate check."""
     try:
-        # Get scheduler instance
-        from app.services.scheduler import AddressScheduler
-        scheduler = AddressScheduler.get_instance()
-
-        # Set checking flag to true immediately for UI feedback
-        scheduler._checking = True
-
-        # Force next check time to now to trigger immediate check
-        # This will cause the scheduler to start a check on its next iteration
-        scheduler._next_check_time = datetime.now() - timedelta(seconds=1)
-
-        # Get updated status to send to clients
+        # Wakes the scheduler thread, which starts the check right away
+        result = trigger_scheduler_check()
         status = get_scheduler_status()
 
-        # Create a response
-        response = jsonify({
-            'success': True,
-            'message': "Check triggered.",
-            'status': status
-        })
-
-        return response
+        if result:
+            return jsonify({
+                'success': True,
+                'message': "Check triggered.",
+                'status': status
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'message': "Failed to trigger a check. The scheduler might not be running or is paused.",
+                'status': status
+            })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -168,11 +191,15 @@ def addresses():
 
     mempool_url = mempool_api.get_api_url().split("/api")[0]
 
+    # Imports and rescans still queued or running, and those that failed
+    jobs = [job for job in job_queue.get_jobs() if job['status'] in ('queued', 'running', 'failed')]
+
     return render_template(
         'addresses.html',
         single_addresses=single_addresses,
         extended_keys=extended_keys,
-        mempool_url=mempool_url
+        mempool_url=mempool_url,
+        jobs=jobs
     )
 
 @main_bp.route('/add_address', methods=['GET', 'POST'])
@@ -204,15 +231,17 @@ def add_address():
             gap_limit = int(request.form.get('gap_limit', DEFAULT_SETTINGS['gap']))
 
             try:
-                add_extended_public_key(
-                    extended_key=extended_key,
-                    gap_limit=gap_limit,
-                    initial_addresses=initial_addresses,
-                    label=label,
-                    derivation_path=derivation_path,
-                    start_index=start_index,
-                )
-                flash('Extended key added successfully!', 'success')
+                # Rejected right away, only derivation and address discovery run as a background job
+                derivation_path = check_new_extended_key(extended_key, derivation_path)
+                job = job_queue.submit('add_extended_key', {
+                    'extended_key': extended_key,
+                    'gap_limit': gap_limit,
+                    'initial_addresses': initial_addresses,
+                    'label': label,
+                    'derivation_path': derivation_path,
+                    'start_index': start_index,
+                })
+                flash(f'Extended key import queued as job {job["id"][:8]}, its addresses appear as they are discovered.', 'success')
                 return redirect(url_for('main.addresses'))
             except ValueError as e:
                 flash(f'Error adding extended key: {str(e)}', 'danger')
@@ -229,9 +258,13 @@ def settings():
         # Update settings
         new_settings = {
             'check_interval': int(request.form.get('check_interval', DEFAULT_SETTINGS['check_interval'])),
+            'scan_mode': request.form.get('scan_mode', DEFAULT_SETTINGS['scan_mode']),
             'use_self_hosted': request.form.get('use_self_hosted') == 'on',
+            'websocket_enabled': request.form.get('websocket_enabled') == 'on',
             'node_url': request.form.get('node_url', DEFAULT_SETTINGS['node_url']),
             'node_port': int(request.form.get('node_port', DEFAULT_SETTINGS['node_port'])),
+            'mempool_watch_enabled': request.form.get('mempool_watch_enabled') == 'on',
+            'mempool_watch_interval': int(request.form.get('mempool_watch_interval', DEFAULT_SETTINGS['mempool_watch_interval'])),
             'discord_webhook': request.form.get('discord_webhook', ''),
             'gap': int(request.form.get('gap', DEFAULT_SETTINGS['gap'])),
             'initial_addresses': int(request.form.get('initial_addresses', DEFAULT_SETTINGS['initial_addresses']))
@@ -239,6 +272,7 @@ def settings():
 
         try:
             update_settings(new_settings)
+            notify_settings_changed()
             flash('Settings updated successfully!', 'success')
             return redirect(url_for('main.settings'))
         except ValueError as e:
@@ -293,14 +327,50 @@ def api_update_gap_limit(key, derivation_path):
             return jsonify({'success': False, 'error': 'Gap limit must be at least 1'})
 
         from app.services.extended_key_manager import update_gap_limit
-        update_gap_limit(key, derivation_path, new_gap_limit)
+        if not update_gap_limit(key, derivation_path, new_gap_limit):
+            return jsonify({'success': True, 'unchanged': True})
 
-        return jsonify({'success': True})
+        # The addresses of a larger gap window are derived and checked in the background
+        job = job_queue.submit('gap_limit', {'extended_key': key, 'derivation_path': derivation_path})
+
+        return jsonify({'success': True, 'job_id': job['id']})
     except ValueError as e:
         return jsonify({'success': False, 'error': str(e)})
     except Exception as e:
         return jsonify({'success': False, 'error': f'Unexpected error: {str(e)}'})
 
+@main_bp.route('/api/rescan/<key>/<path:derivation_path>', methods=['POST'])
+def api_rescan(key, derivation_path):
+    """API endpoint to check every address of a derivation path again, as a background job."""
+    if derivation_path not in get_all_extended_keys().get(key, {}).get('derivation_paths', {}):
+        return jsonify({'success': False, 'error': 'Derivation path not found for this extended key'})
+
+    job = job_queue.submit('rescan', {'extended_key': key, 'derivation_path': derivation_path})
+    return jsonify({'success': True, 'job_id': job['id']})
+
+@main_bp.route('/api/jobs')
+def api_jobs():
+    """API endpoint for listing the background jobs, most recent first."""
+    return jsonify(job_queue.get_jobs())
+
+@main_bp.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API endpoint for getting the status, progress and result of a background job."""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@main_bp.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """API endpoint to cancel a background job."""
+    try:
+        if not job_queue.cancel(job_id):
+            return jsonify({'success': False, 'error': 'Job already finished'})
+        return jsonify({'success': True})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
 @main_bp.route('/api/validate_extended_key')
 def api_validate_extended_key():
     """API endpoint to validate an extended public key."""
@@ -313,6 +383,14 @@ def api_test_connection():
     """API endpoint to test the mempool API connection."""
 
     try:
+        urls = [url for url, _ in mempool_api.get_api_urls()]
+        if len(urls) > 1:
+            reachable = [url for url in urls if mempool_api.test_api_connection(url)]
+            return jsonify({
+                'success': bool(reachable),
+                'message': f'{len(reachable)} of {len(urls)} endpoints reachable.'
+            })
+
         result = mempool_api.test_api_connection()
         if result:
             return jsonify({'success': True, 'message': 'Connection successful!'})
@@ -4,32 +4,50 @@ Address monitoring service for SatSentry.
 
 import os
 import json
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
 from app.btc_addr_gen.utils.validation import is_valid_extended_key
 from app.btc_addr_gen.core.key_types import detect_key_type
+from app.btc_addr_gen.utils.script import address_to_script
 
-from app.services import extended_key_manager, mempool_api
+from app.services import address_schedule, confirmation_tracker, extended_key_manager, mempool_api, metrics, profiler
 from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
 
 logger = logging.getLogger(__name__)
 
+# Held by every load-modify-save of the single addresses file: the web routes,
+# the scheduler, the watchers, the backends and the job workers all write it
+single_addresses_lock = threading.RLock()
+
+# Last seen chain_stats/mempool_stats counters per address, used to skip
+# downloading the transaction history when nothing changed between checks
+_address_stats_cache: Dict[str, Tuple[int, ...]] = {}
+
+# Maximum number of /txs/chain pages fetched when catching up with an address history
+MAX_HISTORY_PAGES = 40
+
+# Seconds block timestamps may lag behind the timestamp of a cursor without a block
+# height (a local first-seen time, or a block time stored before heights were kept)
+CURSOR_TIME_TOLERANCE = 6 * 3600
+
 def _ensure_data_files_exist():
     """Ensure data files exist."""
     data_dir = get_file_path('data_dir')
     os.makedirs(data_dir, exist_ok=True)
 
-    single_addresses_file = get_file_path('single_addresses_file')
-    if not os.path.exists(single_addresses_file):
-        with open(single_addresses_file, 'w') as f:
-            json.dump({}, f, indent=4)
-
-    extended_keys_file = get_file_path('extended_keys_file')
-    if not os.path.exists(extended_keys_file):
-        with open(extended_keys_file, 'w') as f:
-            json.dump({}, f, indent=4)
+    # Created exclusively, never over a file another thread just saved
+    for file_path in (get_file_path('single_addresses_file'), get_file_path('extended_keys_file')):
+        if not os.path.exists(file_path):
+            try:
+                with open(file_path, 'x') as f:
+                    json.dump({}, f, indent=4)
+            except FileExistsError:
+                pass
 
 def _load_single_addresses() -> Dict[str, Any]:
     """Load single addresses from file."""
@@ -37,7 +55,7 @@ def _load_single_addresses() -> Dict[str, Any]:
 
     try:
         single_addresses_file = get_file_path('single_addresses_file')
-        with open(single_addresses_file, 'r') as f:
+        with profiler.phase('load_state'), open(single_addresses_file, 'r') as f:
             return json.load(f)
     except Exception as e:
         logger.error(f"Error loading single addresses: {e}")
@@ -49,8 +67,13 @@ def _save_single_addresses(addresses: Dict[str, Any]) -> None:
 
     try:
         single_addresses_file = get_file_path('single_addresses_file')
-        with open(single_addresses_file, 'w') as f:
-            json.dump(addresses, f, indent=4)
+        start = time.monotonic()
+        # Written next to the file and renamed, so readers never see a truncated file
+        with single_addresses_lock, profiler.phase('disk_save'):
+            with open(f"{single_addresses_file}.tmp", 'w') as f:
+                json.dump(addresses, f, indent=4)
+            os.replace(f"{single_addresses_file}.tmp", single_addresses_file)
+        metrics.record_flush(single_addresses_file, start)
     except Exception as e:
         logger.error(f"Error saving single addresses: {e}")
         raise ValueError(f"Failed to save addresses: {e}")
@@ -61,7 +84,7 @@ def _load_extended_keys() -> Dict[str, Any]:
 
     try:
         extended_keys_file = get_file_path('extended_keys_file')
-        with open(extended_keys_file, 'r') as f:
+        with profiler.phase('load_state'), open(extended_keys_file, 'r') as f:
             return json.load(f)
     except Exception as e:
         logger.error(f"Error loading extended keys: {e}")
@@ -73,8 +96,13 @@ def _save_extended_keys(keys: Dict[str, Any]) -> None:
 
     try:
         extended_keys_file = get_file_path('extended_keys_file')
-        with open(extended_keys_file, 'w') as f:
-            json.dump(keys, f, indent=4)
+        start = time.monotonic()
+        # Written next to the file and renamed, so readers never see a truncated file
+        with extended_key_manager.extended_keys_lock, profiler.phase('disk_save'):
+            with open(f"{extended_keys_file}.tmp", 'w') as f:
+                json.dump(keys, f, indent=4)
+            os.replace(f"{extended_keys_file}.tmp", extended_keys_file)
+        metrics.record_flush(extended_keys_file, start)
     except Exception as e:
         logger.error(f"Error saving extended keys: {e}")
         raise ValueError(f"Failed to save extended keys: {e}")
@@ -112,20 +140,73 @@ def add_single_address(address: str, label: str = '') -> None:
     if not is_valid_bitcoin_address(address):
         raise ValueError("Invalid Bitcoin address")
 
-    addresses = _load_single_addresses()
+    with single_addresses_lock:
+        addresses = _load_single_addresses()
 
-    if address in addresses:
-        raise ValueError("Address already exists")
+        if address in addresses:
+            raise ValueError("Address already exists")
 
-    addresses[address] = {
-        'label': label,
-        'added_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'last_tx': None
-    }
+        addresses[address] = {
+            'label': label,
+            'added_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'last_tx': None
+        }
 
-    _save_single_addresses(addresses)
+        _save_single_addresses(addresses)
     logger.info(f"Added single address: {address}")
 
+def get_default_derivation_path(extended_key: str) -> str:
+    """
+    Get the default account derivation path of an extended public key, based on its type.
+
+    Args:
+        extended_key: The extended public key (xpub/ypub/zpub)
+
+    Returns:
+        The derivation path
+
+    Raises:
+        ValueError: If the key is invalid or unsupported
+    """
+    # Detect key type first to determine default path
+    if not is_valid_extended_key(extended_key):
+        raise ValueError("Invalid extended public key")
+
+    key_type = detect_key_type(extended_key)
+    if not key_type:
+        raise ValueError("Unsupported extended key format")
+
+    if key_type.name == 'XPUB':
+        return "m/44'/0'/0'"
+    elif key_type.name == 'YPUB':
+        return "m/49'/0'/0'"
+    elif key_type.name == 'ZPUB':
+        return "m/84'/0'/0'"
+    return ''
+
+def check_new_extended_key(extended_key: str, derivation_path: str = '') -> str:
+    """
+    Check that an extended public key can be added, before its import is queued.
+
+    Args:
+        extended_key: The extended public key (xpub/ypub/zpub)
+        derivation_path: Custom derivation path, the default one of the key type if empty
+
+    Returns:
+        The derivation path the key will be added with
+
+    Raises:
+        ValueError: If the key is invalid or unsupported, or the derivation path already exists
+    """
+    # Also validates the key format when a custom path is given
+    default_path = get_default_derivation_path(extended_key)
+    derivation_path = derivation_path or default_path
+
+    if derivation_path in get_all_extended_keys().get(extended_key, {}).get('derivation_paths', {}):
+        raise ValueError("This derivation path already exists for this extended key")
+
+    return derivation_path
+
 def add_extended_public_key(
     extended_key: str,
     gap_limit: int = DEFAULT_SETTINGS['gap'],
@@ -133,6 +214,7 @@ def add_extended_public_key(
     label: str = '',
     derivation_path: str = '',
     start_index: int = 0,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
 ) -> None:
     """
     Add an extended public key for monitoring.
@@ -144,26 +226,14 @@ def add_extended_public_key(
         start_index: Starting index for address derivation
         gap_limit: Gap limit for address derivation
         initial_addresses: Initial number of addresses to generate (defaults to global setting)
+        progress: Optional function called with the address discovery progress
 
     Raises:
         ValueError: If the key is invalid or the derivation path already exists
     """
     # Set default derivation path based on key type if not provided
     if not derivation_path:
-        # Detect key type first to determine default path
-        if not is_valid_extended_key(extended_key):
-            raise ValueError("Invalid extended public key")
-
-        key_type = detect_key_type(extended_key)
-        if not key_type:
-            raise ValueError("Unsupported extended key format")
-
-        if key_type.name == 'XPUB':
-            derivation_path = "m/44'/0'/0'"
-        elif key_type.name == 'YPUB':
-            derivation_path = "m/49'/0'/0'"
-        elif key_type.name == 'ZPUB':
-            derivation_path = "m/84'/0'/0'"
+        derivation_path = get_default_derivation_path(extended_key)
 
     # Get settings for initial address count if not provided
     if initial_addresses is None:
@@ -179,13 +249,15 @@ def add_extended_public_key(
         derivation_path=derivation_path,
         start_index=start_index,
         initial_addresses=initial_addresses,
+        progress=progress,
     )
 
     # Set the added date (handled separately in the manager)
-    keys = _load_extended_keys()
-    if extended_key in keys:
-        keys[extended_key]['added_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        _save_extended_keys(keys)
+    with extended_key_manager.extended_keys_lock:
+        keys = _load_extended_keys()
+        if extended_key in keys:
+            keys[extended_key]['added_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            _save_extended_keys(keys)
 
     logger.info(f"Added extended key: {extended_key[:8]}... with derivation path {derivation_path}")
 
@@ -217,13 +289,14 @@ def delete_address(address: str) -> None:
     Raises:
         ValueError: If the address doesn't exist
     """
-    addresses = _load_single_addresses()
+    with single_addresses_lock:
+        addresses = _load_single_addresses()
 
-    if address not in addresses:
-        raise ValueError("Address not found")
+        if address not in addresses:
+            raise ValueError("Address not found")
 
-    del addresses[address]
-    _save_single_addresses(addresses)
+        del addresses[address]
+        _save_single_addresses(addresses)
     logger.info(f"Deleted address: {address}")
 
 def delete_extended_key(extended_key: str) -> None:
@@ -236,13 +309,14 @@ def delete_extended_key(extended_key: str) -> None:
     Raises:
         ValueError: If the extended key doesn't exist
     """
-    keys = _load_extended_keys()
+    with extended_key_manager.extended_keys_lock:
+        keys = _load_extended_keys()
 
-    if extended_key not in keys:
-        raise ValueError("Extended key not found")
+        if extended_key not in keys:
+            raise ValueError("Extended key not found")
 
-    del keys[extended_key]
-    _save_extended_keys(keys)
+        del keys[extended_key]
+        _save_extended_keys(keys)
     logger.info(f"Deleted extended key: {extended_key[:8]}...")
 
 def delete_extended_key_derivation_path(extended_key: str, derivation_path: str) -> None:
@@ -256,22 +330,23 @@ def delete_extended_key_derivation_path(extended_key: str, derivation_path: str)
     Raises:
         ValueError: If the key or derivation path doesn't exist
     """
-    keys = _load_extended_keys()
+    with extended_key_manager.extended_keys_lock:
+        keys = _load_extended_keys()
 
-    if extended_key not in keys:
-        raise ValueError("Extended key not found")
+        if extended_key not in keys:
+            raise ValueError("Extended key not found")
 
-    if derivation_path not in keys[extended_key].get('derivation_paths', {}):
-        raise ValueError("Derivation path not found for this extended key")
+        if derivation_path not in keys[extended_key].get('derivation_paths', {}):
+            raise ValueError("Derivation path not found for this extended key")
 
-    # Delete the derivation path
-    del keys[extended_key]['derivation_paths'][derivation_path]
+        # Delete the derivation path
+        del keys[extended_key]['derivation_paths'][derivation_path]
 
-    # If no derivation paths remain, delete the entire extended key
-    if not keys[extended_key]['derivation_paths']:
-        del keys[extended_key]
+        # If no derivation paths remain, delete the entire extended key
+        if not keys[extended_key]['derivation_paths']:
+            del keys[extended_key]
 
-    _save_extended_keys(keys)
+        _save_extended_keys(keys)
     logger.info(f"Deleted derivation path {derivation_path} for extended key: {extended_key[:8]}...")
 
 def refresh_address(address: str) -> Dict[str, Any]:
@@ -287,47 +362,101 @@ def refresh_address(address: str) -> Dict[str, Any]:
     Raises:
         ValueError: If the address doesn't exist or the refresh fails
     """
-    # Check if it's a single address
-    single_addresses = _load_single_addresses()
-    if address in single_addresses:
-        return _check_single_address(address, single_addresses[address])
-
-    # Check if it's a derived address
-    extended_keys = _load_extended_keys()
-    for extended_key, key_data in extended_keys.items():
-        for deriv_path, path_data in key_data.get('derivation_paths', {}).items():
-            for addr_path, addr_data in path_data.get('derived_addresses', {}).items():
-                if isinstance(addr_data, dict):
-                    addr = addr_data.get('address')
-                    if addr == address:
-                        # Include the actual transaction history in the metadata
-                        metadata = {
-                            'label': f"{key_data.get('label', '')} ({addr_path})",
-                            'last_tx': addr_data.get('last_tx')
-                        }
-                        return _check_single_address(address, metadata)
-                else:  # Old format - string address
-                    if addr_data == address:
-                        return _check_single_address(address, {'label': f"{key_data.get('label', '')} ({addr_path})"})
+    for addr, metadata, _, _ in _iter_monitored_addresses():
+        if addr == address:
+            return _check_single_address(address, metadata)
 
     raise ValueError("Address not found")
 
-def _check_single_address(address: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+def _get_previous_fingerprint(address: str) -> Optional[Tuple[int, ...]]:
+    """Get the activity counters of an address at its last processed check, persisted across restarts."""
+    fingerprint = _address_stats_cache.get(address)
+    if fingerprint is None:
+        fingerprint = address_schedule.get_fingerprint(address)
+    return fingerprint
+
+def _remember_fingerprint(address: str, fingerprint: Tuple[int, ...]) -> None:
+    """Remember the activity counters of an address once its history has been processed."""
+    _address_stats_cache[address] = fingerprint
+    address_schedule.set_fingerprint(address, fingerprint)
+
+def _forget_fingerprint(address: str) -> None:
+    """Forget the activity counters of an address, so its next check fetches the history."""
+    _address_stats_cache.pop(address, None)
+    address_schedule.forget_fingerprint(address)
+
+def _fetch_address_changes(address: str, metadata: Dict[str, Any]) -> Tuple[Tuple[int, ...], Optional[Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]]]:
+    """
+    Fetch what changed on an address since its last check, without storing anything.
+
+    Args:
+        address: The address to check
+        metadata: The address metadata
+
+    Returns:
+        Tuple of the activity counters and, when they moved, the history since the stored
+        last transaction as (new transactions newest first, cursor transaction or None)
+
+    Raises:
+        ValueError: If an API request fails
+    """
+    # Poll the small address summary first and only fetch the history when its counters moved
+    stats_fingerprint = _get_stats_fingerprint(address)
+    previous_fingerprint = _get_previous_fingerprint(address)
+    if stats_fingerprint == previous_fingerprint or not any(stats_fingerprint):
+        return stats_fingerprint, None
+
+    last_tx = metadata.get('last_tx')
+    if last_tx and last_tx.get('txid'):
+        # Page through the history until the last seen transaction (the cursor)
+        return stats_fingerprint, _fetch_transactions_since(address, last_tx)
+
+    if previous_fingerprint is not None:
+        # Seen empty before: everything it received since is new, paged past the first page
+        return stats_fingerprint, _fetch_transactions_since(address, {})
+
+    # First check of this address: only the most recent transaction is reported
+    transactions = mempool_api.get_address_transactions(address)
+    return stats_fingerprint, (transactions[:1], None)
+
+def _check_single_address(address: str, metadata: Dict[str, Any],
+                          changes: Optional[Tuple[Tuple[int, ...], Any]] = None) -> Dict[str, Any]:
     """
     Check a single address for new transactions.
 
     Args:
         address: The address to check
         metadata: The address metadata
+        changes: The changes already returned by _fetch_address_changes, fetched when not given
 
     Returns:
         Dictionary with check results
     """
     try:
-        # Get transactions for the address
-        transactions = mempool_api.get_address_transactions(address)
-
-        if not transactions:
+        if changes is None:
+            changes = _fetch_address_changes(address, metadata)
+        stats_fingerprint, history = changes
+        previous_fingerprint = _get_previous_fingerprint(address)
+        active = previous_fingerprint is not None and previous_fingerprint != stats_fingerprint
+        address_schedule.record_check(
+            address,
+            pending=stats_fingerprint[3] > 0,  # mempool_stats tx_count
+            active=active
+        )
+        if active:
+            # Checked first in the next cycles too, like addresses seen by the watchers
+            address_schedule.promote(address)
+
+        if history is None:
+            if previous_fingerprint == stats_fingerprint or any(stats_fingerprint):
+                return {
+                    'address': address,
+                    'label': metadata.get('label', ''),
+                    'new_transactions': False,
+                    'message': 'No new transactions'
+                }
+
+            _remember_fingerprint(address, stats_fingerprint)
             return {
                 'address': address,
                 'label': metadata.get('label', ''),
@@ -336,64 +465,57 @@ def _check_single_address(address: str, metadata: Dict[str, Any]) -> Dict[str, A
                 'transactions': []
             }
 
-        # Get the latest transaction
-        latest_tx = transactions[0]
-        latest_txid = latest_tx.get('txid')
-
-        # Get transaction details to access block_time timestamp
-        tx_details = mempool_api.get_transaction_details(latest_txid)
-
-        # Use block_time timestamp from mempool API if available
-        if 'status' in tx_details and tx_details['status'].get('confirmed', False) and 'block_time' in tx_details['status']:
-            # Convert block_time (Unix timestamp) to a human-readable format
-            tx_timestamp = datetime.fromtimestamp(tx_details['status']['block_time']).isoformat()
-        else:
-            # If transaction is not confirmed yet, use current time
-            tx_timestamp = datetime.now().isoformat()
-
-        # Determine transaction direction
-        direction = _determine_tx_direction(address, latest_tx)
-
-        # Create transaction info
-        tx_info = {
-            'txid': latest_txid,
-            'direction': direction,
-            'timestamp': tx_timestamp
-        }
-
-        # Check if this is a new transaction
         last_tx = metadata.get('last_tx')
-        is_new = False
+        new_txs, cursor_tx = history
+
+        if not new_txs and cursor_tx is None:
+            if not last_tx:
+                return {
+                    'address': address,
+                    'label': metadata.get('label', ''),
+                    'new_transactions': False,
+                    'message': 'No transactions found',
+                    'transactions': []
+                }
+
+            # The cursor transaction vanished (e.g. replaced in the mempool) and nothing newer exists
+            _remember_fingerprint(address, stats_fingerprint)
+            return {
+                'address': address,
+                'label': metadata.get('label', ''),
+                'new_transactions': False,
+                'message': 'No new transactions'
+            }
 
-        if not last_tx or last_tx.get('txid') != latest_txid:
-            is_new = True
+        # The newest transaction becomes the new cursor
+        latest_tx = new_txs[0] if new_txs else cursor_tx
+        latest_txid = latest_tx.get('txid')
 
-            # Update the last transaction in metadata
-            metadata['last_tx'] = tx_info
+        # Create transaction info, with the block_time timestamp of the listed transaction if available
+        tx_info = _get_tx_info(address, latest_tx, last_tx)
 
-            # Save the updated metadata
-            addresses = _load_single_addresses()
-            if address in addresses:
-                addresses[address] = metadata
-                _save_single_addresses(addresses)
-        else:
-            # Even if it's not a new transaction, update the timestamp to use block_time
-            if last_tx and last_tx.get('txid') == latest_txid and last_tx.get('timestamp') != tx_timestamp:
-                metadata['last_tx']['timestamp'] = tx_timestamp
-                addresses = _load_single_addresses()
-                if address in addresses:
-                    addresses[address] = metadata
-                    _save_single_addresses(addresses)
+        # Transactions a watcher or block scanner already reported are not notified again
+        new_txs = [tx for tx in new_txs if address_schedule.mark_notified(address, tx.get('txid'))]
+        is_new = bool(new_txs)
+
+        # Store the new cursor, or refresh its timestamp once it confirmed
+        if not last_tx or last_tx.get('txid') != latest_txid or _cursor_changed(last_tx, tx_info):
+            _store_last_tx(address, metadata, tx_info)
 
         # Always update the address status and transaction info for extended key addresses
         # This ensures the timestamp is updated even for existing transactions
         extended_key_manager.update_address_used_status(address, True, tx_info)
 
+        # Only remember the counters once the history has been processed successfully
+        _remember_fingerprint(address, stats_fingerprint)
+        _track_unconfirmed(address, metadata, new_txs)
+
         return {
             'address': address,
             'label': metadata.get('label', ''),
             'new_transactions': is_new,
             'latest_tx': latest_tx,
+            'new_txs': new_txs,
             'message': 'New transaction found' if is_new else 'No new transactions'
         }
 
@@ -406,42 +528,181 @@ def _check_single_address(address: str, metadata: Dict[str, Any]) -> Dict[str, A
             'message': f'Error checking address: {e}'
         }
 
-def _determine_tx_direction(address: str, tx: Dict[str, Any]) -> str:
+def _track_unconfirmed(address: str, metadata: Dict[str, Any], txs: List[Dict[str, Any]]) -> None:
     """
-    Determine the direction of a transaction (incoming or outgoing).
+    Hand the unconfirmed transactions of an address to the confirmation tracker.
 
     Args:
-        address: The address to check
+        address: The address
+        metadata: The address metadata
+        txs: The new transactions of the address
+    """
+    for tx in txs:
+        if not tx.get('status', {}).get('confirmed', False):
+            confirmation_tracker.track(address, metadata.get('label', ''), tx.get('txid'), _determine_tx_direction(address, tx))
+
+def _store_last_tx(address: str, metadata: Dict[str, Any], tx_info: Dict[str, Any]) -> None:
+    """
+    Store the last transaction info of an address.
+
+    Only last_tx is written: the metadata may come from a script index built
+    before other fields of the stored entry changed.
+
+    Args:
+        address: The address
+        metadata: The address metadata, updated in place
+        tx_info: The transaction info (txid, direction, timestamp)
+    """
+    metadata['last_tx'] = tx_info
+
+    with single_addresses_lock:
+        addresses = _load_single_addresses()
+        if address in addresses:
+            addresses[address]['last_tx'] = tx_info
+            _save_single_addresses(addresses)
+
+def _load_last_tx(address: str, metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Load the stored last transaction of a single or derived address.
+
+    Args:
+        address: The address
+        metadata: The address metadata, used if the address is no longer stored
+
+    Returns:
+        The stored last transaction info, or None if there is none
+    """
+    addresses = _load_single_addresses()
+    if address in addresses:
+        return addresses[address].get('last_tx')
+
+    for key_data in _load_extended_keys().values():
+        for path_data in key_data.get('derivation_paths', {}).values():
+            for addr_data in path_data.get('derived_addresses', {}).values():
+                if isinstance(addr_data, dict) and addr_data.get('address') == address:
+                    return addr_data.get('last_tx')
+
+    return metadata.get('last_tx')
+
+def record_transaction(address: str, metadata: Dict[str, Any], tx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Record a transaction detected outside of the per-address polling (e.g. while scanning blocks).
+
+    Transactions are reported once per address, whatever order they are seen in,
+    and a transaction older than the stored last transaction never replaces it.
+    The stored last transaction is compared against, not the one of the
+    metadata, which may come from a script index built minutes ago.
+
+    Args:
+        address: The monitored address touched by the transaction
+        metadata: The address metadata
         tx: The transaction data
 
     Returns:
-        'incoming' or 'outgoing'
+        Check result for the new transaction, or None if it was already known
     """
-    # Check inputs for the address
-    for vin in tx.get('vin', []):
-        if vin.get('prevout', {}).get('scriptpubkey_address') == address:
-            return 'outgoing'
+    # Always taken in this order, the extended keys lock first
+    with extended_key_manager.extended_keys_lock, single_addresses_lock:
+        last_tx = _load_last_tx(address, metadata)
+        metadata['last_tx'] = last_tx
+        tx_info = _get_tx_info(address, tx, last_tx)
+
+        if last_tx and last_tx.get('txid') == tx_info['txid']:
+            if _cursor_changed(last_tx, tx_info):
+                _store_last_tx(address, metadata, tx_info)
+                extended_key_manager.update_address_used_status(address, True, tx_info)
+            return None
+
+        if not address_schedule.mark_notified(address, tx_info['txid']):
+            return None
+
+        if _is_before_cursor(tx_info, last_tx):
+            # Still marks a derived address as used, without moving its cursor back
+            extended_key_manager.update_address_used_status(address, True)
+        else:
+            _store_last_tx(address, metadata, tx_info)
+            extended_key_manager.update_address_used_status(address, True, tx_info)
+
+    # The address summary changed, make sure the next poll looks at its history soon
+    _forget_fingerprint(address)
+    address_schedule.promote(address)
+    _track_unconfirmed(address, metadata, [tx])
+
+    return {
+        'address': address,
+        'label': metadata.get('label', ''),
+        'new_transactions': True,
+        'latest_tx': tx,
+        'new_txs': [tx],
+        'message': 'New transaction found'
+    }
 
-    # If not in inputs, it must be incoming
-    return 'incoming'
+def _get_tx_info(address: str, tx: Dict[str, Any], last_tx: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the transaction info stored as the last transaction of an address.
+
+    Args:
+        address: The address
+        tx: The transaction data including its status
+        last_tx: The stored last transaction info
+
+    Returns:
+        Dictionary with the txid, direction, timestamp and block height (None while unconfirmed)
+    """
+    status = tx.get('status', {})
+    return {
+        'txid': tx.get('txid'),
+        'direction': _determine_tx_direction(address, tx),
+        'timestamp': _get_tx_timestamp(tx, last_tx),
+        'block_height': status.get('block_height') if status.get('confirmed', False) else None
+    }
+
+def _cursor_changed(last_tx: Dict[str, Any], tx_info: Dict[str, Any]) -> bool:
+    """Check whether the stored last transaction has to be refreshed, e.g. once it confirmed."""
+    return (last_tx.get('timestamp') != tx_info['timestamp']
+            or last_tx.get('block_height') != tx_info['block_height'])
 
-def check_all_addresses() -> List[Dict[str, Any]]:
+def _is_before_cursor(tx_info: Dict[str, Any], last_tx: Optional[Dict[str, Any]]) -> bool:
     """
-    Check all monitored addresses for new transactions.
+    Check whether a transaction comes before the stored last transaction in chain order.
+
+    Unconfirmed transactions come after every confirmed one. Last transactions
+    stored without their block height are compared by timestamp.
+
+    Args:
+        tx_info: The transaction info
+        last_tx: The stored last transaction info
 
     Returns:
-        List of check results for addresses with new transactions
+        True if the transaction is older than the stored one
     """
-    results = []
+    if not last_tx or not last_tx.get('txid'):
+        return False
+
+    if 'block_height' in last_tx:
+        cursor_height = last_tx['block_height']
+        height = tx_info['block_height']
+        if height is None:
+            return False
+        return cursor_height is None or height < cursor_height
 
-    # Check single addresses
+    try:
+        return datetime.fromisoformat(tx_info['timestamp']) < datetime.fromisoformat(last_tx['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def _iter_monitored_addresses() -> Iterator[Tuple[str, Dict[str, Any], Optional[str], Optional[str]]]:
+    """
+    Iterate over every monitored address, single or derived from an extended key.
+
+    Yields:
+        Tuples of (address, metadata, extended key, derivation path); the key and
+        path are None for single addresses
+    """
     single_addresses = _load_single_addresses()
     for address, metadata in single_addresses.items():
-        result = _check_single_address(address, metadata)
-        if result.get('new_transactions'):
-            results.append(result)
+        yield address, metadata, None, None
 
-    # Check derived addresses
     extended_keys = _load_extended_keys()
     for extended_key, key_data in extended_keys.items():
         for deriv_path, path_data in key_data.get('derivation_paths', {}).items():
@@ -451,17 +712,361 @@ def check_all_addresses() -> List[Dict[str, Any]]:
                     # Include the actual transaction history in the metadata
                     metadata = {
                         'label': f"{key_data.get('label', '')} ({addr_path})",
-                        'last_tx': addr_data.get('last_tx')
+                        'last_tx': addr_data.get('last_tx'),
+                        'gap_position': extended_key_manager.get_gap_position(path_data, addr_path)
                     }
                 else:  # Old format - string address
                     address = addr_data
                     metadata = {'label': f"{key_data.get('label', '')} ({addr_path})"}
 
-                result = _check_single_address(address, metadata)
-                if result.get('new_transactions'):
-                    results.append(result)
+                yield address, metadata, extended_key, deriv_path
+
+def build_script_index() -> Dict[str, Dict[str, Any]]:
+    """
+    Build an index of the output scripts of all monitored addresses.
+
+    Returns:
+        Dictionary mapping scriptPubKey hex to the address, its metadata,
+        extended key and derivation path
+    """
+    index = {}
+    for address, metadata, extended_key, deriv_path in _iter_monitored_addresses():
+        try:
+            script = address_to_script(address).hex()
+        except ValueError as e:
+            logger.warning(f"Cannot index address {address}: {e}")
+            continue
+
+        index[script] = {
+            'address': address,
+            'metadata': metadata,
+            'extended_key': extended_key,
+            'derivation_path': deriv_path
+        }
+
+    return index
+
+def match_transaction(tx: Dict[str, Any], script_index: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Find the monitored output scripts touched by a transaction.
+
+    Args:
+        tx: The transaction data including prevouts
+        script_index: Index built by build_script_index
+
+    Returns:
+        List of matching scriptPubKey hex strings, without duplicates
+    """
+    matches = []
+
+    for vout in tx.get('vout', []):
+        script = vout.get('scriptpubkey')
+        if script in script_index and script not in matches:
+            matches.append(script)
+
+    for vin in tx.get('vin', []):
+        script = (vin.get('prevout') or {}).get('scriptpubkey')
+        if script in script_index and script not in matches:
+            matches.append(script)
+
+    return matches
+
+def extend_touched_paths(results: List[Dict[str, Any]], script_index: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Derive new addresses for the derivation paths whose addresses were used.
+
+    The new addresses are not checked through the API: the caller matches them
+    against the blocks it scans, and the polling checks their history next.
+
+    Args:
+        results: Check results of a scan
+        script_index: Index built by build_script_index
+
+    Returns:
+        Number of new addresses derived, the index has to be rebuilt to match them
+    """
+    touched_addresses = {result['address'] for result in results}
+    touched_paths = {
+        (entry['extended_key'], entry['derivation_path'])
+        for entry in script_index.values()
+        if entry['extended_key'] and entry['address'] in touched_addresses
+    }
+    generated = 0
+    for extended_key, deriv_path in touched_paths:
+        generated += extended_key_manager.ensure_gap_limit(extended_key, deriv_path, check_new=False)
+    return generated
+
+def _fetch_transactions_since(address: str, last_tx: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Fetch the transactions of an address that are newer than the last seen one.
+
+    Unconfirmed transactions are read from /txs/mempool, then the confirmed history
+    is paged with /txs/chain/:last_seen_txid until the cursor transaction is reached.
+    Paging also stops once past the position of a cursor that left the history
+    (e.g. replaced in the mempool or reorganized out), so it does not walk the whole
+    history: below the block height of a confirmed cursor, or for cursors without a
+    block height, at blocks older than the cursor timestamp by CURSOR_TIME_TOLERANCE.
+
+    Args:
+        address: The address to check
+        last_tx: The stored last transaction info used as cursor, empty to fetch the whole history
+
+    Returns:
+        Tuple of (new transactions newest first, cursor transaction or None if not found)
+    """
+    cursor_txid = last_tx.get('txid')
+    cursor_height = last_tx.get('block_height')
+    cursor_time = None
+    if cursor_height is None:
+        try:
+            cursor_time = datetime.fromisoformat(last_tx['timestamp']).timestamp() - CURSOR_TIME_TOLERANCE
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    new_txs = []
+    for tx in mempool_api.get_address_mempool_transactions(address):
+        if tx.get('txid') == cursor_txid:
+            return new_txs, tx
+        new_txs.append(tx)
+
+    last_seen_txid = None
+    for _ in range(MAX_HISTORY_PAGES):
+        page = mempool_api.get_address_chain_transactions(address, last_seen_txid)
+        for tx in page:
+            if tx.get('txid') == cursor_txid:
+                return new_txs, tx
+            status = tx.get('status', {})
+            if cursor_height is not None and status.get('block_height') is not None:
+                if status['block_height'] < cursor_height:
+                    return new_txs, None
+            elif cursor_time is not None and status.get('block_time') is not None and status['block_time'] < cursor_time:
+                return new_txs, None
+            new_txs.append(tx)
+
+        if len(page) < mempool_api.CHAIN_TXS_PAGE_SIZE:
+            break
+        last_seen_txid = page[-1].get('txid')
+    else:
+        logger.warning(f"Stopped paging history of {address} after {MAX_HISTORY_PAGES} pages without reaching the last seen transaction")
+
+    return new_txs, None
+
+def _get_tx_timestamp(tx: Dict[str, Any], last_tx: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Get the timestamp of a transaction.
+
+    Args:
+        tx: The transaction data including its status
+        last_tx: The stored last transaction info, reused while the same transaction is unconfirmed
+
+    Returns:
+        The block time of confirmed transactions, otherwise the time it was first seen
+    """
+    status = tx.get('status', {})
+    if status.get('confirmed', False) and 'block_time' in status:
+        # Convert block_time (Unix timestamp) to a human-readable format
+        return datetime.fromtimestamp(status['block_time']).isoformat()
+
+    if last_tx and last_tx.get('txid') == tx.get('txid') and last_tx.get('timestamp'):
+        return last_tx['timestamp']
+
+    # If transaction is not confirmed yet, use current time
+    return datetime.now().isoformat()
+
+def _expand_new_transactions(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Split a check result into one result per new transaction, oldest first.
+
+    Args:
+        result: The check result returned by _check_single_address
+
+    Returns:
+        List of check results each holding a single transaction in latest_tx
+    """
+    if not result.get('new_transactions'):
+        return []
+
+    new_txs = result.get('new_txs') or [result.get('latest_tx')]
+    return [{**result, 'latest_tx': tx} for tx in reversed(new_txs)]
+
+def _get_stats_fingerprint(address: str) -> Tuple[int, ...]:
+    """
+    Get the activity counters of an address from its summary.
+
+    Args:
+        address: The address to check
+
+    Returns:
+        Tuple of tx_count, funded_txo_sum and spent_txo_sum for both chain_stats and mempool_stats
+    """
+    stats = mempool_api.get_address_stats(address)
+    fingerprint = []
+    for key in ('chain_stats', 'mempool_stats'):
+        section = stats.get(key) or {}
+        fingerprint.extend((
+            section.get('tx_count', 0),
+            section.get('funded_txo_sum', 0),
+            section.get('spent_txo_sum', 0),
+        ))
+    return tuple(fingerprint)
+
+def _determine_tx_direction(address: str, tx: Dict[str, Any]) -> str:
+    """
+    Determine the direction of a transaction (incoming or outgoing).
+
+    Args:
+        address: The address to check
+        tx: The transaction data
+
+    Returns:
+        'incoming' or 'outgoing'
+    """
+    with profiler.phase('direction'):
+        # Check inputs for the address
+        for vin in tx.get('vin', []):
+            if (vin.get('prevout') or {}).get('scriptpubkey_address') == address:
+                return 'outgoing'
+
+        # If not in inputs, it must be incoming
+        return 'incoming'
+
+def check_address(address: str, metadata: Dict[str, Any], extended_key: Optional[str] = None,
+                  deriv_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Check one monitored address for new transactions.
+
+    Derives new addresses when a derived address was used, to keep the gap limit.
+
+    Args:
+        address: The address to check
+        metadata: The address metadata
+        extended_key: The extended key the address is derived from, None for single addresses
+        deriv_path: The derivation path of the address, None for single addresses
+
+    Returns:
+        One check result per new transaction, oldest first
+    """
+    result = _check_single_address(address, metadata)
+    metrics.increment('addresses_checked_total')
+
+    if extended_key and result.get('new_transactions'):
+        extended_key_manager.ensure_gap_limit(extended_key, deriv_path)
+
+    return _expand_new_transactions(result)
+
+def check_all_addresses(
+    select: Optional[Callable[[str, Dict[str, Any], Optional[str], Optional[str]], bool]] = None,
+    order: Optional[Callable[[str], Any]] = None,
+    within_budget: Optional[Callable[[], bool]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Check monitored addresses for new transactions.
+
+    Args:
+        select: Optional filter called with (address, metadata, extended key, derivation path);
+            only the addresses it returns True for are checked. All addresses are checked without it.
+        order: Optional sort key of an address; when given, addresses are checked in its ascending order.
+        within_budget: Optional function called before each check and each gap limit extension;
+            once it returns False, the remaining selected addresses are deferred instead of
+            checked and the remaining gap limits are left to a later cycle.
+
+    Returns:
+        List of check results for addresses with new transactions
+    """
+    results = []
+    gap_paths = {}  # Derivation paths seen, in order, to ensure their gap limit after the checks
+    checked = 0
+    skipped = 0
+    deferred = 0
+
+    monitored = _iter_monitored_addresses()
+    if order:
+        monitored = sorted(monitored, key=lambda entry: order(entry[0]))
+
+    for address, metadata, extended_key, deriv_path in monitored:
+        if extended_key:
+            gap_paths[(extended_key, deriv_path)] = None
+
+        if select and not select(address, metadata, extended_key, deriv_path):
+            skipped += 1
+            continue
+
+        if within_budget and not within_budget():
+            deferred += 1
+            continue
+
+        result = _check_single_address(address, metadata)
+        results.extend(_expand_new_transactions(result))
+        checked += 1
+
+    # Ensure gap limit once all addresses of each derivation path have been checked. Its
+    # checks spend the same budget; once spent, the paths are extended by a later cycle
+    for gap_path in gap_paths:
+        if within_budget and (deferred or not within_budget()):
+            logger.info("Check budget spent, gap limits are ensured in a later cycle")
+            break
+        extended_key_manager.ensure_gap_limit(*gap_path)
+
+    metrics.set_gauge('check_cycle_addresses', checked)
+    metrics.set_gauge('check_cycle_skipped_addresses', skipped)
+    metrics.set_gauge('check_cycle_deferred_addresses', deferred)
+    metrics.increment('addresses_checked_total', amount=checked)
+    return results
+
+def check_addresses_concurrently(entries: List[Tuple[str, Dict[str, Any]]], workers: int) -> List[Dict[str, Any]]:
+    """
+    Check addresses, fetching their changes concurrently.
 
-            # Ensure gap limit after checking addresses for this derivation path
-            extended_key_manager.ensure_gap_limit(extended_key, deriv_path)
+    The summaries, and the missed history of the addresses whose counters moved,
+    are fetched by a pool of workers; the results are then stored one address
+    at a time, as in a check cycle.
+
+    Args:
+        entries: List of (address, metadata) tuples
+        workers: Number of addresses fetched concurrently
+
+    Returns:
+        One check result per address, in the order of the entries
+    """
+    def fetch(entry: Tuple[str, Dict[str, Any]]) -> Optional[Tuple[Tuple[int, ...], Any]]:
+        try:
+            return _fetch_address_changes(entry[0], entry[1])
+        except Exception as e:
+            # Fetched again by the check below, which reports the error
+            logger.warning(f"Error fetching changes of address {entry[0]}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        changes = list(pool.map(fetch, entries))
+
+    results = [
+        _check_single_address(address, metadata, address_changes)
+        for (address, metadata), address_changes in zip(entries, changes)
+    ]
+    metrics.increment('addresses_checked_total', amount=len(entries))
+    return results
+
+def catch_up_addresses(workers: int) -> List[Dict[str, Any]]:
+    """
+    Check every monitored address after downtime, fetching them concurrently.
+
+    Args:
+        workers: Number of addresses fetched concurrently
+
+    Returns:
+        List of check results, one per missed transaction
+    """
+    monitored = list(_iter_monitored_addresses())
+    checked = check_addresses_concurrently([(address, metadata) for address, metadata, _, _ in monitored], workers)
+
+    results = []
+    gap_paths = {}  # Derivation paths seen, in order, to ensure their gap limit after the checks
+    for (_, _, extended_key, deriv_path), result in zip(monitored, checked):
+        if extended_key:
+            gap_paths[(extended_key, deriv_path)] = None
+        results.extend(_expand_new_transactions(result))
+
+    for gap_path in gap_paths:
+        extended_key_manager.ensure_gap_limit(*gap_path)
 
     return results
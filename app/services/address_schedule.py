@@ -0,0 +1,350 @@
+"""
+Adaptive polling schedule for SatSentry.
+
+Keeps scheduling metadata for every monitored address (when it was last
+checked, its last activity, whether it has unconfirmed transactions and the
+transactions already notified) and sorts addresses into tiers polled at their own interval:
+
+- hot: unconfirmed transactions, recent activity or the first unused
+  addresses of a gap window, checked every cycle
+- warm: activity within the warm window, the other unused addresses of the
+  gap window and single addresses that never received anything
+- cold: addresses dormant for longer than the warm window
+
+Any transaction seen by the watchers or block scanners, or new activity found
+by polling, promotes the address to the hot tier straight away.
+
+The state also holds the cursor of the current check cycle and is
+checkpointed while the cycle runs, so a cycle interrupted by a restart or
+crash resumes with the addresses it had not checked yet.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from app.services import metrics, profiler
+from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Polling tiers, from the most to the least frequently checked
+TIERS = ('hot', 'warm', 'cold')
+
+# Unused addresses at the start of each gap window kept in the hot tier, the next to receive payments
+HOT_GAP_ADDRESSES = 3
+
+# Transactions remembered per address as already notified, the oldest are forgotten
+MAX_NOTIFIED_TXIDS = 50
+
+def _parse_activity(metadata: Dict[str, Any]) -> Optional[float]:
+    """Get the timestamp of the last stored transaction of an address, if any."""
+    timestamp = (metadata.get('last_tx') or {}).get('timestamp')
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+class AddressSchedule:
+    """Singleton holding the polling state of every monitored address."""
+
+    _instance: Optional['AddressSchedule'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'AddressSchedule':
+        """Get or create the schedule instance."""
+        if cls._instance is None:
+            cls._instance = AddressSchedule()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the schedule."""
+        if AddressSchedule._instance is not None:
+            raise RuntimeError("Address schedule is a singleton. Use get_instance() instead.")
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Serializes file writes
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+        self._cycle: Dict[str, Any] = {}  # Cursor of the current or last check cycle
+        self._dirty = False
+        self._checkpoint_interval: Optional[float] = None  # Set while a cycle runs
+        self._saved_at = 0.0
+
+    def _get_state(self) -> Dict[str, Dict[str, Any]]:
+        """Get the state, loading it from file on first use. Must be called with the lock held."""
+        if self._state is None:
+            self._state = {}
+            schedule_file = get_file_path('address_schedule_file')
+            if os.path.exists(schedule_file):
+                try:
+                    with profiler.phase('load_state'), open(schedule_file, 'r') as f:
+                        data = json.load(f)
+                    if isinstance(data.get('addresses'), dict):
+                        self._state = data['addresses']
+                        self._cycle = data.get('cycle') or {}
+                    else:  # Old format - addresses only
+                        self._state = data
+                except Exception as e:
+                    logger.error(f"Error loading address schedule: {e}")
+        return self._state
+
+    def save(self) -> None:
+        """Save the state to file if it changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                'cycle': dict(self._cycle),
+                'addresses': {address: dict(entry) for address, entry in self._get_state().items()}
+            }
+            self._dirty = False
+            self._saved_at = time.time()
+
+        os.makedirs(get_file_path('data_dir'), exist_ok=True)
+        try:
+            schedule_file = get_file_path('address_schedule_file')
+            start = time.monotonic()
+            # Written next to the file and renamed, so a crash never leaves a truncated checkpoint
+            with self._save_lock, profiler.phase('disk_save'):
+                with open(f"{schedule_file}.tmp", 'w') as f:
+                    json.dump(data, f)
+                os.replace(f"{schedule_file}.tmp", schedule_file)
+            metrics.record_flush(schedule_file, start)
+        except Exception as e:
+            logger.error(f"Error saving address schedule: {e}")
+
+    def has_interrupted_cycle(self) -> bool:
+        """Check whether the last check cycle was interrupted before checking every address."""
+        with self._lock:
+            self._get_state()
+            return bool(self._cycle) and not self._cycle.get('completed', True)
+
+    def begin_cycle(self, checkpoint_interval: float) -> Optional[float]:
+        """
+        Start a check cycle, resuming the last one if it was interrupted.
+
+        Until end_cycle(), the state is saved every checkpoint_interval seconds.
+
+        Args:
+            checkpoint_interval: Seconds between two checkpoints
+
+        Returns:
+            The start time of the interrupted cycle being resumed, None for a new cycle
+        """
+        with self._lock:
+            self._get_state()
+            resumed_from = self._cycle.get('started_at') if not self._cycle.get('completed', True) else None
+            if resumed_from is None:
+                self._cycle = {'started_at': time.time(), 'completed': False}
+            self._checkpoint_interval = checkpoint_interval
+            self._dirty = True
+        self.save()
+        return resumed_from
+
+    def end_cycle(self) -> None:
+        """Mark the check cycle as completed and save the state."""
+        with self._lock:
+            self._cycle['completed'] = True
+            self._cycle['completed_at'] = time.time()
+            self._checkpoint_interval = None
+            self._dirty = True
+        self.save()
+
+    def get_last_checked(self, address: str) -> Optional[float]:
+        """Get the time of the last successful check of an address, None if never checked."""
+        with self._lock:
+            return self._get_state().get(address, {}).get('last_checked')
+
+    def get_last_check_time(self) -> Optional[float]:
+        """Get the time of the most recent successful check of any address, None if none was checked."""
+        with self._lock:
+            return max((entry['last_checked'] for entry in self._get_state().values() if entry.get('last_checked')),
+                       default=None)
+
+    def get_fingerprint(self, address: str) -> Optional[Tuple[int, ...]]:
+        """Get the activity counters of an address at its last processed check, None if unknown."""
+        with self._lock:
+            fingerprint = self._get_state().get(address, {}).get('fingerprint')
+        return tuple(fingerprint) if fingerprint is not None else None
+
+    def set_fingerprint(self, address: str, fingerprint: Optional[Tuple[int, ...]]) -> None:
+        """
+        Store the activity counters of an address once its history has been processed.
+
+        Args:
+            address: The address
+            fingerprint: The counters, None to forget them
+        """
+        with self._lock:
+            entry = self._get_state().setdefault(address, {})
+            if fingerprint is None:
+                entry.pop('fingerprint', None)
+            else:
+                entry['fingerprint'] = list(fingerprint)
+            self._dirty = True
+
+    def get_check_priority(self, address: str) -> Tuple[int, float]:
+        """
+        Get the sort key ordering addresses by check priority.
+
+        Addresses with unconfirmed transactions come first, then the least
+        recently checked ones, never checked ones before all others.
+
+        Args:
+            address: The address
+
+        Returns:
+            Sort key, lower is checked first
+        """
+        with self._lock:
+            entry = self._get_state().get(address, {})
+        return (0 if entry.get('pending') else 1, entry.get('last_checked') or 0.0)
+
+    def record_check(self, address: str, pending: bool, active: bool) -> None:
+        """
+        Record a successful check of an address.
+
+        Args:
+            address: The checked address
+            pending: Whether the address has unconfirmed transactions
+            active: Whether the check found new activity
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._get_state().setdefault(address, {})
+            entry['last_checked'] = now
+            entry['pending'] = pending
+            if active:
+                entry['last_activity'] = now
+            self._dirty = True
+            checkpoint = self._checkpoint_interval is not None and now - self._saved_at >= self._checkpoint_interval
+
+        if checkpoint:
+            self.save()
+
+    def promote(self, address: str) -> None:
+        """
+        Move an address to the hot tier after a transaction touched it.
+
+        Args:
+            address: The address seen on chain or in the mempool
+        """
+        with self._lock:
+            entry = self._get_state().setdefault(address, {})
+            entry['last_activity'] = time.time()
+            entry['pending'] = True
+            self._dirty = True
+
+    def mark_notified(self, address: str, txid: str) -> bool:
+        """
+        Remember that a transaction of an address was notified.
+
+        Args:
+            address: The address
+            txid: The transaction ID
+
+        Returns:
+            False if the transaction was already notified for this address
+        """
+        with self._lock:
+            entry = self._get_state().setdefault(address, {})
+            notified = entry.get('notified', [])
+            if txid in notified:
+                return False
+            # Replaced rather than appended to, save() copies entries shallowly
+            entry['notified'] = (notified + [txid])[-MAX_NOTIFIED_TXIDS:]
+            self._dirty = True
+        return True
+
+    def get_tier(self, address: str, metadata: Dict[str, Any], settings: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Get the polling tier of an address.
+
+        Args:
+            address: The address
+            metadata: The address metadata
+            settings: The current settings, loaded when not given
+
+        Returns:
+            One of TIERS
+        """
+        settings = settings or get_settings()
+        with self._lock:
+            entry = self._get_state().get(address, {})
+
+        if entry.get('pending'):
+            return 'hot'
+
+        last_activity = entry.get('last_activity') or _parse_activity(metadata)
+        if last_activity is None:
+            # Never used: the first addresses of the gap window are handed out next
+            gap_position = metadata.get('gap_position')
+            if gap_position is not None and gap_position <= HOT_GAP_ADDRESSES:
+                return 'hot'
+            # The rest of the gap window and fresh single addresses
+            return 'warm'
+
+        age = time.time() - last_activity
+        if age < settings.get('hot_window', DEFAULT_SETTINGS['hot_window']):
+            return 'hot'
+        if age < settings.get('warm_window', DEFAULT_SETTINGS['warm_window']):
+            return 'warm'
+        return 'cold'
+
+    def is_due(self, address: str, metadata: Dict[str, Any], settings: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Check whether an address has to be checked in this cycle.
+
+        Args:
+            address: The address
+            metadata: The address metadata
+            settings: The current settings, loaded when not given
+
+        Returns:
+            True if the interval of its tier elapsed since its last check
+        """
+        settings = settings or get_settings()
+        tier = self.get_tier(address, metadata, settings)
+        if tier == 'hot':
+            return True
+
+        last_checked = self.get_last_checked(address)
+        if last_checked is None:
+            return True
+
+        interval = settings.get(f'{tier}_interval', DEFAULT_SETTINGS[f'{tier}_interval'])
+        return time.time() - last_checked >= interval
+
+def record_check(address: str, pending: bool, active: bool) -> None:
+    """Record a successful check of an address."""
+    AddressSchedule.get_instance().record_check(address, pending, active)
+
+def promote(address: str) -> None:
+    """Move an address to the hot tier after a transaction touched it."""
+    AddressSchedule.get_instance().promote(address)
+
+def mark_notified(address: str, txid: str) -> bool:
+    """Remember that a transaction of an address was notified, False if it already was."""
+    return AddressSchedule.get_instance().mark_notified(address, txid)
+
+def get_fingerprint(address: str) -> Optional[Tuple[int, ...]]:
+    """Get the activity counters of an address at its last processed check."""
+    return AddressSchedule.get_instance().get_fingerprint(address)
+
+def set_fingerprint(address: str, fingerprint: Tuple[int, ...]) -> None:
+    """Store the activity counters of an address once its history has been processed."""
+    AddressSchedule.get_instance().set_fingerprint(address, fingerprint)
+
+def forget_fingerprint(address: str) -> None:
+    """Forget the activity counters of an address, so its next check fetches the history."""
+    AddressSchedule.get_instance().set_fingerprint(address, None)
+
+def save_schedule() -> None:
+    """Save the polling state if it changed."""
+    AddressSchedule.get_instance().save()
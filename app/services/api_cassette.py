@@ -0,0 +1,154 @@
+"""
+Record/replay cassettes for mempool API traffic.
+
+A cassette stores the responses of every API path requested while recording,
+as gzipped JSON. Replaying serves them back without any network access, with
+optional injected latency and errors, so check cycles can be benchmarked and
+their request counts asserted reproducibly.
+
+Usage:
+    cassette = Cassette('cycle.json.gz', mode='record')
+    mempool_api.set_cassette(cassette)
+    check_all_addresses()
+    cassette.save()
+"""
+
+import gzip
+import json
+import time
+import random
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, Any, List
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+CASSETTE_MODES = ('record', 'replay')
+
+class Cassette:
+    """Recorded API responses, by path, in the order they were received."""
+
+    def __init__(self, path: str, mode: str = 'replay', latency: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        """
+        Initialize the cassette, loading the recorded responses when replaying.
+
+        Args:
+            path: The cassette file
+            mode: 'record' to fetch from the API and store the responses, 'replay' to serve them back
+            latency: Seconds added to every replayed response
+            error_rate: Share of replayed requests failing with a connection error
+            seed: Seed of the injected errors, so a replay fails the same requests every time
+
+        Raises:
+            ValueError: If the mode is unknown or the cassette cannot be loaded
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Cassette mode must be one of {', '.join(CASSETTE_MODES)}")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests: Counter = Counter()  # Requested paths, for cost assertions
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Counter = Counter()
+
+        if mode == 'replay':
+            self._load()
+
+    @property
+    def request_count(self) -> int:
+        """Total number of requests handled by the cassette."""
+        return sum(self.requests.values())
+
+    def _load(self) -> None:
+        """Load the recorded responses."""
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Failed to load cassette {self.path}: {e}")
+
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version: {data.get('version')}")
+        self._interactions = data.get('interactions', {})
+
+    def save(self) -> None:
+        """Save the recorded responses."""
+        with self._lock:
+            data = {'version': CASSETTE_VERSION, 'interactions': self._interactions}
+
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        logger.info(f"Saved {sum(len(v) for v in data['interactions'].values())} responses to cassette {self.path}")
+
+    def handle(self, path: str, fetch: Callable[[], requests.Response]) -> requests.Response:
+        """
+        Record or replay the request of an API path.
+
+        Args:
+            path: The API path
+            fetch: Function sending the actual request, used when recording
+
+        Returns:
+            The response
+
+        Raises:
+            requests.exceptions.RequestException: If the request failed or an error was injected
+        """
+        with self._lock:
+            self.requests[path] += 1
+
+        if self.mode == 'record':
+            try:
+                response = fetch()
+            except requests.exceptions.HTTPError as e:
+                self._record(path, e.response)
+                raise
+            self._record(path, response)
+            return response
+
+        return self._replay(path)
+
+    def _record(self, path: str, response: requests.Response) -> None:
+        """Store a response."""
+        with self._lock:
+            self._interactions.setdefault(path, []).append({
+                'status': response.status_code,
+                'content_type': response.headers.get('Content-Type', ''),
+                'body': response.text
+            })
+
+    def _replay(self, path: str) -> requests.Response:
+        """Serve the next recorded response of a path, repeating the last one once exhausted."""
+        with self._lock:
+            inject_error = self.error_rate and self._random.random() < self.error_rate
+            recorded = self._interactions.get(path)
+            if recorded:
+                interaction = recorded[min(self._positions[path], len(recorded) - 1)]
+                self._positions[path] += 1
+            else:
+                interaction = {'status': 404, 'content_type': 'text/plain', 'body': 'Not recorded'}
+
+        if self.latency:
+            time.sleep(self.latency)
+        if inject_error:
+            raise requests.exceptions.ConnectionError(f"Injected error for {path}")
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.headers['Content-Type'] = interaction['content_type']
+        response._content = interaction['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = path
+
+        response.raise_for_status()
+        return response
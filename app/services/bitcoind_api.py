@@ -0,0 +1,476 @@
+"""
+Bitcoin Core backend for SatSentry.
+
+Follows the chain of a local bitcoind and tests every new block against the
+output scripts of all monitored addresses with its BIP158 compact block filter
+(`getblockfilter`, requires `-blockfilterindex=1`). Full blocks are only
+downloaded on a filter match, so catching up after downtime costs one small
+filter per block instead of one history query per address.
+"""
+
+import os
+import json
+import time
+import struct
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+
+from app.btc_addr_gen.utils.serialization import read_varint
+from app.services import address_schedule, metrics
+from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
+from app.services.address_monitor import build_script_index, extend_touched_paths, match_transaction, record_transaction
+from app.services.notification import send_multiple_transaction_notifications
+
+logger = logging.getLogger(__name__)
+
+# BIP158 basic filter parameters
+BASIC_FILTER_P = 19
+BASIC_FILTER_M = 784931
+
+# Number of block hashes and filters requested in one JSON-RPC batch
+FILTER_BATCH_SIZE = 100
+
+# Number of blocks rescanned when the last scanned block left the active chain
+REORG_RESCAN_DEPTH = 6
+
+# Seconds a block timestamp may be ahead of the time the block was actually mined
+BLOCK_TIME_TOLERANCE = 2 * 3600
+
+_MASK_64 = 0xFFFFFFFFFFFFFFFF
+
+def _siphash24(k0: int, k1: int, data: bytes) -> int:
+    """
+    Compute SipHash-2-4 of data.
+
+    Args:
+        k0: First half of the key, as a little-endian integer
+        k1: Second half of the key, as a little-endian integer
+        data: The message
+
+    Returns:
+        The 64-bit hash
+    """
+    v0 = k0 ^ 0x736f6d6570736575
+    v1 = k1 ^ 0x646f72616e646f6d
+    v2 = k0 ^ 0x6c7967656e657261
+    v3 = k1 ^ 0x7465646279746573
+
+    def rounds(count, v0, v1, v2, v3):
+        for _ in range(count):
+            v0 = (v0 + v1) & _MASK_64
+            v1 = ((v1 << 13) | (v1 >> 51)) & _MASK_64
+            v1 ^= v0
+            v0 = ((v0 << 32) | (v0 >> 32)) & _MASK_64
+            v2 = (v2 + v3) & _MASK_64
+            v3 = ((v3 << 16) | (v3 >> 48)) & _MASK_64
+            v3 ^= v2
+            v0 = (v0 + v3) & _MASK_64
+            v3 = ((v3 << 21) | (v3 >> 43)) & _MASK_64
+            v3 ^= v0
+            v2 = (v2 + v1) & _MASK_64
+            v1 = ((v1 << 17) | (v1 >> 47)) & _MASK_64
+            v1 ^= v2
+            v2 = ((v2 << 32) | (v2 >> 32)) & _MASK_64
+        return v0, v1, v2, v3
+
+    tail = len(data) % 8
+    for offset in range(0, len(data) - tail, 8):
+        m = int.from_bytes(data[offset:offset + 8], 'little')
+        v3 ^= m
+        v0, v1, v2, v3 = rounds(2, v0, v1, v2, v3)
+        v0 ^= m
+
+    m = int.from_bytes(data[len(data) - tail:], 'little') | ((len(data) & 0xFF) << 56)
+    v3 ^= m
+    v0, v1, v2, v3 = rounds(2, v0, v1, v2, v3)
+    v0 ^= m
+
+    v2 ^= 0xFF
+    v0, v1, v2, v3 = rounds(4, v0, v1, v2, v3)
+    return v0 ^ v1 ^ v2 ^ v3
+
+def hash_to_range(block_hash: str, item: bytes, n: int) -> int:
+    """
+    Map an item to its value in the filter of a block.
+
+    Args:
+        block_hash: The block hash as hex, in the usual display order
+        item: The filter item (an output script)
+        n: The number of items in the filter
+
+    Returns:
+        The item value in the range [0, n * M)
+    """
+    k0, k1 = struct.unpack('<QQ', bytes.fromhex(block_hash)[::-1][:16])
+    return (_siphash24(k0, k1, item) * n * BASIC_FILTER_M) >> 64
+
+def match_block_filter(filter_hex: str, block_hash: str, scripts: List[bytes]) -> bool:
+    """
+    Test whether any script may be part of a block, using its BIP158 basic filter.
+
+    Args:
+        filter_hex: The serialized filter as returned by getblockfilter
+        block_hash: The block hash as hex
+        scripts: The output scripts to look for
+
+    Returns:
+        True if the filter matches one of the scripts (false positives are possible)
+    """
+    data = bytes.fromhex(filter_hex)
+    n, offset = read_varint(data, 0)
+    if n == 0 or not scripts:
+        return False
+
+    targets = sorted(hash_to_range(block_hash, script, n) for script in scripts)
+
+    # Golomb-Rice decoding of the sorted set deltas, merged with the sorted targets
+    bits = bin(int.from_bytes(data[offset:], 'big'))[2:].zfill((len(data) - offset) * 8)
+    position = 0
+    value = 0
+    target_index = 0
+
+    for _ in range(n):
+        quotient_end = bits.index('0', position)
+        remainder = int(bits[quotient_end + 1:quotient_end + 1 + BASIC_FILTER_P], 2)
+        value += ((quotient_end - position) << BASIC_FILTER_P) | remainder
+        position = quotient_end + 1 + BASIC_FILTER_P
+
+        while targets[target_index] < value:
+            target_index += 1
+            if target_index == len(targets):
+                return False
+        if targets[target_index] == value:
+            return True
+
+    return False
+
+class BitcoindRPC:
+    """Minimal Bitcoin Core JSON-RPC client."""
+
+    def __init__(self, url: str, user: str = '', password: str = '', cookie_file: str = '', timeout: float = 30):
+        """
+        Initialize the client.
+
+        Args:
+            url: The RPC URL, e.g. http://127.0.0.1:8332
+            user: The RPC user
+            password: The RPC password
+            cookie_file: Path to the .cookie file, used instead of user and password when set
+            timeout: Request timeout in seconds
+        """
+        self.url = url
+        self.user = user
+        self.password = password
+        self.cookie_file = cookie_file
+        self.timeout = timeout
+        self._next_id = 0
+
+    def _get_auth(self) -> Optional[Tuple[str, str]]:
+        """Get the RPC credentials, reading the cookie file on every call since bitcoind rotates it."""
+        if self.cookie_file:
+            try:
+                with open(self.cookie_file, 'r') as f:
+                    user, _, password = f.read().strip().partition(':')
+                return user, password
+            except OSError as e:
+                raise ValueError(f"Failed to read bitcoind cookie file: {e}")
+
+        if self.user:
+            return self.user, self.password
+        return None
+
+    def batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """
+        Send several calls in one JSON-RPC batch.
+
+        Args:
+            calls: List of (method, params)
+
+        Returns:
+            List of results in the order of the calls
+
+        Raises:
+            ValueError: If the request fails or bitcoind returns an error for any call
+        """
+        if not calls:
+            return []
+
+        payload = []
+        for method, params in calls:
+            self._next_id += 1
+            payload.append({'jsonrpc': '1.0', 'id': self._next_id, 'method': method, 'params': params})
+
+        labels = {'backend': 'bitcoind', 'endpoint': calls[0][0]}
+        start = time.monotonic()
+        metrics.count_request()
+        try:
+            response = requests.post(self.url, json=payload, auth=self._get_auth(), timeout=self.timeout)
+            metrics.observe('api_request_duration_seconds', time.monotonic() - start, labels)
+            if response.status_code == 401:
+                raise ValueError("bitcoind rejected the RPC credentials")
+            replies = {reply['id']: reply for reply in response.json()}
+        except (requests.exceptions.RequestException, json.JSONDecodeError, TypeError, KeyError) as e:
+            metrics.increment('api_errors_total', {**labels, 'error': type(e).__name__})
+            raise ValueError(f"Error calling bitcoind: {str(e)}")
+
+        results = []
+        for call in payload:
+            reply = replies.get(call['id'])
+            if reply is None:
+                raise ValueError(f"No reply from bitcoind for {call['method']}")
+            if reply.get('error'):
+                raise ValueError(f"bitcoind error for {call['method']}: {reply['error'].get('message')}")
+            results.append(reply.get('result'))
+
+        return results
+
+    def call(self, method: str, *params: Any) -> Any:
+        """Send a single call and return its result."""
+        return self.batch([(method, list(params))])[0]
+
+def _convert_output(output: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a bitcoind output (or prevout) to the esplora format."""
+    script_pubkey = output.get('scriptPubKey', {})
+    return {
+        'scriptpubkey': script_pubkey.get('hex'),
+        'scriptpubkey_address': script_pubkey.get('address'),
+        'value': round(output.get('value', 0) * 100_000_000)
+    }
+
+def _convert_transaction(tx: Dict[str, Any], block: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a transaction of a verbosity 3 getblock result to the esplora format.
+
+    Args:
+        tx: The transaction, with the prevout of every input
+        block: The block containing the transaction
+
+    Returns:
+        Esplora-like transaction dictionary
+    """
+    return {
+        'txid': tx['txid'],
+        'vin': [
+            {
+                'txid': vin.get('txid'),
+                'vout': vin.get('vout'),
+                'prevout': _convert_output(vin['prevout']) if vin.get('prevout') else None
+            }
+            for vin in tx.get('vin', [])
+        ],
+        'vout': [_convert_output(output) for output in tx.get('vout', [])],
+        'status': {
+            'confirmed': True,
+            'block_height': block.get('height'),
+            'block_hash': block.get('hash'),
+            'block_time': block.get('time')
+        }
+    }
+
+class BitcoindBackend:
+    """Singleton backend scanning new blocks of a local bitcoind through compact block filters."""
+
+    _instance: Optional['BitcoindBackend'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'BitcoindBackend':
+        """Get or create the backend instance."""
+        if cls._instance is None:
+            cls._instance = BitcoindBackend()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the backend."""
+        if BitcoindBackend._instance is not None:
+            raise RuntimeError("Bitcoin Core backend is a singleton. Use get_instance() instead.")
+
+        self._thread = None
+        self._running = False
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        """Load the last scanned block from file."""
+        state_file = get_file_path('bitcoind_scanner_file')
+        if not os.path.exists(state_file):
+            return None
+
+        try:
+            with open(state_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading bitcoind scanner state: {e}")
+            return None
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        """Save the last scanned block to file."""
+        os.makedirs(get_file_path('data_dir'), exist_ok=True)
+
+        try:
+            state_file = get_file_path('bitcoind_scanner_file')
+            start = time.monotonic()
+            with open(state_file, 'w') as f:
+                json.dump(state, f, indent=4)
+            metrics.record_flush(state_file, start)
+        except Exception as e:
+            logger.error(f"Error saving bitcoind scanner state: {e}")
+            raise ValueError(f"Failed to save bitcoind scanner state: {e}")
+
+    def _get_rpc(self) -> BitcoindRPC:
+        """Create an RPC client from the settings."""
+        settings = get_settings()
+        return BitcoindRPC(
+            settings.get('bitcoind_url', DEFAULT_SETTINGS['bitcoind_url']),
+            settings.get('bitcoind_user', DEFAULT_SETTINGS['bitcoind_user']),
+            settings.get('bitcoind_password', DEFAULT_SETTINGS['bitcoind_password']),
+            settings.get('bitcoind_cookie_file', DEFAULT_SETTINGS['bitcoind_cookie_file']),
+        )
+
+    def _seed_state(self, rpc: BitcoindRPC, tip_height: int) -> Dict[str, Any]:
+        """
+        Get the block a first scan starts after.
+
+        When the addresses were polled before (e.g. with another backend), the blocks
+        mined since the last check are scanned, so switching backends misses nothing.
+        Otherwise there is nothing to catch up with and the scan starts at the tip.
+
+        Args:
+            rpc: The RPC client
+            tip_height: The height of the chain tip
+
+        Returns:
+            The scanner state to start from
+        """
+        height = tip_height
+        last_check = address_schedule.AddressSchedule.get_instance().get_last_check_time()
+        if last_check is not None:
+            # Last block whose timestamp is before the last check, allowing for timestamps ahead of time
+            since = last_check - BLOCK_TIME_TOLERANCE
+            low, high = 0, tip_height
+            while low < high:
+                middle = (low + high + 1) // 2
+                if rpc.call('getblockheader', rpc.call('getblockhash', middle))['time'] < since:
+                    low = middle
+                else:
+                    high = middle - 1
+            height = low
+
+        logger.info(f"No bitcoind scanner state found, starting after height {height} (tip at {tip_height})")
+        return {'height': height, 'hash': rpc.call('getblockhash', height)}
+
+    def scan_new_blocks(self) -> List[Dict[str, Any]]:
+        """
+        Scan the blocks mined since the last scanned height.
+
+        On the first run the scan starts from the last polling check of any address,
+        see _seed_state().
+
+        Returns:
+            List of check results for new transactions
+        """
+        rpc = self._get_rpc()
+        tip_height = rpc.call('getblockcount')
+        state = self._load_state()
+
+        if not state:
+            state = self._seed_state(rpc, tip_height)
+            self._save_state(state)
+
+        start_height = state['height'] + 1
+        if state['height'] <= tip_height and rpc.call('getblockhash', state['height']) != state.get('hash'):
+            start_height = max(state['height'] - REORG_RESCAN_DEPTH, 0)
+            logger.warning(f"Chain reorganization detected, rescanning from height {start_height}")
+
+        if start_height > tip_height:
+            return []
+
+        script_index = build_script_index()
+        scripts = [bytes.fromhex(script) for script in script_index]
+        logger.info(f"Scanning filters of blocks {start_height}-{tip_height} for {len(scripts)} monitored scripts")
+
+        results = []
+        for chunk_start in range(start_height, tip_height + 1, FILTER_BATCH_SIZE):
+            heights = range(chunk_start, min(chunk_start + FILTER_BATCH_SIZE, tip_height + 1))
+            hashes = rpc.batch([('getblockhash', [height]) for height in heights])
+            filters = rpc.batch([('getblockfilter', [block_hash, 'basic']) for block_hash in hashes])
+
+            for block_hash, block_filter in zip(hashes, filters):
+                if not match_block_filter(block_filter['filter'], block_hash, scripts):
+                    continue
+
+                block = rpc.call('getblock', block_hash, 3)
+                block_results = self._scan_block(block, script_index)
+                results.extend(block_results)
+                while extend_touched_paths(block_results, script_index):
+                    # Match the addresses derived past the used ones in this block and the next ones
+                    script_index = build_script_index()
+                    scripts = [bytes.fromhex(script) for script in script_index]
+                    block_results = self._scan_block(block, script_index)
+                    results.extend(block_results)
+
+            # Checkpoint after every batch so a restart resumes where we stopped
+            self._save_state({'height': heights[-1], 'hash': hashes[-1]})
+
+        return results
+
+    def _scan_block(self, block: Dict[str, Any], script_index: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Match the transactions of a block against the monitored scripts.
+
+        Args:
+            block: The block as returned by getblock with verbosity 3
+            script_index: Index built by build_script_index
+
+        Returns:
+            List of check results for the new transactions found in the block
+        """
+        results = []
+        for tx in block.get('tx', []):
+            tx = _convert_transaction(tx, block)
+            for script in match_transaction(tx, script_index):
+                entry = script_index[script]
+                result = record_transaction(entry['address'], entry['metadata'], tx)
+                if result:
+                    results.append(result)
+        return results
+
+    def start(self) -> bool:
+        """Start the backend thread."""
+        if self._thread and self._thread.is_alive():
+            logger.warning("Bitcoin Core backend already running")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._scan_task)
+        self._thread.daemon = True
+        self._thread.start()
+
+        logger.info("Bitcoin Core backend started")
+        return True
+
+    def stop(self) -> None:
+        """Stop the backend thread."""
+        self._running = False
+
+    def _scan_task(self):
+        """Background task polling bitcoind for new blocks."""
+        while self._running:
+            try:
+                results = self.scan_new_blocks()
+                if results:
+                    logger.info(f"Found {len(results)} new transactions through bitcoind")
+                    if not send_multiple_transaction_notifications(results):
+                        logger.error("Failed to send bitcoind notifications")
+            except Exception as e:
+                logger.error(f"Error scanning blocks with bitcoind: {e}")
+
+            settings = get_settings()
+            time.sleep(max(settings.get('bitcoind_poll_interval', DEFAULT_SETTINGS['bitcoind_poll_interval']), 1))
+
+def start_bitcoind_backend() -> bool:
+    """Start the Bitcoin Core backend if it is selected in the settings."""
+    settings = get_settings()
+    if settings.get('chain_backend', DEFAULT_SETTINGS['chain_backend']) != 'bitcoind':
+        return False
+    return BitcoindBackend.get_instance().start()
@@ -0,0 +1,189 @@
+"""
+Block scanning service for SatSentry.
+
+Instead of polling every monitored address, this follows the chain tip and
+matches the outputs and spent prevouts of each new block against an index of
+the output scripts of all monitored addresses. The cost of a scan depends on
+the size of the new blocks, not on the number of watched addresses.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional
+
+from app.services import mempool_api, metrics
+from app.services.address_monitor import (
+    build_script_index, check_all_addresses, extend_touched_paths, match_transaction, record_transaction
+)
+from app.services.settings import get_file_path
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of blocks scanned in a single scan, the next scan continues from there
+MAX_BLOCKS_PER_SCAN = 144
+
+# Recently scanned blocks remembered, to find where the chain forked after a reorganization
+RECENT_BLOCKS_KEPT = 12
+
+def _load_state() -> Optional[Dict[str, Any]]:
+    """Load the last scanned block from file."""
+    state_file = get_file_path('block_scanner_file')
+    if not os.path.exists(state_file):
+        return None
+
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading block scanner state: {e}")
+        return None
+
+def _save_state(state: Dict[str, Any]) -> None:
+    """Save the last scanned block to file."""
+    os.makedirs(get_file_path('data_dir'), exist_ok=True)
+
+    try:
+        state_file = get_file_path('block_scanner_file')
+        start = time.monotonic()
+        with open(state_file, 'w') as f:
+            json.dump(state, f, indent=4)
+        metrics.record_flush(state_file, start)
+    except Exception as e:
+        logger.error(f"Error saving block scanner state: {e}")
+        raise ValueError(f"Failed to save block scanner state: {e}")
+
+def _get_recent_blocks(state: Dict[str, Any]) -> List[List[Any]]:
+    """Get the recently scanned blocks of a state as [height, hash] pairs, oldest first."""
+    if 'recent' in state:
+        return state['recent']
+    if state.get('hash'):  # Old format - last scanned block only
+        return [[state.get('height'), state['hash']]]
+    return []
+
+def _next_state(state: Dict[str, Any], block: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get the scanner state once a block was scanned.
+
+    Args:
+        state: The state before the block
+        block: The scanned block
+
+    Returns:
+        The new state, remembering the block among the recently scanned ones
+    """
+    recent = [pair for pair in _get_recent_blocks(state) if pair[0] < block['height']]
+    recent.append([block['height'], block['id']])
+    return {'hash': block['id'], 'height': block['height'], 'recent': recent[-RECENT_BLOCKS_KEPT:]}
+
+def _find_fork_point(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Find the most recently scanned block still in the active chain after a reorganization.
+
+    Args:
+        state: The scanner state whose last block left the active chain
+
+    Returns:
+        The state to rescan from, None if none of the remembered blocks is left
+    """
+    recent = _get_recent_blocks(state)
+    for index in range(len(recent) - 1, -1, -1):
+        height, block_hash = recent[index]
+        if mempool_api.get_block_hash(height) == block_hash:
+            return {'hash': block_hash, 'height': height, 'recent': recent[:index + 1]}
+    return None
+
+def scan_block(block: Dict[str, Any], script_index: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Scan all transactions of a block for monitored addresses.
+
+    Args:
+        block: The block information (id and tx_count)
+        script_index: Index built by build_script_index
+
+    Returns:
+        List of check results for the new transactions found in the block
+    """
+    results = []
+    block_hash = block['id']
+
+    for start_index in range(0, block.get('tx_count', 0), mempool_api.BLOCK_TXS_PAGE_SIZE):
+        for tx in mempool_api.get_block_transactions(block_hash, start_index):
+            for script in match_transaction(tx, script_index):
+                entry = script_index[script]
+                result = record_transaction(entry['address'], entry['metadata'], tx)
+                if result:
+                    results.append(result)
+
+    return results
+
+def scan_new_blocks() -> List[Dict[str, Any]]:
+    """
+    Scan the blocks mined since the last scan for monitored addresses.
+
+    Blocks are scanned forward from the last scanned one, at most
+    MAX_BLOCKS_PER_SCAN per scan. After a reorganization the scan resumes from
+    the last remembered block still in the active chain.
+
+    On the first run there is no previous block to start from, so every address
+    is checked once and the current tip becomes the starting point. The same
+    happens after a reorganization deeper than the remembered blocks.
+
+    Returns:
+        List of check results for addresses with new transactions
+    """
+    tip_hash = mempool_api.get_tip_hash()
+    state = _load_state()
+
+    if not state:
+        logger.info("No block scanner state found, checking all addresses once")
+        results = check_all_addresses()
+        _save_state(_next_state({}, mempool_api.get_block(tip_hash)))
+        return results
+
+    if tip_hash == state.get('hash'):
+        return []
+
+    tip_height = mempool_api.get_block(tip_hash).get('height', 0)
+    script_index = build_script_index()
+    logger.info(f"Scanning blocks {state.get('height', 0) + 1}-{tip_height} for {len(script_index)} monitored addresses")
+
+    results = []
+    for _ in range(MAX_BLOCKS_PER_SCAN):
+        if state.get('hash') == tip_hash:
+            break
+
+        block = None
+        if state.get('height', 0) < tip_height:
+            block = mempool_api.get_block(mempool_api.get_block_hash(state.get('height', 0) + 1))
+
+        if block is None or block.get('previousblockhash') != state.get('hash'):
+            # The last scanned block left the active chain
+            fork_state = _find_fork_point(state)
+            if fork_state is None:
+                logger.warning("Chain reorganization deeper than the remembered blocks, checking all addresses")
+                results.extend(check_all_addresses())
+                _save_state(_next_state({}, mempool_api.get_block(tip_hash)))
+                return results
+
+            logger.warning(f"Chain reorganization detected, rescanning from height {fork_state['height'] + 1}")
+            state = fork_state
+            continue
+
+        block_results = scan_block(block, script_index)
+        results.extend(block_results)
+        while extend_touched_paths(block_results, script_index):
+            # Index the addresses derived past the used ones, this block may already pay them
+            script_index = build_script_index()
+            block_results = scan_block(block, script_index)
+            results.extend(block_results)
+
+        # Checkpoint after every block so a restart resumes where we stopped
+        state = _next_state(state, block)
+        _save_state(state)
+
+    if state.get('hash') != tip_hash:
+        logger.info(f"Scanned up to height {state.get('height')}, the next scan continues towards the tip at {tip_height}")
+
+    return results
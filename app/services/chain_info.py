@@ -0,0 +1,141 @@
+"""
+Chain information cache for SatSentry.
+
+Fee estimates and the chain tip change at most once per block (fees a bit more
+often), yet every notification used to fetch them again. This cache serves
+them from memory and refreshes them in the background: the tip hash is polled
+every few seconds, and the other values are only fetched again when a new block
+arrived or their time to live expired.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from app.services import mempool_api
+from app.services.settings import get_settings, DEFAULT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+class ChainInfoCache:
+    """Singleton cache of the fee estimates, tip height and tip hash."""
+
+    _instance: Optional['ChainInfoCache'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'ChainInfoCache':
+        """Get or create the cache instance."""
+        if cls._instance is None:
+            cls._instance = ChainInfoCache()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the cache."""
+        if ChainInfoCache._instance is not None:
+            raise RuntimeError("Chain info cache is a singleton. Use get_instance() instead.")
+
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._values: Dict[str, Tuple[float, Any]] = {}  # Key to (fetch time, value)
+
+    def _get_ttl(self) -> int:
+        """Get the time to live of the cached values."""
+        settings = get_settings()
+        return settings.get('chain_info_ttl', DEFAULT_SETTINGS['chain_info_ttl'])
+
+    def _get(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """
+        Get a cached value, fetching it when missing or expired.
+
+        Raises:
+            ValueError: If the value has to be fetched and the API request fails
+        """
+        with self._lock:
+            cached = self._values.get(key)
+        if cached and time.monotonic() - cached[0] < self._get_ttl():
+            return cached[1]
+
+        value = fetch()
+        with self._lock:
+            self._values[key] = (time.monotonic(), value)
+        return value
+
+    def get_fee_estimates(self) -> Dict[str, int]:
+        """Get the recommended fees."""
+        return self._get('fee_estimates', mempool_api.get_fee_estimates)
+
+    def get_tip_height(self) -> int:
+        """Get the height of the chain tip."""
+        return self._get('tip_height', mempool_api.get_tip_height)
+
+    def get_tip_hash(self) -> str:
+        """Get the hash of the chain tip."""
+        return self._get('tip_hash', mempool_api.get_tip_hash)
+
+    def refresh(self) -> None:
+        """
+        Poll the tip hash and refresh the other values on a new block.
+
+        Raises:
+            ValueError: If an API request fails
+        """
+        tip_hash = mempool_api.get_tip_hash()
+        with self._lock:
+            previous = self._values.get('tip_hash')
+            self._values['tip_hash'] = (time.monotonic(), tip_hash)
+
+            # A new block makes the height and fee estimates stale
+            if previous and previous[1] != tip_hash:
+                logger.debug(f"New chain tip {tip_hash}, invalidating cached chain info")
+                self._values.pop('tip_height', None)
+                self._values.pop('fee_estimates', None)
+
+        self.get_tip_height()
+        self.get_fee_estimates()
+
+    def start(self) -> bool:
+        """Start the background refresh thread."""
+        if self._thread and self._thread.is_alive():
+            logger.warning("Chain info cache already running")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._refresh_task)
+        self._thread.daemon = True
+        self._thread.start()
+
+        logger.info("Chain info cache started")
+        return True
+
+    def stop(self) -> None:
+        """Stop the background refresh thread."""
+        self._running = False
+
+    def _refresh_task(self):
+        """Background task keeping the cached values fresh."""
+        while self._running:
+            try:
+                self.refresh()
+            except ValueError as e:
+                logger.warning(f"Error refreshing chain info: {e}")
+
+            settings = get_settings()
+            time.sleep(max(settings.get('chain_info_refresh_interval', DEFAULT_SETTINGS['chain_info_refresh_interval']), 1))
+
+def get_fee_estimates() -> Dict[str, int]:
+    """Get the cached recommended fees."""
+    return ChainInfoCache.get_instance().get_fee_estimates()
+
+def get_tip_height() -> int:
+    """Get the cached height of the chain tip."""
+    return ChainInfoCache.get_instance().get_tip_height()
+
+def get_tip_hash() -> str:
+    """Get the cached hash of the chain tip."""
+    return ChainInfoCache.get_instance().get_tip_hash()
+
+def start_chain_info_cache() -> bool:
+    """Start the background refresh of the chain info cache."""
+    return ChainInfoCache.get_instance().start()
@@ -0,0 +1,239 @@
+"""
+Confirmation tracker for SatSentry.
+
+Transactions of monitored addresses seen unconfirmed are kept in a small set
+and rechecked with /tx/{txid}/status whenever the chain tip moves, instead of
+waiting for the next poll of their address. A transaction reaching a
+confirmation milestone (1, 3 and 6 confirmations by default) emits an event
+for the notifier, and is dropped once it reached the last one.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+from app.services import chain_info, mempool_api, metrics, profiler
+from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Transactions still unconfirmed after this long were evicted or replaced and are dropped
+MAX_UNCONFIRMED_AGE = 14 * 86400
+
+class ConfirmationTracker:
+    """Singleton tracker of the unconfirmed transactions of monitored addresses."""
+
+    _instance: Optional['ConfirmationTracker'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'ConfirmationTracker':
+        """Get or create the tracker instance."""
+        if cls._instance is None:
+            cls._instance = ConfirmationTracker()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the tracker."""
+        if ConfirmationTracker._instance is not None:
+            raise RuntimeError("Confirmation tracker is a singleton. Use get_instance() instead.")
+
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._pending: Optional[Dict[str, Dict[str, Any]]] = None  # Txid to tracking entry
+        self._tip_height: Optional[int] = None  # Chain tip of the last poll
+
+    def _get_pending(self) -> Dict[str, Dict[str, Any]]:
+        """Get the tracked transactions, loading them from file on first use. Must be called with the lock held."""
+        if self._pending is None:
+            self._pending = {}
+            pending_file = get_file_path('pending_transactions_file')
+            if os.path.exists(pending_file):
+                try:
+                    with profiler.phase('load_state'), open(pending_file, 'r') as f:
+                        self._pending = json.load(f)
+                except Exception as e:
+                    logger.error(f"Error loading pending transactions: {e}")
+        return self._pending
+
+    def _save(self) -> None:
+        """Save the tracked transactions to file."""
+        with self._lock:
+            pending = {txid: dict(entry) for txid, entry in self._get_pending().items()}
+
+        os.makedirs(get_file_path('data_dir'), exist_ok=True)
+        try:
+            pending_file = get_file_path('pending_transactions_file')
+            start = time.monotonic()
+            with profiler.phase('disk_save'), open(pending_file, 'w') as f:
+                json.dump(pending, f, indent=2)
+            metrics.record_flush(pending_file, start)
+        except Exception as e:
+            logger.error(f"Error saving pending transactions: {e}")
+
+    def track(self, address: str, label: str, txid: str, direction: str) -> bool:
+        """
+        Start tracking a transaction seen unconfirmed.
+
+        Args:
+            address: The monitored address touched by the transaction
+            label: The address label
+            txid: The transaction ID
+            direction: 'incoming' or 'outgoing'
+
+        Returns:
+            True if the transaction was not tracked yet
+        """
+        settings = get_settings()
+        if not settings.get('confirmation_tracking_enabled', DEFAULT_SETTINGS['confirmation_tracking_enabled']):
+            return False
+
+        with self._lock:
+            pending = self._get_pending()
+            if txid in pending:
+                return False
+            pending[txid] = {
+                'address': address,
+                'label': label,
+                'direction': direction,
+                'first_seen': time.time(),
+                'block_height': None,
+                'milestones': []
+            }
+
+        logger.info(f"Tracking confirmations of transaction {txid}")
+        self._save()
+        return True
+
+    def get_pending_transactions(self) -> List[Dict[str, Any]]:
+        """
+        Get the tracked transactions.
+
+        Returns:
+            List of tracked transactions with their txid, oldest first
+        """
+        with self._lock:
+            pending = self._get_pending()
+            return sorted(({'txid': txid, **entry} for txid, entry in pending.items()),
+                          key=lambda entry: entry['first_seen'])
+
+    def poll_once(self) -> List[Dict[str, Any]]:
+        """
+        Recheck the tracked transactions if a block arrived since the last poll.
+
+        Returns:
+            List of milestone events, one per transaction that reached new milestones,
+            with the transaction info, its confirmations and the highest milestone reached
+
+        Raises:
+            ValueError: If the chain tip cannot be fetched
+        """
+        settings = get_settings()
+        milestones = sorted(settings.get('confirmation_milestones', DEFAULT_SETTINGS['confirmation_milestones']))
+
+        # Confirmations only change with a new block
+        tip_height = chain_info.get_tip_height()
+        with self._lock:
+            tracked = {txid: dict(entry) for txid, entry in self._get_pending().items()}
+        if not tracked or tip_height == self._tip_height:
+            return []
+
+        statuses = {}
+        for txid in tracked:
+            try:
+                statuses[txid] = mempool_api.get_transaction_status(txid)
+            except ValueError:
+                continue
+
+        events = []
+        now = time.time()
+        with self._lock:
+            pending = self._get_pending()
+            for txid, entry in tracked.items():
+                if txid not in pending:
+                    continue
+
+                status = statuses.get(txid)
+                if status is None:
+                    if now - entry['first_seen'] > MAX_UNCONFIRMED_AGE:
+                        logger.info(f"Transaction {txid} vanished, no longer tracking it")
+                        del pending[txid]
+                    continue
+
+                # A reorg can unconfirm a transaction again
+                block_height = status.get('block_height') if status.get('confirmed') else None
+                confirmations = tip_height - block_height + 1 if block_height is not None else 0
+                reached = [milestone for milestone in milestones
+                           if milestone <= confirmations and milestone not in entry['milestones']]
+
+                entry['block_height'] = block_height
+                entry['milestones'] = entry['milestones'] + reached
+                pending[txid] = entry
+
+                if reached:
+                    events.append({'txid': txid, **entry, 'confirmations': confirmations, 'milestone': reached[-1]})
+
+                if confirmations >= milestones[-1] or (block_height is None and now - entry['first_seen'] > MAX_UNCONFIRMED_AGE):
+                    del pending[txid]
+            remaining = len(pending)
+
+        # Retried at the same tip when no status could be fetched
+        if statuses:
+            self._tip_height = tip_height
+        self._save()
+        metrics.set_gauge('pending_transactions', remaining)
+        return events
+
+    def start(self) -> bool:
+        """Start the confirmation tracker thread."""
+        if self._thread and self._thread.is_alive():
+            logger.warning("Confirmation tracker already running")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._track_task)
+        self._thread.daemon = True
+        self._thread.start()
+
+        logger.info("Confirmation tracker started")
+        return True
+
+    def stop(self) -> None:
+        """Stop the confirmation tracker thread."""
+        self._running = False
+
+    def _track_task(self):
+        """Background task rechecking the tracked transactions."""
+        # Imported here: the notification service depends on address_monitor, which feeds this tracker
+        from app.services.notification import send_confirmation_notifications
+
+        while self._running:
+            settings = get_settings()
+            if settings.get('confirmation_tracking_enabled', DEFAULT_SETTINGS['confirmation_tracking_enabled']):
+                try:
+                    events = self.poll_once()
+                    if events:
+                        logger.info(f"{len(events)} tracked transactions reached a confirmation milestone")
+                        if send_confirmation_notifications(events):
+                            logger.info(f"Successfully sent confirmation notifications for {len(events)} transactions")
+                        else:
+                            logger.error("Failed to send confirmation notifications")
+                except Exception as e:
+                    logger.error(f"Error tracking confirmations: {e}")
+
+            time.sleep(max(settings.get('confirmation_check_interval', DEFAULT_SETTINGS['confirmation_check_interval']), 1))
+
+def track(address: str, label: str, txid: str, direction: str) -> bool:
+    """Start tracking a transaction seen unconfirmed."""
+    return ConfirmationTracker.get_instance().track(address, label, txid, direction)
+
+def get_pending_transactions() -> List[Dict[str, Any]]:
+    """Get the transactions waiting for their confirmation milestones."""
+    return ConfirmationTracker.get_instance().get_pending_transactions()
+
+def start_confirmation_tracker() -> bool:
+    """Start the confirmation tracker."""
+    return ConfirmationTracker.get_instance().start()
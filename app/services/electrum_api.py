@@ -0,0 +1,548 @@
+"""
+Electrum protocol backend for SatSentry.
+
+Watches every monitored address through a single persistent connection to an
+Electrum server (electrs, Fulcrum, ...). Addresses are subscribed by scripthash
+in JSON-RPC batches; only scripthashes whose status hash changed are queried
+again, so one connection can watch tens of thousands of addresses.
+"""
+
+import os
+import ssl
+import json
+import time
+import socket
+import struct
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.btc_addr_gen.utils.serialization import read_varint
+from app.services import metrics
+from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
+from app.services.address_monitor import build_script_index, record_transaction
+from app.services.notification import send_multiple_transaction_notifications
+
+logger = logging.getLogger(__name__)
+
+# Electrum protocol version requested from the server
+PROTOCOL_VERSION = '1.4'
+
+# Seconds without any message before the connection is pinged
+PING_INTERVAL = 60
+
+# How often the monitored addresses are reloaded to subscribe new ones
+INDEX_REFRESH_SECONDS = 60
+
+# Maximum delay between reconnection attempts
+MAX_RECONNECT_DELAY = 60
+
+def script_to_scripthash(script_hex: str) -> str:
+    """
+    Compute the Electrum scripthash of an output script.
+
+    Args:
+        script_hex: The scriptPubKey as hex
+
+    Returns:
+        The reversed SHA256 of the script, as hex
+    """
+    return hashlib.sha256(bytes.fromhex(script_hex)).digest()[::-1].hex()
+
+def parse_transaction(raw_hex: str) -> Dict[str, Any]:
+    """
+    Parse the inputs and outputs of a raw transaction.
+
+    Args:
+        raw_hex: The serialized transaction as hex
+
+    Returns:
+        Dictionary with 'vin' (txid and vout of each spent output) and 'vout'
+        (scriptpubkey hex and value of each output)
+    """
+    data = bytes.fromhex(raw_hex)
+    offset = 4  # version
+
+    # Segwit marker and flag
+    if data[offset] == 0 and data[offset + 1] == 1:
+        offset += 2
+
+    vin = []
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        prev_txid = data[offset:offset + 32][::-1].hex()
+        prev_vout = struct.unpack_from('<I', data, offset + 32)[0]
+        script_len, offset = read_varint(data, offset + 36)
+        offset += script_len + 4  # script_sig and sequence
+        vin.append({'txid': prev_txid, 'vout': prev_vout, 'is_coinbase': prev_txid == '0' * 64})
+
+    vout = []
+    count, offset = read_varint(data, offset)
+    for _ in range(count):
+        value = struct.unpack_from('<Q', data, offset)[0]
+        script_len, offset = read_varint(data, offset + 8)
+        vout.append({'scriptpubkey': data[offset:offset + script_len].hex(), 'value': value})
+        offset += script_len
+
+    return {'vin': vin, 'vout': vout}
+
+class ElectrumClient:
+    """Minimal blocking Electrum JSON-RPC client over a single TCP connection."""
+
+    def __init__(self, host: str, port: int, use_ssl: bool = False, timeout: float = PING_INTERVAL):
+        """
+        Initialize the client.
+
+        Args:
+            host: The Electrum server host
+            port: The Electrum server port
+            use_ssl: Whether to use TLS
+            timeout: Socket read timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._sock = None
+        self._buffer = b''
+        self._next_id = 0
+        self._notifications: List[Dict[str, Any]] = []
+
+    def connect(self) -> None:
+        """Open the connection and negotiate the protocol version."""
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self.use_ssl:
+            # Electrum servers commonly use self-signed certificates
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=self.host)
+        self._sock = sock
+        self.call('server.version', ['SatSentry', PROTOCOL_VERSION])
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def _read_message(self) -> Any:
+        """Read one newline-delimited JSON message."""
+        while b'\n' not in self._buffer:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("Electrum connection closed")
+            self._buffer += chunk
+
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def batch(self, calls: List[Tuple[str, List[Any]]], return_errors: bool = False) -> List[Any]:
+        """
+        Send several requests in one JSON-RPC batch.
+
+        Args:
+            calls: List of (method, params)
+            return_errors: Put a ValueError in place of the result of a failed call instead of raising
+
+        Returns:
+            List of results in the order of the calls
+
+        Raises:
+            ValueError: If the server returns an error for any call, unless return_errors is set
+        """
+        if not calls:
+            return []
+
+        requests_by_id = {}
+        payload = []
+        for method, params in calls:
+            self._next_id += 1
+            requests_by_id[self._next_id] = len(payload)
+            payload.append({'jsonrpc': '2.0', 'id': self._next_id, 'method': method, 'params': params})
+
+        start = time.monotonic()
+        metrics.count_request()
+        self._sock.sendall(json.dumps(payload if len(payload) > 1 else payload[0]).encode() + b'\n')
+
+        results: List[Any] = [None] * len(payload)
+        pending = set(requests_by_id)
+        while pending:
+            message = self._read_message()
+            for item in message if isinstance(message, list) else [message]:
+                if 'method' in item and 'id' not in item:
+                    self._notifications.append(item)
+                elif item.get('id') in pending:
+                    index = requests_by_id[item['id']]
+                    pending.discard(item['id'])
+                    if item.get('error'):
+                        error = ValueError(f"Electrum error for {payload[index]['method']}: {item['error']}")
+                        if not return_errors:
+                            raise error
+                        results[index] = error
+                    else:
+                        results[index] = item.get('result')
+
+        metrics.observe('api_request_duration_seconds', time.monotonic() - start,
+                        {'backend': 'electrum', 'endpoint': calls[0][0]})
+        return results
+
+    def call(self, method: str, params: List[Any]) -> Any:
+        """Send a single request and return its result."""
+        return self.batch([(method, params)])[0]
+
+    def read_notification(self) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next server notification.
+
+        Returns:
+            The notification, or None if nothing arrived before the timeout
+        """
+        if self._notifications:
+            return self._notifications.pop(0)
+
+        try:
+            message = self._read_message()
+        except socket.timeout:
+            return None
+
+        for item in message if isinstance(message, list) else [message]:
+            if 'method' in item:
+                self._notifications.append(item)
+
+        return self._notifications.pop(0) if self._notifications else None
+
+    def drain_notifications(self) -> List[Dict[str, Any]]:
+        """Return and clear the notifications already received."""
+        notifications, self._notifications = self._notifications, []
+        return notifications
+
+class ElectrumBackend:
+    """
+    Singleton backend keeping all monitored scripthashes subscribed on an Electrum server.
+
+    The last known status hash of every scripthash is persisted, so after a restart
+    only the scripthashes that changed in the meantime are queried.
+    """
+
+    _instance: Optional['ElectrumBackend'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'ElectrumBackend':
+        """Get or create the backend instance."""
+        if cls._instance is None:
+            cls._instance = ElectrumBackend()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the backend."""
+        if ElectrumBackend._instance is not None:
+            raise RuntimeError("Electrum backend is a singleton. Use get_instance() instead.")
+
+        self._thread = None
+        self._running = False
+        self._client: Optional[ElectrumClient] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}  # Scripthash to script index entry
+        self._subscribed: set = set()
+        self._statuses: Dict[str, Optional[str]] = self._load_statuses()
+        self._index_built_at = 0.0
+
+    def _load_statuses(self) -> Dict[str, Optional[str]]:
+        """Load the last known status hashes from file."""
+        status_file = get_file_path('electrum_status_file')
+        if not os.path.exists(status_file):
+            return {}
+
+        try:
+            with open(status_file, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading Electrum statuses: {e}")
+            return {}
+
+    def _save_statuses(self) -> None:
+        """Save the last known status hashes to file."""
+        os.makedirs(get_file_path('data_dir'), exist_ok=True)
+
+        try:
+            status_file = get_file_path('electrum_status_file')
+            start = time.monotonic()
+            with open(status_file, 'w') as f:
+                json.dump(self._statuses, f)
+            metrics.record_flush(status_file, start)
+        except Exception as e:
+            logger.error(f"Error saving Electrum statuses: {e}")
+
+    def start(self) -> bool:
+        """Start the backend thread."""
+        if self._thread and self._thread.is_alive():
+            logger.warning("Electrum backend already running")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._watch_task)
+        self._thread.daemon = True
+        self._thread.start()
+
+        logger.info("Electrum backend started")
+        return True
+
+    def stop(self) -> None:
+        """Stop the backend thread."""
+        self._running = False
+
+    def connect(self) -> None:
+        """Connect to the Electrum server configured in the settings."""
+        settings = get_settings()
+        self._client = ElectrumClient(
+            settings.get('electrum_host', DEFAULT_SETTINGS['electrum_host']),
+            settings.get('electrum_port', DEFAULT_SETTINGS['electrum_port']),
+            settings.get('electrum_ssl', DEFAULT_SETTINGS['electrum_ssl']),
+        )
+        self._client.connect()
+        self._subscribed = set()
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._client:
+            self._client.close()
+            self._client = None
+
+    def subscribe_all(self) -> List[Dict[str, Any]]:
+        """
+        Subscribe every monitored scripthash not subscribed yet on this connection.
+
+        Returns:
+            List of check results for scripthashes whose status changed since last known
+        """
+        settings = get_settings()
+        batch_size = max(settings.get('electrum_batch_size', DEFAULT_SETTINGS['electrum_batch_size']), 1)
+
+        self._entries = {
+            script_to_scripthash(script): {**entry, 'script': script}
+            for script, entry in build_script_index().items()
+        }
+        self._index_built_at = time.monotonic()
+        pending = [scripthash for scripthash in self._entries if scripthash not in self._subscribed]
+
+        changed = []
+        for i in range(0, len(pending), batch_size):
+            chunk = pending[i:i + batch_size]
+            statuses = self._client.batch([('blockchain.scripthash.subscribe', [sh]) for sh in chunk], return_errors=True)
+            for scripthash, status in zip(chunk, statuses):
+                if isinstance(status, ValueError):
+                    # Retried when the index is refreshed, the other subscriptions go on
+                    logger.warning(f"Cannot subscribe to {self._entries[scripthash]['address']}: {status}")
+                    continue
+                self._subscribed.add(scripthash)
+                if self._statuses.get(scripthash) != status:
+                    changed.append((scripthash, status))
+
+        if pending:
+            logger.info(f"Subscribed {len(pending)} scripthashes, {len(changed)} changed since last known status")
+
+        return self._process_changes(changed)
+
+    def process_notifications(self) -> List[Dict[str, Any]]:
+        """
+        Wait for status notifications and query the changed scripthashes.
+
+        Returns:
+            List of check results for new transactions
+        """
+        notification = self._client.read_notification()
+        if notification is None:
+            self._client.call('server.ping', [])
+            return []
+
+        changed = []
+        for item in [notification] + self._client.drain_notifications():
+            if item.get('method') == 'blockchain.scripthash.subscribe':
+                scripthash, status = item['params']
+                if self._statuses.get(scripthash) != status:
+                    changed.append((scripthash, status))
+
+        return self._process_changes(changed)
+
+    def _process_changes(self, changed: List[Tuple[str, Optional[str]]]) -> List[Dict[str, Any]]:
+        """
+        Fetch the history of changed scripthashes and record their new transactions.
+
+        Args:
+            changed: List of (scripthash, new status)
+
+        Returns:
+            List of check results for new transactions
+        """
+        changed = [(sh, status) for sh, status in changed if sh in self._entries]
+        if not changed:
+            return []
+
+        histories = self._client.batch([('blockchain.scripthash.get_history', [sh]) for sh, _ in changed], return_errors=True)
+
+        # Failed scripthashes keep their old status, so they are fetched again on their next change or subscription
+        failed = set()
+        for (scripthash, _), history in zip(changed, histories):
+            if isinstance(history, ValueError):
+                logger.warning(f"Cannot fetch the history of {self._entries[scripthash]['address']}: {history}")
+                failed.add(scripthash)
+
+        # Find the transactions after the stored cursor of every address
+        new_entries = []
+        for (scripthash, _), history in zip(changed, histories):
+            if scripthash in failed:
+                continue
+            entry = self._entries[scripthash]
+            last_tx = entry['metadata'].get('last_tx')
+            txids = [item['tx_hash'] for item in history]
+
+            if last_tx and last_tx.get('txid') in txids:
+                start = txids.index(last_tx['txid']) + 1
+            else:
+                # First check of this address (or the cursor vanished): only the most recent transaction is reported
+                start = max(len(history) - 1, 0)
+            new_entries.extend((scripthash, item) for item in history[start:])
+
+        transactions = self._get_transactions({item['tx_hash']: item.get('height', 0) for _, item in new_entries})
+
+        results = []
+        for scripthash, item in new_entries:
+            entry = self._entries[scripthash]
+            tx = transactions.get(item['tx_hash'])
+            if tx is None:
+                failed.add(scripthash)
+                continue
+            result = record_transaction(entry['address'], entry['metadata'], tx)
+            if result:
+                results.append(result)
+
+        for scripthash, status in changed:
+            if scripthash not in failed:
+                self._statuses[scripthash] = status
+        self._save_statuses()
+
+        return results
+
+    def _get_transactions(self, heights: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch and decode transactions along with the outputs they spend.
+
+        Args:
+            heights: The transactions to fetch, mapped to their height from the history
+                (0 or -1 for unconfirmed transactions)
+
+        Returns:
+            Dictionary of txid to an esplora-like transaction dictionary, without
+            the transactions that could not be fetched or decoded
+        """
+        txids = list(heights)
+        if not txids:
+            return {}
+
+        raw_txs = self._client.batch([('blockchain.transaction.get', [txid]) for txid in txids], return_errors=True)
+        parsed = self._parse_transactions(txids, raw_txs)
+
+        # Fetch the spent transactions to know which inputs belong to monitored addresses
+        prev_txids = sorted({vin['txid'] for tx in parsed.values() for vin in tx['vin'] if not vin['is_coinbase']} - set(parsed))
+        prev_raw = self._client.batch([('blockchain.transaction.get', [txid]) for txid in prev_txids], return_errors=True)
+        prev_txs = {**parsed, **self._parse_transactions(prev_txids, prev_raw)}
+
+        # Block times of confirmed transactions, read from the block headers
+        block_heights = sorted({height for height in heights.values() if height > 0})
+        headers = self._client.batch([('blockchain.block.header', [height]) for height in block_heights], return_errors=True)
+        block_times = {
+            height: struct.unpack_from('<I', bytes.fromhex(header), 68)[0]
+            for height, header in zip(block_heights, headers)
+            if not isinstance(header, ValueError)
+        }
+
+        script_addresses = {entry['script']: entry['address'] for entry in self._entries.values()}
+
+        def with_address(output):
+            return {**output, 'scriptpubkey_address': script_addresses.get(output['scriptpubkey'])}
+
+        transactions = {}
+        for txid, tx in parsed.items():
+            vin = []
+            for spent in tx['vin']:
+                prevout = None
+                if not spent['is_coinbase'] and spent['txid'] in prev_txs:
+                    prevout = with_address(prev_txs[spent['txid']]['vout'][spent['vout']])
+                vin.append({'txid': spent['txid'], 'vout': spent['vout'], 'prevout': prevout})
+
+            height = heights[txid]
+            if height > 0:
+                status = {'confirmed': True, 'block_height': height}
+                if height in block_times:
+                    status['block_time'] = block_times[height]
+            else:
+                status = {'confirmed': False}
+
+            transactions[txid] = {
+                'txid': txid,
+                'vin': vin,
+                'vout': [with_address(output) for output in tx['vout']],
+                'status': status
+            }
+
+        return transactions
+
+    def _parse_transactions(self, txids: List[str], raw_txs: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Decode the raw transactions of a batch, skipping those that failed.
+
+        Args:
+            txids: The requested transaction IDs
+            raw_txs: The batch results, a ValueError for failed calls
+
+        Returns:
+            Dictionary of txid to the parsed transaction
+        """
+        parsed = {}
+        for txid, raw in zip(txids, raw_txs):
+            try:
+                if isinstance(raw, ValueError):
+                    raise raw
+                parsed[txid] = parse_transaction(raw)
+            except (ValueError, IndexError, struct.error) as e:
+                logger.warning(f"Cannot read transaction {txid}: {e}")
+        return parsed
+
+    def _watch_task(self):
+        """Background task keeping the connection alive and subscriptions up to date."""
+        reconnect_delay = 1
+
+        while self._running:
+            try:
+                self.connect()
+                reconnect_delay = 1
+                self._notify(self.subscribe_all())
+
+                while self._running:
+                    self._notify(self.process_notifications())
+
+                    if time.monotonic() - self._index_built_at > INDEX_REFRESH_SECONDS:
+                        self._notify(self.subscribe_all())
+            except (OSError, ConnectionError, ValueError) as e:
+                logger.warning(f"Electrum connection lost: {e}")
+            finally:
+                self.close()
+
+            if self._running:
+                time.sleep(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY)
+
+    def _notify(self, results: List[Dict[str, Any]]) -> None:
+        """Send notifications for new transactions."""
+        if results:
+            logger.info(f"Found {len(results)} new transactions through Electrum")
+            if not send_multiple_transaction_notifications(results):
+                logger.error("Failed to send Electrum notifications")
+
+def start_electrum_backend() -> bool:
+    """Start the Electrum backend if it is selected in the settings."""
+    settings = get_settings()
+    if settings.get('chain_backend', DEFAULT_SETTINGS['chain_backend']) != 'electrum':
+        return False
+    return ElectrumBackend.get_instance().start()
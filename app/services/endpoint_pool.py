@@ -0,0 +1,148 @@
+"""
+Endpoint pool for SatSentry.
+
+Spreads mempool API requests over several configured backends and routes
+around failing ones. Every endpoint has a circuit breaker: after a few
+consecutive failures it is taken out of rotation, and once its cooldown
+expired it is probed with test_api_connection before receiving traffic again.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures opening the circuit breaker of an endpoint
+FAILURE_THRESHOLD = 3
+
+# Seconds an open breaker waits before the endpoint is probed again
+BREAKER_COOLDOWN = 30
+
+# Weight of the latest request in the moving latency average
+LATENCY_SMOOTHING = 0.3
+
+class Endpoint:
+    """Health and load balancing state of a single endpoint."""
+
+    def __init__(self, url: str, weight: int = 1):
+        """
+        Initialize the endpoint.
+
+        Args:
+            url: The API base URL
+            weight: Relative share of the requests in round-robin mode
+        """
+        self.url = url
+        self.weight = weight
+        self.current_weight = 0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.latency: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the circuit breaker is open."""
+        return self.opened_at is not None
+
+class EndpointPool:
+    """Singleton pool choosing the endpoint of every request."""
+
+    _instance: Optional['EndpointPool'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'EndpointPool':
+        """Get or create the pool instance."""
+        if cls._instance is None:
+            cls._instance = EndpointPool()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the pool."""
+        if EndpointPool._instance is not None:
+            raise RuntimeError("Endpoint pool is a singleton. Use get_instance() instead.")
+
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Endpoint] = {}
+
+    def _sync(self, configured: List[Tuple[str, int]]) -> List[Endpoint]:
+        """Get the endpoints for the configured URLs, keeping the state of known ones."""
+        endpoints = []
+        for url, weight in configured:
+            endpoint = self._endpoints.get(url)
+            if endpoint is None:
+                endpoint = self._endpoints[url] = Endpoint(url, weight)
+            endpoint.weight = weight
+            endpoints.append(endpoint)
+        return endpoints
+
+    def select(self, configured: List[Tuple[str, int]], strategy: str,
+               probe: Callable[[str], bool]) -> List[Endpoint]:
+        """
+        Order the endpoints to try for a request.
+
+        Args:
+            configured: The configured (url, weight) pairs, in order of preference
+            strategy: 'round_robin' (smooth weighted round-robin) or 'least_latency'
+            probe: Health check called with the URL of an endpoint whose breaker cooldown expired
+
+        Returns:
+            The available endpoints, the selected one first and the others as fallbacks
+        """
+        with self._lock:
+            endpoints = self._sync(configured)
+            cooled_down = [
+                endpoint for endpoint in endpoints
+                if endpoint.is_open and time.monotonic() - endpoint.opened_at >= BREAKER_COOLDOWN
+            ]
+            # Restart the cooldown right away so concurrent requests do not probe the same endpoint
+            for endpoint in cooled_down:
+                endpoint.opened_at = time.monotonic()
+
+        # Probe outside of the lock, requests of other threads keep flowing meanwhile
+        for endpoint in cooled_down:
+            if probe(endpoint.url):
+                logger.info(f"Endpoint {endpoint.url} is healthy again")
+                self.record_success(endpoint)
+
+        with self._lock:
+            available = [endpoint for endpoint in endpoints if not endpoint.is_open]
+            if not available:
+                return []
+
+            if strategy == 'least_latency':
+                # Endpoints without a measurement yet come first so they get one
+                return sorted(available, key=lambda endpoint: endpoint.latency or 0.0)
+
+            total = sum(endpoint.weight for endpoint in available)
+            for endpoint in available:
+                endpoint.current_weight += endpoint.weight
+            selected = max(available, key=lambda endpoint: endpoint.current_weight)
+            selected.current_weight -= total
+            return [selected] + [endpoint for endpoint in available if endpoint is not selected]
+
+    def record_success(self, endpoint: Endpoint, latency: Optional[float] = None) -> None:
+        """
+        Record a successful request, closing the breaker of the endpoint.
+
+        Args:
+            endpoint: The endpoint
+            latency: The request duration in seconds
+        """
+        with self._lock:
+            endpoint.failures = 0
+            endpoint.opened_at = None
+            if latency is not None:
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        """Record a failed request, opening the breaker after FAILURE_THRESHOLD failures."""
+        with self._lock:
+            endpoint.failures += 1
+            if endpoint.failures >= FAILURE_THRESHOLD and not endpoint.is_open:
+                logger.warning(f"Endpoint {endpoint.url} failed {endpoint.failures} times, taking it out of rotation")
+                endpoint.opened_at = time.monotonic()
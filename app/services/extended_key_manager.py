@@ -5,19 +5,29 @@ This module handles the management of extended public keys, including:
 - Address derivation
 - Gap limit maintenance
 - Transaction status tracking
+
+Each chain of a derivation path keeps its last_used_index and current_index
+counters, so the gap is their difference: used-status events advance the
+first one and gap maintenance derives exactly the missing addresses.
+
+Adding a key runs a BIP44 style discovery: the receive then the change chain
+are extended in batches, each checked concurrently, until a full gap limit of
+unused addresses is confirmed.
 """
 
 import os
 import json
+import time
 import logging
-from typing import Dict, Any, Optional
+import threading
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
 
 from app.btc_addr_gen.core.address_generator import AddressGenerator
 from app.btc_addr_gen.utils.validation import is_valid_extended_key
 from app.btc_addr_gen.core.key_types import detect_key_type
 
-from app.services import mempool_api
-from app.services.settings import get_file_path, DEFAULT_SETTINGS
+from app.services import mempool_api, metrics, profiler
+from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
 
 def _ensure_data_files_exist():
     """Ensure data files exist."""
@@ -29,13 +39,17 @@ def _ensure_data_files_exist():
         with open(extended_keys_file, 'w') as f:
             json.dump({}, f, indent=4)
 
+# Serializes every load-modify-save sequence on the extended keys file, across the
+# scheduler, the watchers, the backends and the background jobs. Shared with address_monitor.
+extended_keys_lock = threading.RLock()
+
 def _load_extended_keys() -> Dict[str, Any]:
     """Load extended public keys from file."""
     _ensure_data_files_exist()
 
     try:
         extended_keys_file = get_file_path('extended_keys_file')
-        with open(extended_keys_file, 'r') as f:
+        with profiler.phase('load_state'), open(extended_keys_file, 'r') as f:
             return json.load(f)
     except Exception as e:
         logger.error(f"Error loading extended keys: {e}")
@@ -47,16 +61,213 @@ def _save_extended_keys(keys: Dict[str, Any]) -> None:
 
     try:
         extended_keys_file = get_file_path('extended_keys_file')
-        with open(extended_keys_file, 'w') as f:
-            json.dump(keys, f, indent=4)
+        start = time.monotonic()
+        # Written next to the file and renamed, so readers never see a truncated file
+        with extended_keys_lock, profiler.phase('disk_save'):
+            with open(f"{extended_keys_file}.tmp", 'w') as f:
+                json.dump(keys, f, indent=4)
+            os.replace(f"{extended_keys_file}.tmp", extended_keys_file)
+        metrics.record_flush(extended_keys_file, start)
     except Exception as e:
         logger.error(f"Error saving extended keys: {e}")
         raise ValueError(f"Failed to save extended keys: {e}")
 
 logger = logging.getLogger(__name__)
 
+# Derivation paths whose gap limit held at their last evaluation; a used-status
+# event or a gap limit change removes them, so untouched paths cost nothing
+_settled_paths: Set[Tuple[str, str]] = set()
+_settled_lock = threading.Lock()
+
+# Address chains of a derivation path: receive (external) and change (internal)
+RECEIVE_CHAIN = 0
+CHANGE_CHAIN = 1
+CHAIN_NAMES = {RECEIVE_CHAIN: 'receive', CHANGE_CHAIN: 'change'}
+
+def _derive_addresses(extended_key: str, start_index: int, count: int, change: bool = False) -> List[Tuple[int, str]]:
+    """
+    Derive addresses of an extended key, recording derivation metrics.
+
+    Args:
+        extended_key: The extended public key
+        start_index: The first address index
+        count: Number of addresses to derive
+        change: Whether to derive change addresses instead of receive addresses
+
+    Returns:
+        List of (index, address) tuples
+    """
+    start = time.monotonic()
+    with profiler.phase('derivation'):
+        addresses = AddressGenerator(extended_key).generate_addresses(start_index, count, change)
+    metrics.observe('derivation_duration_seconds', time.monotonic() - start)
+    metrics.increment('addresses_derived_total', amount=len(addresses))
+    return addresses
+
+
+def _address_path(derivation_path: str, index: int, chain: int = RECEIVE_CHAIN) -> str:
+    """Get the storage path of the address at an index of a chain of a derivation path."""
+    return f"{derivation_path}/{chain}/{index}" if derivation_path else f"{chain}/{index}"
+
+
+def _get_chains(path_data: Dict[str, Any]) -> List[int]:
+    """Get the chains derived for a derivation path; paths added before change discovery only have the receive chain."""
+    return [RECEIVE_CHAIN, CHANGE_CHAIN] if 'change' in path_data else [RECEIVE_CHAIN]
+
+
+def _get_chain_counters(path_data: Dict[str, Any], chain: int) -> Dict[str, Any]:
+    """
+    Get the current_index and last_used_index counters of a chain of a derivation path.
+
+    The receive chain counters are stored in the path data itself, the change
+    chain ones under its 'change' key, created empty on first use.
+
+    Args:
+        path_data: The derivation path data
+        chain: RECEIVE_CHAIN or CHANGE_CHAIN
+
+    Returns:
+        The counters, updated in place
+    """
+    if chain == RECEIVE_CHAIN:
+        return path_data
+    start_index = path_data.get('start_index', 0)
+    return path_data.setdefault('change', {'current_index': start_index - 1, 'last_used_index': start_index - 1})
+
+
+def _scan_last_used_index(path_data: Dict[str, Any], chain: int = RECEIVE_CHAIN) -> int:
+    """
+    Find the index of the last used address of a chain by scanning all of them.
+
+    Only needed once per path, to fill the counter of paths stored before it existed.
+
+    Args:
+        path_data: The derivation path data
+        chain: RECEIVE_CHAIN or CHANGE_CHAIN
+
+    Returns:
+        The index of the last used address, start_index - 1 if none was used
+    """
+    last_used_index = path_data.get('start_index', 0) - 1
+    for addr_path, addr_data in path_data.get('derived_addresses', {}).items():
+        if int(addr_path.split('/')[-2]) != chain:
+            continue
+        if isinstance(addr_data, dict):
+            used = addr_data.get('used', False)
+        else:  # Old format - string address
+            try:
+                used = bool(mempool_api.get_address_transactions(addr_data))
+            except Exception:
+                # If we can't check, assume it's unused
+                used = False
+        if used:
+            last_used_index = max(last_used_index, int(addr_path.split('/')[-1]))
+    return last_used_index
+
+
+def get_gap_position(path_data: Dict[str, Any], addr_path: str) -> Optional[int]:
+    """
+    Get the position of an address in the gap window of its chain.
+
+    Args:
+        path_data: The derivation path data
+        addr_path: The storage path of the address
+
+    Returns:
+        1 for the first address after the last used one of its chain, 2 for the next
+        one and so on; None for used addresses or paths without counters yet
+    """
+    try:
+        chain, index = (int(part) for part in addr_path.split('/')[-2:])
+    except ValueError:  # Old format - no chain in the storage path
+        return None
+    counters = path_data if chain == RECEIVE_CHAIN else path_data.get('change', {})
+    last_used_index = counters.get('last_used_index')
+    if last_used_index is None or index <= last_used_index:
+        return None
+    return index - last_used_index
+
+
+def _get_missing_count(path_data: Dict[str, Any], chain: int = RECEIVE_CHAIN) -> int:
+    """
+    Get the number of addresses to derive for a chain to hold its gap limit.
+
+    Fills the last_used_index counter if the path has none yet.
+
+    Args:
+        path_data: The derivation path data
+        chain: RECEIVE_CHAIN or CHANGE_CHAIN
+
+    Returns:
+        Number of addresses missing after the last derived one
+    """
+    counters = _get_chain_counters(path_data, chain)
+    if 'last_used_index' not in counters:
+        counters['last_used_index'] = _scan_last_used_index(path_data, chain)
+
+    gap = counters['current_index'] - counters['last_used_index']
+    return max(path_data.get('gap_limit', DEFAULT_SETTINGS['gap']) - gap, 0)
+
+
+def _extend_chain(extended_key: str, derivation_path: str, path_data: Dict[str, Any],
+                  chain: int, count: int) -> List[Tuple[str, str]]:
+    """
+    Derive the next addresses of a chain and add them to the derivation path data.
+
+    Args:
+        extended_key: The extended key
+        derivation_path: The derivation path
+        path_data: The derivation path data, updated in place
+        chain: RECEIVE_CHAIN or CHANGE_CHAIN
+        count: Number of addresses to derive
+
+    Returns:
+        List of (address path, address) tuples of the new addresses
+    """
+    counters = _get_chain_counters(path_data, chain)
+    start_index = counters['current_index'] + 1
+
+    new_addresses = []
+    for idx, addr in _derive_addresses(extended_key, start_index, count, chain == CHANGE_CHAIN):
+        addr_path = _address_path(derivation_path, idx, chain)
+        path_data['derived_addresses'][addr_path] = {
+            'address': addr,
+            'used': False,
+            'last_tx': None  # Explicitly set to None for new addresses
+        }
+        new_addresses.append((addr_path, addr))
+    counters['current_index'] = start_index + count - 1
+    return new_addresses
+
+
+def _mark_unsettled(extended_key: str, derivation_path: str) -> None:
+    """Make the next ensure_gap_limit() call evaluate a derivation path again."""
+    with _settled_lock:
+        _settled_paths.discard((extended_key, derivation_path))
+
+
+def _check_new_addresses(label: str, new_addresses: List[Tuple[str, str]]) -> None:
+    """
+    Check freshly derived addresses for transactions.
+
+    Used addresses update their derivation path counters through update_address_used_status().
+
+    Args:
+        label: The extended key label
+        new_addresses: List of (address path, address) tuples
+    """
+    # Import at function level to avoid circular imports
+    from app.services.address_monitor import check_address
+
+    logger.info(f"Checking {len(new_addresses)} newly generated addresses for transactions")
+    for addr_path, addr in new_addresses:
+        try:
+            if check_address(addr, {'label': f"{label} ({addr_path})", 'last_tx': None}):
+                logger.info(f"Found transactions for newly generated address {addr}")
+        except Exception as e:
+            logger.error(f"Error checking newly generated address {addr}: {e}")
+
 
-# TODO: find a better way to dynamically generate new addresses and check them instead of raw double loop w/ ensure_gap_limit function
 def add_extended_key(
     extended_key: str,
     gap_limit: int = DEFAULT_SETTINGS['gap'],
@@ -64,10 +275,14 @@ def add_extended_key(
     derivation_path: str = '',
     start_index: int = 0,
     initial_addresses: int = DEFAULT_SETTINGS['initial_addresses'],
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
 ) -> Dict[str, Any]:
     """
     Add an extended public key for monitoring.
 
+    The initial addresses are derived, then the used addresses of the receive
+    and change chains are discovered with discover_addresses().
+
     Args:
         extended_key: The extended public key (xpub/ypub/zpub)
         label: Optional label for the key
@@ -75,12 +290,13 @@ def add_extended_key(
         start_index: Starting index for address derivation
         initial_addresses: Initial number of addresses to generate
         gap_limit: Gap limit for address derivation (stored per key)
+        progress: Optional function called with the discovery progress after each batch
 
     Returns:
         The added key data
 
     Raises:
-        ValueError: If the key is invalid or the derivation path already exists
+        ValueError: If the key is invalid, the derivation path already exists or the discovery fails
     """
     if not is_valid_extended_key(extended_key):
         raise ValueError("Invalid extended public key")
@@ -90,307 +306,262 @@ def add_extended_key(
     if not key_type:
         raise ValueError("Unsupported extended key format")
 
-    # Load existing keys
-    keys = _load_extended_keys()
-
-    # Check if this extended key exists
-    if extended_key in keys:
-        # Check if this derivation path already exists for this key
-        if derivation_path in keys[extended_key].get('derivation_paths', {}):
-            raise ValueError("This derivation path already exists for this extended key")
-
-        # Use existing label if not provided
-        if not label:
-            label = keys[extended_key].get('label', '')
-    else:
-        # Create new entry for this extended key
-        keys[extended_key] = {
-            'label': label,
-            'key_type': key_type.name,
-            'added_date': None,  # Will be set by address_monitor
-            'derivation_paths': {}
-        }
-
     # Generate initial addresses
-    generator = AddressGenerator(extended_key)
-    addresses = generator.generate_addresses(start_index, initial_addresses)
-
+    addresses = _derive_addresses(extended_key, start_index, initial_addresses)
 
     # Format addresses for storage
     derived_addresses = {}
     for idx, addr in addresses:
-        path = f"{derivation_path}/0/{idx}" if derivation_path else f"0/{idx}"
-        derived_addresses[path] = {
+        derived_addresses[_address_path(derivation_path, idx)] = {
             'address': addr,
             'used': False,
             'last_tx': None
         }
 
-    # Add the derivation path to the extended key
-    if 'derivation_paths' not in keys[extended_key]:
-        keys[extended_key]['derivation_paths'] = {}
-
-    keys[extended_key]['derivation_paths'][derivation_path] = {
-        'start_index': start_index,
-        'current_index': start_index + initial_addresses - 1,
-        'gap_limit': gap_limit,  # Store gap limit per key/path
-        'derived_addresses': derived_addresses
-    }
+    with extended_keys_lock:
+        # Load existing keys
+        keys = _load_extended_keys()
 
-    # Save the updated keys
-    _save_extended_keys(keys)
+        # Check if this extended key exists
+        if extended_key in keys:
+            # Check if this derivation path already exists for this key
+            if derivation_path in keys[extended_key].get('derivation_paths', {}):
+                raise ValueError("This derivation path already exists for this extended key")
 
-    # Check initial addresses for transactions
-    logger.info(f"Checking {initial_addresses} initial addresses for transactions")
-    newly_generated_addresses = [addr for _, addr in addresses]
+            # Use existing label if not provided
+            if not label:
+                label = keys[extended_key].get('label', '')
+        else:
+            # Create new entry for this extended key
+            keys[extended_key] = {
+                'label': label,
+                'key_type': key_type.name,
+                'added_date': None,  # Will be set by address_monitor
+                'derivation_paths': {}
+            }
 
-    try:
-        # Import at function level to avoid circular imports
-        from app.services.address_monitor import _check_single_address
+        # Add the derivation path to the extended key
+        if 'derivation_paths' not in keys[extended_key]:
+            keys[extended_key]['derivation_paths'] = {}
+
+        keys[extended_key]['derivation_paths'][derivation_path] = {
+            'start_index': start_index,
+            'current_index': start_index + initial_addresses - 1,
+            'last_used_index': start_index - 1,
+            'change': {'current_index': start_index - 1, 'last_used_index': start_index - 1},
+            'gap_limit': gap_limit,  # Store gap limit per key/path
+            'derived_addresses': derived_addresses
+        }
 
-        # Track if any addresses were found to be used
-        any_used_addresses = False
-        path_data = keys[extended_key]['derivation_paths'][derivation_path]
+        # Save the updated keys
+        _save_extended_keys(keys)
+    _mark_unsettled(extended_key, derivation_path)
 
-        # Check each new address for transactions
-        for i, addr in enumerate(newly_generated_addresses):
-            try:
-                # Create path for this address
-                idx = start_index + i
-                addr_path = f"{derivation_path}/0/{idx}" if derivation_path else f"0/{idx}"
-
-                # Create metadata for the address
-                metadata = {
-                    'label': f"{keys[extended_key].get('label', '')} ({addr_path})",
-                    'last_tx': None
-                }
-
-                # Check the address for transactions
-                result = _check_single_address(addr, metadata)
-
-                # If transactions were found, update the in-memory data structure
-                if result.get('new_transactions', False):
-                    logger.info(f"Found transactions for initial address {addr}")
-                    path_data['derived_addresses'][addr_path]['used'] = True
-                    path_data['derived_addresses'][addr_path]['last_tx'] = metadata.get('last_tx')
-                    any_used_addresses = True
-            except Exception as e:
-                logger.error(f"Error checking initial address {addr}: {e}")
-
-        # If any addresses were found to be used, we need to ensure the gap limit
-        if any_used_addresses:
-            logger.info("Ensuring gap limit after finding used addresses in initial set")
-
-            # Recalculate consecutive empty addresses
-            paths = sorted(path_data['derived_addresses'].keys(), key=lambda p: int(p.split('/')[-1]))
-            last_used_index = -1
-
-            for i, path in enumerate(paths):
-                addr_data = path_data['derived_addresses'][path]
-                if isinstance(addr_data, dict) and addr_data.get('used', False):
-                    last_used_index = i
-
-            consecutive_empty = len(paths) - last_used_index - 1
-            gap_limit = path_data.get('gap_limit', DEFAULT_SETTINGS['gap'])
-
-            # If we don't have enough consecutive empty addresses, generate more
-            if consecutive_empty < gap_limit:
-                additional_needed = gap_limit - consecutive_empty
-                current_index = path_data['current_index']
-                new_start_index = current_index + 1
-
-                logger.info(f"Need {additional_needed} more addresses to maintain gap limit")
-
-                # Generate additional addresses
-                generator = AddressGenerator(extended_key)
-                more_addresses = generator.generate_addresses(new_start_index, additional_needed)
-
-                # Add new addresses to derived_addresses
-                for idx, addr in more_addresses:
-                    path = f"{derivation_path}/0/{idx}" if derivation_path else f"0/{idx}"
-                    path_data['derived_addresses'][path] = {
-                        'address': addr,
-                        'used': False,
-                        'last_tx': None
-                    }
-
-                # Update current_index
-                path_data['current_index'] = new_start_index + additional_needed - 1
-
-                # Save the updated data
-                _save_extended_keys(keys)
-                logger.info(f"Generated {additional_needed} additional addresses to maintain gap limit")
-    except Exception as e:
-        logger.error(f"Error checking initial addresses: {e}")
+    # Check initial addresses for transactions and extend both chains past the used ones
+    settings = get_settings()
+    discover_addresses(
+        extended_key,
+        derivation_path,
+        settings.get('discovery_workers', DEFAULT_SETTINGS['discovery_workers']),
+        progress
+    )
 
-    # Return the added key data
-    return keys[extended_key]
+    # Return the added key data, as updated by the checks
+    return _load_extended_keys().get(extended_key, keys[extended_key])
 
 
-def ensure_gap_limit(extended_key: str, derivation_path: str) -> int:
+def ensure_gap_limit(extended_key: str, derivation_path: str, check_new: bool = True) -> int:
     """
     Ensure that the extended key has at least the configured gap limit of consecutive empty addresses
     for the specified derivation path. If new addresses are generated, they are checked for transactions
-    immediately.
+    immediately, and more are derived while those checks find used addresses.
+
+    Block scanners pass check_new=False: they match the new addresses against the
+    blocks they scan and report their transactions themselves, which a check through
+    the API would mark as already notified.
+
+    The gap is read from the last_used_index and current_index counters of the path. A path
+    whose gap limit held at its last evaluation is skipped without loading the keys file,
+    until a used-status event or a gap limit change touches it.
 
     Args:
         extended_key: The extended key
         derivation_path: The derivation path to check
+        check_new: Whether to check the new addresses for transactions
 
     Returns:
         Number of new addresses generated (0 if gap limit is already satisfied)
     """
-    keys = _load_extended_keys()
-    if extended_key not in keys or derivation_path not in keys[extended_key].get('derivation_paths', {}):
-        logger.warning(f"Cannot ensure gap limit: key or path not found ({extended_key[:8]}.../{derivation_path})")
-        return 0
+    path_key = (extended_key, derivation_path)
+    with _settled_lock:
+        if path_key in _settled_paths:
+            return 0
 
-    path_data = keys[extended_key]['derivation_paths'][derivation_path]
-    addresses = path_data['derived_addresses']
+    generated = 0
+    try:
+        while True:
+            # Settled as of this load: any used-status event from here on unsettles it again
+            with _settled_lock:
+                _settled_paths.add(path_key)
+
+            with extended_keys_lock:
+                keys = _load_extended_keys()
+                if extended_key not in keys or derivation_path not in keys[extended_key].get('derivation_paths', {}):
+                    logger.warning(f"Cannot ensure gap limit: key or path not found ({extended_key[:8]}.../{derivation_path})")
+                    _mark_unsettled(extended_key, derivation_path)
+                    return generated
+
+                path_data = keys[extended_key]['derivation_paths'][derivation_path]
+                chains = _get_chains(path_data)
+                migrated = any('last_used_index' not in _get_chain_counters(path_data, chain) for chain in chains)
+                missing = {chain: _get_missing_count(path_data, chain) for chain in chains}
+                if not any(missing.values()):
+                    if migrated:
+                        _save_extended_keys(keys)
+                    return generated
+
+                # Derive exactly the missing addresses after the last derived one of each chain
+                new_addresses = []
+                for chain, additional_needed in missing.items():
+                    if additional_needed:
+                        new_addresses.extend(_extend_chain(extended_key, derivation_path, path_data, chain, additional_needed))
 
-    # Get the gap limit for this specific key/path
-    gap_limit = path_data.get('gap_limit', DEFAULT_SETTINGS['gap'])
+                _save_extended_keys(keys)
 
-    # Count consecutive empty addresses at the end
-    paths = sorted(addresses.keys(), key=lambda p: int(p.split('/')[-1]))
+            # Checked outside the lock: used addresses take it to update their counters
+            generated += len(new_addresses)
+            logger.info(f"Generated {len(new_addresses)} new addresses for {extended_key[:8]}... with derivation path {derivation_path} to maintain gap limit")
+            if not check_new:
+                return generated
 
-    # Find the last used address index
-    last_used_index = -1
-    for i, path in enumerate(paths):
-        addr_data = addresses[path]
-        if isinstance(addr_data, dict):
-            if addr_data.get('used', False):
-                last_used_index = i
-        else:
-            try:
-                transactions = mempool_api.get_address_transactions(addr_data)
-                if transactions:
-                    last_used_index = i
-            except Exception:
-                # If we can't check, assume it's unused
-                pass
-
-    # Calculate how many consecutive unused addresses we have
-    consecutive_empty = len(paths) - last_used_index - 1
-
-    # If we have fewer consecutive empty addresses than the gap limit,
-    # generate more addresses
-    if consecutive_empty < gap_limit:
-        additional_needed = gap_limit - consecutive_empty
-        current_index = path_data['current_index']
-        start_index = current_index + 1
-
-        # Generate additional addresses
-        generator = AddressGenerator(extended_key)
-        new_addresses = generator.generate_addresses(start_index, additional_needed)
-
-        # Add new addresses to derived_addresses and check them for transactions
-        newly_generated_addresses = []
-        for idx, addr in new_addresses:
-            path = f"{derivation_path}/0/{idx}" if derivation_path else f"0/{idx}"
-            path_data['derived_addresses'][path] = {
-                'address': addr,
-                'used': False,
-                'last_tx': None  # Explicitly set to None for new addresses
-            }
-            newly_generated_addresses.append(addr)
+            _check_new_addresses(keys[extended_key].get('label', ''), new_addresses)
+    except Exception:
+        _mark_unsettled(extended_key, derivation_path)
+        raise
 
-        # Update current_index
-        path_data['current_index'] = start_index + additional_needed - 1
 
-        # Save updated data
-        _save_extended_keys(keys)
-        logger.info(f"Generated {additional_needed} new addresses for {extended_key[:8]}... with derivation path {derivation_path} to maintain gap limit")
-
-        # Check newly generated addresses for transactions
-        if newly_generated_addresses:
-            logger.info(f"Checking {len(newly_generated_addresses)} newly generated addresses for transactions")
-            # Import at function level to avoid circular imports
-            from app.services.address_monitor import _check_single_address
-
-            # Track if any addresses were found to be used
-            any_used_addresses = False
-
-            # Check each new address for transactions
-            for i, addr in enumerate(newly_generated_addresses):
-                try:
-                    # Create path for this address
-                    idx = start_index + i
-                    addr_path = f"{derivation_path}/0/{idx}" if derivation_path else f"0/{idx}"
-
-                    # Create metadata for the address
-                    metadata = {
-                        'label': f"{keys[extended_key].get('label', '')} ({addr_path})",
-                        'last_tx': None
-                    }
-
-                    # Check the address for transactions
-                    result = _check_single_address(addr, metadata)
-
-                    # If transactions were found, update the in-memory data structure
-                    if result.get('new_transactions', False):
-                        logger.info(f"Found transactions for newly generated address {addr}")
-                        path_data['derived_addresses'][addr_path]['used'] = True
-                        path_data['derived_addresses'][addr_path]['last_tx'] = metadata.get('last_tx')
-                        any_used_addresses = True
-                except Exception as e:
-                    logger.error(f"Error checking newly generated address {addr}: {e}")
-
-            # If any addresses were found to be used, we need to recalculate the gap limit
-            if any_used_addresses:
-                logger.info("Recalculating gap limit after finding used addresses")
-
-                # Recalculate consecutive empty addresses
-                paths = sorted(path_data['derived_addresses'].keys(), key=lambda p: int(p.split('/')[-1]))
-                last_used_index = -1
-
-                for i, path in enumerate(paths):
-                    addr_data = path_data['derived_addresses'][path]
-                    if isinstance(addr_data, dict) and addr_data.get('used', False):
-                        last_used_index = i
-
-                consecutive_empty = len(paths) - last_used_index - 1
-
-                # If we still don't have enough consecutive empty addresses, generate more
-                if consecutive_empty < gap_limit:
-                    additional_needed = gap_limit - consecutive_empty
-                    current_index = path_data['current_index']
-                    new_start_index = current_index + 1
-
-                    logger.info(f"Need {additional_needed} more addresses to maintain gap limit")
-
-                    # Generate additional addresses
-                    generator = AddressGenerator(extended_key)
-                    more_addresses = generator.generate_addresses(new_start_index, additional_needed)
-
-                    # Add new addresses to derived_addresses
-                    for idx, addr in more_addresses:
-                        path = f"{derivation_path}/0/{idx}" if derivation_path else f"0/{idx}"
-                        path_data['derived_addresses'][path] = {
-                            'address': addr,
-                            'used': False,
-                            'last_tx': None
-                        }
+def discover_addresses(
+    extended_key: str,
+    derivation_path: str,
+    workers: int,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, int]:
+    """
+    Discover the used addresses of a derivation path, BIP44 style.
+
+    For the receive then the change chain, the addresses already derived are
+    checked, then the addresses missing for a full gap window after the last
+    used one are derived and checked, batch after batch, until a whole gap
+    limit of unused addresses is confirmed. The addresses of a batch are
+    fetched concurrently.
+
+    Args:
+        extended_key: The extended key
+        derivation_path: The derivation path to discover
+        workers: Number of addresses fetched concurrently
+        progress: Optional function called after each batch with the chain name, the
+            addresses checked and derived so far and the last used index of the chain
+
+    Returns:
+        Dictionary with the number of addresses checked and derived
 
-                    # Update current_index
-                    path_data['current_index'] = new_start_index + additional_needed - 1
+    Raises:
+        ValueError: If the extended key or derivation path doesn't exist
+    """
+    # Import at function level to avoid circular imports
+    from app.services.address_monitor import check_addresses_concurrently
+
+    def load_path_data() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        keys = _load_extended_keys()
+        if extended_key not in keys or derivation_path not in keys[extended_key].get('derivation_paths', {}):
+            raise ValueError("Derivation path not found for this extended key")
+        return keys, keys[extended_key]['derivation_paths'][derivation_path]
+
+    stats = {'checked': 0, 'derived': 0}
+    for chain in (RECEIVE_CHAIN, CHANGE_CHAIN):
+        keys, path_data = load_path_data()
+        label = keys[extended_key].get('label', '')
+        batch = [
+            (addr_path, addr_data if isinstance(addr_data, str) else addr_data.get('address'),
+             None if isinstance(addr_data, str) else addr_data.get('last_tx'))
+            for addr_path, addr_data in path_data.get('derived_addresses', {}).items()
+            if int(addr_path.split('/')[-2]) == chain
+        ]
+
+        while True:
+            if batch:
+                # Used addresses advance the chain counters through update_address_used_status()
+                check_addresses_concurrently(
+                    [(addr, {'label': f"{label} ({addr_path})", 'last_tx': last_tx}) for addr_path, addr, last_tx in batch],
+                    workers
+                )
+                stats['checked'] += len(batch)
+
+            with extended_keys_lock:
+                keys, path_data = load_path_data()
+                additional_needed = _get_missing_count(path_data, chain)
+                last_used_index = _get_chain_counters(path_data, chain)['last_used_index']
+                batch = [(addr_path, addr, None) for addr_path, addr in
+                         _extend_chain(extended_key, derivation_path, path_data, chain, additional_needed)] if additional_needed else []
+                # Also persists the counters created or filled for a path stored without them
+                _save_extended_keys(keys)
+            stats['derived'] += len(batch)
+
+            logger.info(f"Discovering {CHAIN_NAMES[chain]} addresses of {extended_key[:8]}.../{derivation_path}: "
+                        f"{stats['checked']} checked, last used index {last_used_index}")
+            if progress:
+                progress({'chain': CHAIN_NAMES[chain], **stats, 'last_used_index': last_used_index})
+
+            if not batch:
+                break
+
+    _mark_unsettled(extended_key, derivation_path)
+    return stats
+
+
+def _update_last_used_index(extended_key: str, derivation_path: str, path_data: Dict[str, Any],
+                            addr_path: str, used: bool) -> bool:
+    """
+    Update the last_used_index counter of a chain after a used-status change.
 
-                    # Save the updated data
-                    _save_extended_keys(keys)
-                    logger.info(f"Generated {additional_needed} additional addresses to maintain gap limit")
+    Args:
+        extended_key: The extended key
+        derivation_path: The derivation path
+        path_data: The derivation path data, the address status already updated
+        addr_path: The storage path of the updated address
+        used: Whether the address has been used
 
-                    # Note: We don't check these additional addresses immediately to avoid potential
-                    # infinite recursion. They will be checked during the next scheduled check.
+    Returns:
+        True if the counter changed
+    """
+    chain, index = (int(part) for part in addr_path.split('/')[-2:])
+    counters = _get_chain_counters(path_data, chain)
+    previous = counters.get('last_used_index')
+
+    if previous is None:
+        last_used_index = _scan_last_used_index(path_data, chain)
+    elif used:
+        last_used_index = max(previous, index)
+    elif index == previous:
+        last_used_index = _scan_last_used_index(path_data, chain)
+    else:
+        last_used_index = previous
 
-        return additional_needed
+    if last_used_index == previous:
+        return False
 
-    return 0
+    counters['last_used_index'] = last_used_index
+    _mark_unsettled(extended_key, derivation_path)
+    return True
 
 
 def update_address_used_status(address: str, used: bool, transaction_info: Optional[Dict[str, Any]] = None) -> bool:
     """
     Update the used status of an address derived from an extended key.
 
+    Also advances the last_used_index counter of its chain, so the next
+    ensure_gap_limit() call for that path extends it.
+
     Args:
         address: The address to update
         used: Whether the address has been used
@@ -399,47 +570,56 @@ def update_address_used_status(address: str, used: bool, transaction_info: Optio
     Returns:
         True if the address was found and updated, False otherwise
     """
-    extended_keys = _load_extended_keys()
-    updated = False
-
-    for _, key_data in extended_keys.items():
-        for _, path_data in key_data.get('derivation_paths', {}).items():
-            for addr_path, addr_data in path_data.get('derived_addresses', {}).items():
-                if isinstance(addr_data, dict) and addr_data.get('address') == address:
-                    # Always mark as used if it has transactions
-                    addr_data['used'] = used
-
-                    # Update transaction info if it's provided
-                    if transaction_info and transaction_info.get('txid'):
-                        # Check if this is a new transaction
-                        current_tx = addr_data.get('last_tx')
-                        if not current_tx or current_tx.get('txid') != transaction_info.get('txid'):
-                            # New transaction - update everything
-                            addr_data['last_tx'] = transaction_info
-                            updated = True
-                        elif current_tx and current_tx.get('txid') == transaction_info.get('txid'):
-                            # Same transaction - always update the timestamp to ensure it uses block_time
-                            # This ensures feature parity between single addresses and extended key addresses
-                            if transaction_info.get('timestamp'):
-                                current_tx['timestamp'] = transaction_info.get('timestamp')
+    with extended_keys_lock:
+        extended_keys = _load_extended_keys()
+        updated = False
+
+        for extended_key, key_data in extended_keys.items():
+            for derivation_path, path_data in key_data.get('derivation_paths', {}).items():
+                for addr_path, addr_data in path_data.get('derived_addresses', {}).items():
+                    if isinstance(addr_data, dict) and addr_data.get('address') == address:
+                        # Always mark as used if it has transactions
+                        addr_data['used'] = used
+
+                        # Update transaction info if it's provided
+                        if transaction_info and transaction_info.get('txid'):
+                            # Check if this is a new transaction
+                            current_tx = addr_data.get('last_tx')
+                            if not current_tx or current_tx.get('txid') != transaction_info.get('txid'):
+                                # New transaction - update everything
+                                addr_data['last_tx'] = transaction_info
                                 updated = True
-                    elif not used:  # If marking as unused, clear transaction info
-                        addr_data['last_tx'] = None
+                            elif current_tx and current_tx.get('txid') == transaction_info.get('txid'):
+                                # Same transaction - always update the timestamp to ensure it uses block_time
+                                # This ensures feature parity between single addresses and extended key addresses
+                                if transaction_info.get('timestamp'):
+                                    current_tx['timestamp'] = transaction_info.get('timestamp')
+                                    updated = True
+                                if 'block_height' in transaction_info:
+                                    current_tx['block_height'] = transaction_info['block_height']
+                                    updated = True
+                        elif not used:  # If marking as unused, clear transaction info
+                            addr_data['last_tx'] = None
+                            updated = True
+                    elif isinstance(addr_data, str) and addr_data == address:
+                        # Convert old format to new format
+                        path_data['derived_addresses'][addr_path] = {
+                            'address': addr_data,
+                            'used': used,
+                            'last_tx': transaction_info if transaction_info and transaction_info.get('txid') else None
+                        }
                         updated = True
-                elif isinstance(addr_data, str) and addr_data == address:
-                    # Convert old format to new format
-                    path_data['derived_addresses'][addr_path] = {
-                        'address': addr_data,
-                        'used': used,
-                        'last_tx': transaction_info if transaction_info and transaction_info.get('txid') else None
-                    }
-                    updated = True
+                    else:
+                        continue
 
-    if updated:
-        _save_extended_keys(extended_keys)
-        return True
+                    if _update_last_used_index(extended_key, derivation_path, path_data, addr_path, used):
+                        updated = True
 
-    return False
+        if updated:
+            _save_extended_keys(extended_keys)
+            return True
+
+        return False
 
 
 def update_gap_limit(extended_key: str, derivation_path: str, new_gap_limit: int) -> bool:
@@ -460,26 +640,28 @@ def update_gap_limit(extended_key: str, derivation_path: str, new_gap_limit: int
     if new_gap_limit < 1:
         raise ValueError("Gap limit must be at least 1")
 
-    keys = _load_extended_keys()
+    with extended_keys_lock:
+        keys = _load_extended_keys()
 
-    if extended_key not in keys:
-        raise ValueError("Extended key not found")
+        if extended_key not in keys:
+            raise ValueError("Extended key not found")
 
-    if derivation_path not in keys[extended_key].get('derivation_paths', {}):
-        raise ValueError("Derivation path not found for this extended key")
+        if derivation_path not in keys[extended_key].get('derivation_paths', {}):
+            raise ValueError("Derivation path not found for this extended key")
 
-    path_data = keys[extended_key]['derivation_paths'][derivation_path]
-    current_gap_limit = path_data.get('gap_limit', DEFAULT_SETTINGS['gap'])
+        path_data = keys[extended_key]['derivation_paths'][derivation_path]
+        current_gap_limit = path_data.get('gap_limit', DEFAULT_SETTINGS['gap'])
 
-    # If the gap limit hasn't changed, do nothing
-    if current_gap_limit == new_gap_limit:
-        return False
+        # If the gap limit hasn't changed, do nothing
+        if current_gap_limit == new_gap_limit:
+            return False
 
-    # Update the gap limit
-    path_data['gap_limit'] = new_gap_limit
+        # Update the gap limit
+        path_data['gap_limit'] = new_gap_limit
 
-    # Save the updated data
-    _save_extended_keys(keys)
+        # Save the updated data
+        _save_extended_keys(keys)
+    _mark_unsettled(extended_key, derivation_path)
     logger.info(f"Updated gap limit for {extended_key[:8]}... with derivation path {derivation_path} from {current_gap_limit} to {new_gap_limit}")
 
     return True
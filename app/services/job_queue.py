@@ -0,0 +1,369 @@
+"""
+Background job queue for SatSentry.
+
+Heavy operations (extended key imports, gap limit changes and rescans) run
+as jobs on a small pool of worker threads, so web requests only enqueue them.
+Jobs report their progress, can be cancelled, and are persisted: queued jobs
+and jobs interrupted by a restart run again when the queue starts.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import Callable, Dict, Any, List, Optional
+
+from app.services import metrics, profiler
+from app.services.settings import get_settings, get_file_path, DEFAULT_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Kinds of jobs the workers know how to run
+JOB_TYPES = ('add_extended_key', 'gap_limit', 'rescan')
+
+# Job statuses, the last three are final
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+
+# Finished jobs kept for their status and result, the oldest are dropped
+MAX_FINISHED_JOBS = 100
+
+class JobCancelled(Exception):
+    """Raised from the progress callback of a job once its cancellation was requested."""
+
+def _run_add_extended_key(params: Dict[str, Any], progress: Callable[[Dict[str, Any]], None],
+                          resumed: bool) -> Dict[str, Any]:
+    """Add an extended key and discover its addresses, resuming the discovery of an interrupted import."""
+    # Imported here: the address monitor pulls in every backend service
+    from app.services.address_monitor import add_extended_public_key, get_all_extended_keys, get_default_derivation_path
+    from app.services.extended_key_manager import discover_addresses
+
+    extended_key = params['extended_key']
+    derivation_path = params.get('derivation_path') or get_default_derivation_path(extended_key)
+    settings = get_settings()
+
+    stats = {}
+    def report(update: Dict[str, Any]) -> None:
+        stats.update(update)
+        progress(update)
+
+    if resumed and derivation_path in get_all_extended_keys().get(extended_key, {}).get('derivation_paths', {}):
+        stats = discover_addresses(extended_key, derivation_path,
+                                   settings.get('discovery_workers', DEFAULT_SETTINGS['discovery_workers']), progress)
+    else:
+        add_extended_public_key(**{**params, 'derivation_path': derivation_path}, progress=report)
+
+    return {
+        'derivation_path': derivation_path,
+        'checked': stats.get('checked', 0),
+        'derived': stats.get('derived', 0)
+    }
+
+def _run_gap_limit(params: Dict[str, Any], progress: Callable[[Dict[str, Any]], None],
+                   resumed: bool) -> Dict[str, Any]:
+    """Derive and check the addresses needed after a gap limit change."""
+    from app.services.extended_key_manager import ensure_gap_limit
+
+    return {'generated': ensure_gap_limit(params['extended_key'], params['derivation_path'])}
+
+def _run_rescan(params: Dict[str, Any], progress: Callable[[Dict[str, Any]], None],
+                resumed: bool) -> Dict[str, Any]:
+    """Check every address of a derivation path again and extend it past the used ones."""
+    from app.services.extended_key_manager import discover_addresses
+
+    settings = get_settings()
+    return discover_addresses(params['extended_key'], params['derivation_path'],
+                              settings.get('discovery_workers', DEFAULT_SETTINGS['discovery_workers']), progress)
+
+_HANDLERS = {
+    'add_extended_key': _run_add_extended_key,
+    'gap_limit': _run_gap_limit,
+    'rescan': _run_rescan,
+}
+
+class JobQueue:
+    """Singleton queue of background jobs, run by a fixed number of worker threads."""
+
+    _instance: Optional['JobQueue'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'JobQueue':
+        """Get or create the job queue instance."""
+        if cls._instance is None:
+            cls._instance = JobQueue()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the job queue."""
+        if JobQueue._instance is not None:
+            raise RuntimeError("Job queue is a singleton. Use get_instance() instead.")
+
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # Serializes file writes
+        self._wakeup = threading.Condition(self._lock)  # Notified when a job is queued or the queue stops
+        self._jobs: Optional[Dict[str, Dict[str, Any]]] = None  # Job ID to job, in submission order
+        self._cancel_requested = set()  # IDs of running jobs to cancel
+
+    def _get_jobs(self) -> Dict[str, Dict[str, Any]]:
+        """Get the jobs, loading them from file on first use. Must be called with the lock held."""
+        if self._jobs is None:
+            self._jobs = {}
+            jobs_file = get_file_path('jobs_file')
+            if os.path.exists(jobs_file):
+                try:
+                    with profiler.phase('load_state'), open(jobs_file, 'r') as f:
+                        self._jobs = json.load(f)
+                except Exception as e:
+                    logger.error(f"Error loading jobs: {e}")
+
+            # Jobs running when the process stopped run again
+            for job in self._jobs.values():
+                if job['status'] == 'running':
+                    job['status'] = 'queued'
+        return self._jobs
+
+    def _save(self) -> None:
+        """Save the jobs to file."""
+        with self._lock:
+            jobs = {job_id: dict(job) for job_id, job in self._get_jobs().items()}
+            queued = sum(1 for job in jobs.values() if job['status'] == 'queued')
+            running = sum(1 for job in jobs.values() if job['status'] == 'running')
+
+        os.makedirs(get_file_path('data_dir'), exist_ok=True)
+        try:
+            jobs_file = get_file_path('jobs_file')
+            start = time.monotonic()
+            with self._save_lock, profiler.phase('disk_save'):
+                with open(f"{jobs_file}.tmp", 'w') as f:
+                    json.dump(jobs, f, indent=2)
+                os.replace(f"{jobs_file}.tmp", jobs_file)
+            metrics.record_flush(jobs_file, start)
+        except Exception as e:
+            logger.error(f"Error saving jobs: {e}")
+
+        metrics.set_gauge('jobs_queued', queued)
+        metrics.set_gauge('jobs_running', running)
+
+    def submit(self, job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            job_type: One of JOB_TYPES
+            params: The job parameters, stored as JSON
+
+        Returns:
+            The queued job
+
+        Raises:
+            ValueError: If the job type is unknown
+        """
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Job type must be one of {', '.join(JOB_TYPES)}")
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'type': job_type,
+            'params': params,
+            'status': 'queued',
+            'attempts': 0,
+            'progress': {},
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+        with self._lock:
+            self._get_jobs()[job['id']] = job
+            self._wakeup.notify()
+
+        logger.info(f"Queued {job_type} job {job['id']}")
+        self._save()
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by ID, None if unknown."""
+        with self._lock:
+            job = self._get_jobs().get(job_id)
+            return dict(job) if job else None
+
+    def get_jobs(self) -> List[Dict[str, Any]]:
+        """Get all jobs, most recently submitted first."""
+        with self._lock:
+            return [dict(job) for job in reversed(list(self._get_jobs().values()))]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job.
+
+        A queued job is cancelled right away, a running one stops at its next progress report.
+
+        Args:
+            job_id: The job ID
+
+        Returns:
+            False if the job already finished
+
+        Raises:
+            ValueError: If the job doesn't exist
+        """
+        with self._lock:
+            job = self._get_jobs().get(job_id)
+            if job is None:
+                raise ValueError("Job not found")
+
+            if job['status'] == 'queued':
+                job['status'] = 'cancelled'
+                job['finished_at'] = time.time()
+            elif job['status'] == 'running':
+                self._cancel_requested.add(job_id)
+            else:
+                return False
+
+        logger.info(f"Cancellation of job {job_id} requested")
+        self._save()
+        return True
+
+    def _take_job(self, wait: bool) -> Optional[Dict[str, Any]]:
+        """
+        Mark the oldest queued job as running.
+
+        Args:
+            wait: Whether to wait for a job to be queued while the queue runs
+
+        Returns:
+            A copy of the job, None if no job is queued
+        """
+        with self._lock:
+            while True:
+                job = next((job for job in self._get_jobs().values() if job['status'] == 'queued'), None)
+                if job is not None or not wait or not self._running:
+                    break
+                self._wakeup.wait()
+
+            if job is None:
+                return None
+            job['status'] = 'running'
+            job['attempts'] = job.get('attempts', 0) + 1
+            job['started_at'] = time.time()
+            job = dict(job)
+
+        self._save()
+        return job
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        """Run a job taken from the queue and store its outcome."""
+        job_id = job['id']
+
+        def progress(update: Dict[str, Any]) -> None:
+            with self._lock:
+                self._get_jobs()[job_id]['progress'] = dict(update)
+                cancelled = job_id in self._cancel_requested
+            self._save()
+            if cancelled:
+                raise JobCancelled("Job cancelled")
+
+        logger.info(f"Running {job['type']} job {job_id}")
+        result = None
+        error = None
+        try:
+            result = _HANDLERS[job['type']](job['params'], progress, job['attempts'] > 1)
+            status = 'completed'
+        except JobCancelled:
+            status = 'cancelled'
+        except Exception as e:
+            logger.error(f"Error running {job['type']} job {job_id}: {e}")
+            status = 'failed'
+            error = str(e)
+
+        with self._lock:
+            # Handlers may catch the cancellation to leave consistent state behind
+            if job_id in self._cancel_requested:
+                self._cancel_requested.discard(job_id)
+                status = 'cancelled'
+
+            jobs = self._get_jobs()
+            jobs[job_id].update({'status': status, 'result': result, 'error': error, 'finished_at': time.time()})
+
+            finished = [other_id for other_id, other in jobs.items() if other['status'] in JOB_STATUSES[2:]]
+            for other_id in finished[:-MAX_FINISHED_JOBS]:
+                del jobs[other_id]
+
+        logger.info(f"Job {job_id} {status}")
+        metrics.increment('jobs_total', {'type': job['type'], 'status': status})
+        self._save()
+
+    def run_pending(self) -> int:
+        """
+        Run the queued jobs in the calling thread.
+
+        Returns:
+            Number of jobs run
+        """
+        count = 0
+        while True:
+            job = self._take_job(wait=False)
+            if job is None:
+                return count
+            self._run_job(job)
+            count += 1
+
+    def start(self) -> bool:
+        """Start the worker threads, as many as the job_concurrency setting."""
+        if any(thread.is_alive() for thread in self._threads):
+            logger.warning("Job queue already running")
+            return False
+
+        settings = get_settings()
+        concurrency = settings.get('job_concurrency', DEFAULT_SETTINGS['job_concurrency'])
+
+        with self._lock:
+            self._running = True
+            queued = sum(1 for job in self._get_jobs().values() if job['status'] == 'queued')
+
+        self._threads = []
+        for _ in range(concurrency):
+            thread = threading.Thread(target=self._worker_task)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"Job queue started with {concurrency} workers, {queued} jobs queued")
+        return True
+
+    def stop(self) -> None:
+        """Stop the worker threads once their current job is done."""
+        with self._lock:
+            self._running = False
+            self._wakeup.notify_all()
+
+    def _worker_task(self):
+        """Worker thread running queued jobs one at a time."""
+        while self._running:
+            job = self._take_job(wait=True)
+            if job is not None:
+                self._run_job(job)
+
+def submit(job_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue a background job."""
+    return JobQueue.get_instance().submit(job_type, params)
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a background job by ID."""
+    return JobQueue.get_instance().get_job(job_id)
+
+def get_jobs() -> List[Dict[str, Any]]:
+    """Get all background jobs, most recently submitted first."""
+    return JobQueue.get_instance().get_jobs()
+
+def cancel(job_id: str) -> bool:
+    """Cancel a background job."""
+    return JobQueue.get_instance().cancel(job_id)
+
+def start_job_queue() -> bool:
+    """Start the background job workers."""
+    return JobQueue.get_instance().start()
@@ -2,24 +2,227 @@
 Mempool.space API integration for SatSentry.
 """
 
+import time
 import logging
+import threading
 import requests
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 from app.services.settings import get_settings, DEFAULT_SETTINGS
+from app.services.endpoint_pool import EndpointPool
+from app.services.api_cassette import Cassette
+from app.services import metrics, profiler
 
 logger = logging.getLogger(__name__)
 
+# Number of confirmed transactions returned per page by /address/:address/txs/chain
+CHAIN_TXS_PAGE_SIZE = 25
+
+# Number of transactions returned per page by /block/:hash/txs
+BLOCK_TXS_PAGE_SIZE = 25
+
+class _InflightRequest:
+    """A request in progress, whose outcome is shared by every caller of the same path."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Optional[requests.Response] = None
+        self.error: Optional[Exception] = None
+
+# Requests in progress by API path
+_inflight_requests: Dict[str, _InflightRequest] = {}
+_inflight_lock = threading.Lock()
+
+# Cassette recording or replaying the API traffic, if any
+_cassette: Optional[Cassette] = None
+
+def set_cassette(cassette: Optional[Cassette]) -> None:
+    """
+    Record the API traffic to a cassette or replay it from one.
+
+    Args:
+        cassette: The cassette, or None to talk to the API directly again
+    """
+    global _cassette
+    _cassette = cassette
+
 def get_api_url() -> str:
-    """Get the API URL based on settings."""
+    """Get the API URL based on settings (the first endpoint when several are configured)."""
     settings = get_settings()
 
+    endpoints = settings.get('mempool_endpoints', DEFAULT_SETTINGS['mempool_endpoints'])
+    if endpoints:
+        return _parse_endpoint(endpoints[0])[0]
+
     if settings.get('use_self_hosted', False):
         protocol = 'https' if settings.get('node_port') == 443 else 'http'
         return f"{protocol}://{settings.get('node_url')}:{settings.get('node_port')}/api"
     else:
         return f"{DEFAULT_SETTINGS['node_url']}/api"
 
+def _parse_endpoint(endpoint: Any) -> Tuple[str, int]:
+    """Get the (url, weight) of a configured endpoint, given as a URL or a {'url', 'weight'} dictionary."""
+    if isinstance(endpoint, dict):
+        return endpoint['url'].rstrip('/'), int(endpoint.get('weight', 1))
+    return endpoint.rstrip('/'), 1
+
+def get_api_urls() -> List[Tuple[str, int]]:
+    """
+    Get all API URLs requests can be sent to.
+
+    Returns:
+        List of (url, weight) in order of preference
+    """
+    settings = get_settings()
+    endpoints = settings.get('mempool_endpoints', DEFAULT_SETTINGS['mempool_endpoints'])
+    if endpoints:
+        return [_parse_endpoint(endpoint) for endpoint in endpoints]
+    return [(get_api_url(), 1)]
+
+def _endpoint_type(path: str) -> str:
+    """
+    Get the endpoint type of an API path, for metrics.
+
+    Args:
+        path: The API path, e.g. /address/bc1q.../txs/chain/<txid>
+
+    Returns:
+        The path with its identifiers replaced, e.g. /address/:address/txs/chain/:txid
+    """
+    parts = path.strip('/').split('/')
+    names = []
+    for index, part in enumerate(parts):
+        previous = parts[index - 1] if index else None
+        if previous == 'address':
+            names.append(':address')
+        elif previous in ('tx', 'chain'):
+            names.append(':txid')
+        elif previous == 'block':
+            names.append(':hash')
+        elif part.isdigit():
+            names.append(':index')
+        else:
+            names.append(part)
+    return '/' + '/'.join(names)
+
+def _get(path: str, timeout: int) -> requests.Response:
+    """
+    Send a GET request to the API, sharing the call with identical requests in progress.
+
+    When the same path is requested while a previous request for it is still
+    running (e.g. a manual refresh during a check cycle), the caller waits for
+    that request instead of sending its own, and gets the same response or error.
+
+    Args:
+        path: The API path, starting with a slash
+        timeout: Request timeout in seconds
+
+    Returns:
+        The successful response
+
+    Raises:
+        requests.exceptions.RequestException: If the request failed
+    """
+    with _inflight_lock:
+        inflight = _inflight_requests.get(path)
+        is_leader = inflight is None
+        if is_leader:
+            inflight = _inflight_requests[path] = _InflightRequest()
+
+    if not is_leader:
+        metrics.increment('api_coalesced_total', {'backend': 'mempool', 'endpoint': _endpoint_type(path)})
+        with profiler.phase('http_fetch'):
+            inflight.done.wait()
+        if inflight.error:
+            raise inflight.error
+        return inflight.response
+
+    try:
+        with profiler.phase('http_fetch'):
+            if _cassette:
+                if _cassette.mode != 'record':
+                    # A replayed response stands for the request it was recorded from
+                    metrics.count_request()
+                inflight.response = _cassette.handle(path, lambda: _fetch(path, timeout))
+            else:
+                inflight.response = _fetch(path, timeout)
+        return inflight.response
+    except Exception as e:
+        inflight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight_requests[path]
+        inflight.done.set()
+
+def _fetch(path: str, timeout: int) -> requests.Response:
+    """
+    Send a GET request to the API, failing over to the other endpoints.
+
+    Server errors, rate limiting and connection errors count against the circuit
+    breaker of the endpoint and the request is retried on the next one. Client
+    errors (e.g. an invalid address) are raised immediately.
+
+    Args:
+        path: The API path, starting with a slash
+        timeout: Request timeout in seconds
+
+    Returns:
+        The successful response
+
+    Raises:
+        requests.exceptions.RequestException: If the request failed on every endpoint
+    """
+    settings = get_settings()
+    strategy = settings.get('endpoint_selection', DEFAULT_SETTINGS['endpoint_selection'])
+    pool = EndpointPool.get_instance()
+
+    endpoints = pool.select(get_api_urls(), strategy, test_api_connection)
+    if not endpoints:
+        raise requests.exceptions.ConnectionError("No healthy mempool API endpoint available")
+
+    labels = {'backend': 'mempool', 'endpoint': _endpoint_type(path)}
+    error = None
+    for attempt, endpoint in enumerate(endpoints):
+        if attempt:
+            metrics.increment('api_retries_total', labels)
+
+        start = time.monotonic()
+        metrics.count_request()
+        try:
+            response = requests.get(f"{endpoint.url}{path}", timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            metrics.increment('api_errors_total', {**labels, 'error': type(e).__name__})
+            error = e
+        else:
+            duration = time.monotonic() - start
+            metrics.observe('api_request_duration_seconds', duration, labels)
+            metrics.observe('api_response_bytes', len(response.content), labels, metrics.SIZE_BUCKETS)
+            metrics.increment('api_responses_total', {**labels, 'status': response.status_code})
+
+            if response.status_code != 429 and response.status_code < 500:
+                pool.record_success(endpoint, duration)
+                response.raise_for_status()
+                return response
+
+            if response.status_code == 429:
+                metrics.increment('api_throttled_total', labels)
+            metrics.increment('api_errors_total', {**labels, 'error': f'HTTP {response.status_code}'})
+            error = requests.exceptions.HTTPError(f"{response.status_code} error from {endpoint.url}", response=response)
+
+        pool.record_failure(endpoint)
+        if len(endpoints) > 1:
+            logger.warning(f"Request to {endpoint.url}{path} failed, trying next endpoint: {error}")
+
+    raise error
+
+def get_websocket_url() -> str:
+    """Get the WebSocket API URL based on settings."""
+    api_url = get_api_url()
+    if api_url.startswith('https://'):
+        return f"wss://{api_url[len('https://'):]}/v1/ws"
+    return f"ws://{api_url[len('http://'):]}/v1/ws"
+
 def get_address_transactions(address: str) -> List[Dict[str, Any]]:
     """
     Get transactions for a Bitcoin address.
@@ -33,17 +236,81 @@ def get_address_transactions(address: str) -> List[Dict[str, Any]]:
     Raises:
         ValueError: If the API request fails
     """
-    api_url = get_api_url()
-    endpoint = f"{api_url}/address/{address}/txs"
-
     try:
-        response = requests.get(endpoint, timeout=30)
-        response.raise_for_status()
+        response = _get(f"/address/{address}/txs", timeout=30)
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching transactions for address {address}: {e}")
         raise ValueError(f"Failed to fetch transactions: {e}")
 
+def get_address_mempool_transactions(address: str) -> List[Dict[str, Any]]:
+    """
+    Get the unconfirmed transactions for a Bitcoin address.
+
+    Args:
+        address: The Bitcoin address to check
+
+    Returns:
+        List of unconfirmed transactions for the address, newest first
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get(f"/address/{address}/txs/mempool", timeout=30)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching mempool transactions for address {address}: {e}")
+        raise ValueError(f"Failed to fetch mempool transactions: {e}")
+
+def get_address_chain_transactions(address: str, last_seen_txid: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Get a page of confirmed transactions for a Bitcoin address.
+
+    Args:
+        address: The Bitcoin address to check
+        last_seen_txid: Return the transactions following this one (newest first)
+
+    Returns:
+        Up to CHAIN_TXS_PAGE_SIZE confirmed transactions for the address
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    path = f"/address/{address}/txs/chain"
+    if last_seen_txid:
+        path = f"{path}/{last_seen_txid}"
+
+    try:
+        response = _get(path, timeout=30)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching chain transactions for address {address}: {e}")
+        raise ValueError(f"Failed to fetch chain transactions: {e}")
+
+def get_address_stats(address: str) -> Dict[str, Any]:
+    """
+    Get the summary statistics for a Bitcoin address.
+
+    The summary only holds the confirmed (`chain_stats`) and unconfirmed
+    (`mempool_stats`) counters, so it is much smaller than the transaction list.
+
+    Args:
+        address: The Bitcoin address to check
+
+    Returns:
+        Address summary including chain_stats and mempool_stats
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get(f"/address/{address}", timeout=10)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching stats for address {address}: {e}")
+        raise ValueError(f"Failed to fetch address stats: {e}")
+
 def get_transaction_details(txid: str) -> Dict[str, Any]:
     """
     Get details for a specific transaction.
@@ -57,17 +324,33 @@ def get_transaction_details(txid: str) -> Dict[str, Any]:
     Raises:
         ValueError: If the API request fails
     """
-    api_url = get_api_url()
-    endpoint = f"{api_url}/tx/{txid}"
-
     try:
-        response = requests.get(endpoint, timeout=10)
-        response.raise_for_status()
+        response = _get(f"/tx/{txid}", timeout=10)
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching transaction details for txid {txid}: {e}")
         raise ValueError(f"Failed to fetch transaction details: {e}")
 
+def get_transaction_status(txid: str) -> Dict[str, Any]:
+    """
+    Get the confirmation status of a transaction.
+
+    Args:
+        txid: The transaction ID
+
+    Returns:
+        Transaction status with 'confirmed' and, once confirmed, the block height, hash and time
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get(f"/tx/{txid}/status", timeout=10)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching status for txid {txid}: {e}")
+        raise ValueError(f"Failed to fetch transaction status: {e}")
+
 def get_fee_estimates() -> Dict[str, int]:
     """
     Get current fee estimates.
@@ -78,26 +361,154 @@ def get_fee_estimates() -> Dict[str, int]:
     Raises:
         ValueError: If the API request fails
     """
-    api_url = get_api_url()
-    endpoint = f"{api_url}/v1/fees/recommended"
-
     try:
-        response = requests.get(endpoint, timeout=10)
-        response.raise_for_status()
+        response = _get("/v1/fees/recommended", timeout=10)
         return response.json()
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching fee estimates: {e}")
         raise ValueError(f"Failed to fetch fee estimates: {e}")
 
+def get_tip_hash() -> str:
+    """
+    Get the hash of the current chain tip.
+
+    Returns:
+        The block hash of the chain tip
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get("/blocks/tip/hash", timeout=10)
+        return response.text.strip()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching tip hash: {e}")
+        raise ValueError(f"Failed to fetch tip hash: {e}")
+
+def get_tip_height() -> int:
+    """
+    Get the height of the current chain tip.
+
+    Returns:
+        The block height of the chain tip
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get("/blocks/tip/height", timeout=10)
+        return int(response.text.strip())
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching tip height: {e}")
+        raise ValueError(f"Failed to fetch tip height: {e}")
+
+def get_block_hash(height: int) -> str:
+    """
+    Get the hash of the block at a height of the active chain.
+
+    Args:
+        height: The block height
+
+    Returns:
+        The block hash
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get(f"/block-height/{height}", timeout=10)
+        return response.text.strip()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching block hash at height {height}: {e}")
+        raise ValueError(f"Failed to fetch block hash: {e}")
 
-def test_api_connection() -> bool:
+def get_block(block_hash: str) -> Dict[str, Any]:
+    """
+    Get the header information of a block.
+
+    Args:
+        block_hash: The block hash
+
+    Returns:
+        Block information including height, tx_count and previousblockhash
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get(f"/block/{block_hash}", timeout=10)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching block {block_hash}: {e}")
+        raise ValueError(f"Failed to fetch block: {e}")
+
+def get_block_transactions(block_hash: str, start_index: int = 0) -> List[Dict[str, Any]]:
+    """
+    Get a page of transactions of a block.
+
+    Args:
+        block_hash: The block hash
+        start_index: Index of the first transaction, must be a multiple of BLOCK_TXS_PAGE_SIZE
+
+    Returns:
+        Up to BLOCK_TXS_PAGE_SIZE transactions including their prevouts
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get(f"/block/{block_hash}/txs/{start_index}", timeout=30)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching transactions of block {block_hash}: {e}")
+        raise ValueError(f"Failed to fetch block transactions: {e}")
+
+def get_recent_mempool_transactions() -> List[Dict[str, Any]]:
+    """
+    Get the transactions that most recently entered the mempool.
+
+    Returns:
+        List of the latest mempool transactions (txid, fee, vsize, value)
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get("/mempool/recent", timeout=10)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching recent mempool transactions: {e}")
+        raise ValueError(f"Failed to fetch recent mempool transactions: {e}")
+
+def get_mempool_txids() -> List[str]:
+    """
+    Get the txids of all transactions currently in the mempool.
+
+    Returns:
+        List of txids
+
+    Raises:
+        ValueError: If the API request fails
+    """
+    try:
+        response = _get("/mempool/txids", timeout=30)
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching mempool txids: {e}")
+        raise ValueError(f"Failed to fetch mempool txids: {e}")
+
+
+def test_api_connection(api_url: Optional[str] = None) -> bool:
     """
     Test the connection to the mempool API.
 
+    Args:
+        api_url: The API URL to test, the configured one by default
+
     Returns:
         True if the connection is successful, False otherwise
     """
-    api_url = get_api_url()
+    api_url = api_url or get_api_url()
     endpoint = f"{api_url}/blocks/tip/height"
     try:
         response = requests.get(endpoint, timeout=10)
@@ -0,0 +1,173 @@
+"""
+Mempool watcher service for SatSentry.
+
+Polls the mempool every few seconds and matches newly seen transactions against
+the output scripts of all monitored addresses, so unconfirmed payments are
+detected without waiting for the next full check cycle.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from app.services import mempool_api
+from app.services.settings import get_settings, DEFAULT_SETTINGS
+from app.services.address_monitor import build_script_index, match_transaction, record_transaction
+from app.services.notification import send_multiple_transaction_notifications
+
+logger = logging.getLogger(__name__)
+
+# How often the script index is rebuilt from the address files
+INDEX_REFRESH_SECONDS = 60
+
+# Number of txids remembered to avoid fetching the same transaction twice
+MAX_SEEN_TXIDS = 20000
+
+class MempoolWatcher:
+    """Singleton watcher matching new mempool transactions against monitored addresses."""
+
+    _instance: Optional['MempoolWatcher'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'MempoolWatcher':
+        """Get or create the watcher instance."""
+        if cls._instance is None:
+            cls._instance = MempoolWatcher()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the watcher."""
+        if MempoolWatcher._instance is not None:
+            raise RuntimeError("Mempool watcher is a singleton. Use get_instance() instead.")
+
+        self._thread = None
+        self._running = False
+        self._seen_txids: 'OrderedDict[str, None]' = OrderedDict()
+        self._mempool_txids: Optional[set] = None  # Last txids snapshot, for the 'txids' source
+        self._script_index: Dict[str, Dict[str, Any]] = {}
+        self._index_built_at = 0.0
+
+    def start(self) -> bool:
+        """Start the mempool watcher thread."""
+        if self._thread and self._thread.is_alive():
+            logger.warning("Mempool watcher already running")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._watch_task)
+        self._thread.daemon = True
+        self._thread.start()
+
+        logger.info("Mempool watcher started")
+        return True
+
+    def stop(self) -> None:
+        """Stop the mempool watcher thread."""
+        self._running = False
+
+    def _remember(self, txid: str) -> bool:
+        """
+        Remember a txid.
+
+        Returns:
+            True if the txid was not seen before
+        """
+        if txid in self._seen_txids:
+            return False
+
+        self._seen_txids[txid] = None
+        while len(self._seen_txids) > MAX_SEEN_TXIDS:
+            self._seen_txids.popitem(last=False)
+        return True
+
+    def _get_new_txids(self, source: str) -> List[str]:
+        """
+        Get the txids that entered the mempool since the previous poll.
+
+        Args:
+            source: 'recent' for /mempool/recent, 'txids' for the /mempool/txids delta
+
+        Returns:
+            List of new txids
+        """
+        if source == 'txids':
+            current = set(mempool_api.get_mempool_txids())
+            previous, self._mempool_txids = self._mempool_txids, current
+
+            # The first snapshot only sets the baseline
+            if previous is None:
+                return []
+            return [txid for txid in current - previous if self._remember(txid)]
+
+        return [tx['txid'] for tx in mempool_api.get_recent_mempool_transactions() if self._remember(tx['txid'])]
+
+    def _get_script_index(self) -> Dict[str, Dict[str, Any]]:
+        """Get the script index, rebuilding it when it is too old."""
+        if time.monotonic() - self._index_built_at > INDEX_REFRESH_SECONDS:
+            self._script_index = build_script_index()
+            self._index_built_at = time.monotonic()
+        return self._script_index
+
+    def poll_once(self) -> List[Dict[str, Any]]:
+        """
+        Fetch new mempool transactions and match them against monitored addresses.
+
+        Returns:
+            List of check results for monitored addresses touched by new transactions
+        """
+        settings = get_settings()
+        source = settings.get('mempool_watch_source', DEFAULT_SETTINGS['mempool_watch_source'])
+
+        new_txids = self._get_new_txids(source)
+        if not new_txids:
+            return []
+
+        script_index = self._get_script_index()
+        results = []
+
+        for txid in new_txids:
+            try:
+                tx = mempool_api.get_transaction_details(txid)
+            except ValueError:
+                continue
+
+            for script in match_transaction(tx, script_index):
+                entry = script_index[script]
+                result = record_transaction(entry['address'], entry['metadata'], tx)
+                if result:
+                    results.append(result)
+
+        return results
+
+    def _watch_task(self):
+        """Background task polling the mempool."""
+        logger.info("Starting mempool watch task")
+
+        while self._running:
+            settings = get_settings()
+            interval = max(settings.get('mempool_watch_interval', DEFAULT_SETTINGS['mempool_watch_interval']), 1)
+
+            if not settings.get('mempool_watch_enabled', DEFAULT_SETTINGS['mempool_watch_enabled']):
+                # Forget the snapshot so re-enabling starts from a fresh baseline
+                self._mempool_txids = None
+                time.sleep(interval)
+                continue
+
+            try:
+                results = self.poll_once()
+                if results:
+                    logger.info(f"Found {len(results)} new unconfirmed transactions in the mempool")
+                    if send_multiple_transaction_notifications(results):
+                        logger.info(f"Successfully sent notifications for {len(results)} mempool transactions")
+                    else:
+                        logger.error("Failed to send mempool notifications")
+            except Exception as e:
+                logger.error(f"Error watching the mempool: {e}")
+
+            time.sleep(interval)
+
+def start_mempool_watcher() -> bool:
+    """Start the mempool watcher."""
+    return MempoolWatcher.get_instance().start()
@@ -0,0 +1,378 @@
+"""
+Mempool WebSocket backend for SatSentry.
+
+Self-hosted mempool instances push address activity over their WebSocket API
+(`track-addresses`). This backend keeps persistent sockets subscribed to every
+monitored address and turns pushed transactions into the same check results as
+check_all_addresses, so the scheduler polling only acts as a slow consistency sweep.
+
+Only a minimal RFC 6455 client is implemented here, to avoid pulling in a
+WebSocket dependency.
+"""
+
+import os
+import ssl
+import json
+import time
+import base64
+import socket
+import struct
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Any, List, Optional
+from urllib.parse import urlparse
+
+from app.services import mempool_api
+from app.services.settings import get_settings, DEFAULT_SETTINGS
+from app.services.address_monitor import build_script_index, record_transaction
+from app.services.notification import send_multiple_transaction_notifications
+
+logger = logging.getLogger(__name__)
+
+# WebSocket opcodes
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+# GUID used to compute the Sec-WebSocket-Accept handshake header
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# Seconds without any message before a ping is sent
+PING_INTERVAL = 30
+
+# How often the monitored addresses are reloaded to update the subscriptions
+INDEX_REFRESH_SECONDS = 60
+
+# Maximum delay between reconnection attempts
+MAX_RECONNECT_DELAY = 60
+
+def _encode_frame(opcode: int, payload: bytes, masked: bool = True) -> bytes:
+    """
+    Encode a single final WebSocket frame.
+
+    Args:
+        opcode: The frame opcode
+        payload: The frame payload
+        masked: Whether to mask the payload (required for client frames)
+
+    Returns:
+        The encoded frame
+    """
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if masked else 0x00
+    length = len(payload)
+
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 65536:
+        header += bytes([mask_bit | 126]) + struct.pack('>H', length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('>Q', length)
+
+    if not masked:
+        return header + payload
+
+    mask = os.urandom(4)
+    return header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+def _read_frame(read_exact: Callable[[int], bytes]) -> tuple:
+    """
+    Read a single WebSocket frame.
+
+    Args:
+        read_exact: Function reading exactly n bytes from the connection
+
+    Returns:
+        Tuple of (fin, opcode, payload)
+    """
+    first, second = read_exact(2)
+    fin = bool(first & 0x80)
+    opcode = first & 0x0F
+    length = second & 0x7F
+
+    if length == 126:
+        length = struct.unpack('>H', read_exact(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', read_exact(8))[0]
+
+    mask = read_exact(4) if second & 0x80 else None
+    payload = read_exact(length) if length else b''
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+    return fin, opcode, payload
+
+class WebSocketConnection:
+    """Minimal blocking WebSocket client connection for text messages."""
+
+    def __init__(self, url: str, timeout: float = PING_INTERVAL):
+        """
+        Initialize the connection.
+
+        Args:
+            url: The ws:// or wss:// URL
+            timeout: Socket read timeout in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+        self._sock = None
+        self._buffer = b''
+
+    def connect(self) -> None:
+        """
+        Open the connection and perform the opening handshake.
+
+        Raises:
+            ConnectionError: If the server rejects the handshake
+        """
+        parsed = urlparse(self.url)
+        secure = parsed.scheme == 'wss'
+        port = parsed.port or (443 if secure else 80)
+
+        sock = socket.create_connection((parsed.hostname, port), timeout=self.timeout)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (
+            f"GET {parsed.path or '/'} HTTP/1.1\r\n"
+            f"Host: {parsed.hostname}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        sock.sendall(request.encode())
+        self._sock = sock
+
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("Connection closed during WebSocket handshake")
+            response += chunk
+
+        head, self._buffer = response.split(b'\r\n\r\n', 1)
+        lines = head.decode(errors='replace').split('\r\n')
+        if ' 101 ' not in f"{lines[0]} ":
+            raise ConnectionError(f"WebSocket handshake rejected: {lines[0]}")
+
+        headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(':') for line in lines[1:])}
+        expected = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        if headers.get('sec-websocket-accept') != expected:
+            raise ConnectionError("Invalid Sec-WebSocket-Accept header")
+
+    def _read_exact(self, size: int) -> bytes:
+        """Read exactly size bytes from the socket."""
+        while len(self._buffer) < size:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("WebSocket connection closed")
+            self._buffer += chunk
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def send_text(self, text: str) -> None:
+        """Send a text message."""
+        self._sock.sendall(_encode_frame(OPCODE_TEXT, text.encode()))
+
+    def ping(self) -> None:
+        """Send a ping frame."""
+        self._sock.sendall(_encode_frame(OPCODE_PING, b''))
+
+    def recv_text(self) -> Optional[str]:
+        """
+        Receive the next text message, answering pings on the way.
+
+        Returns:
+            The message, or None if nothing arrived before the timeout
+
+        Raises:
+            ConnectionError: If the connection was closed
+        """
+        fragments = []
+        while True:
+            try:
+                fin, opcode, payload = _read_frame(self._read_exact)
+            except socket.timeout:
+                if fragments:
+                    raise ConnectionError("Timed out in the middle of a WebSocket message")
+                return None
+
+            if opcode == OPCODE_PING:
+                self._sock.sendall(_encode_frame(OPCODE_PONG, payload))
+            elif opcode == OPCODE_CLOSE:
+                raise ConnectionError("WebSocket closed by server")
+            elif opcode in (OPCODE_TEXT, OPCODE_CONTINUATION):
+                fragments.append(payload)
+                if fin:
+                    return b''.join(fragments).decode()
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._sock:
+            try:
+                self._sock.sendall(_encode_frame(OPCODE_CLOSE, b''))
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+
+class MempoolWebSocketClient:
+    """
+    Singleton client tracking all monitored addresses over the mempool WebSocket API.
+
+    A `track-addresses` message replaces the set tracked by a socket and the server
+    caps its size, so addresses are split in batches of `websocket_batch_size` and
+    each batch is carried by one persistent socket.
+    """
+
+    _instance: Optional['MempoolWebSocketClient'] = None
+
+    @classmethod
+    def get_instance(cls) -> 'MempoolWebSocketClient':
+        """Get or create the client instance."""
+        if cls._instance is None:
+            cls._instance = MempoolWebSocketClient()
+        return cls._instance
+
+    def __init__(self):
+        """Initialize the client."""
+        if MempoolWebSocketClient._instance is not None:
+            raise RuntimeError("WebSocket client is a singleton. Use get_instance() instead.")
+
+        self._running = False
+        self._lock = threading.Lock()
+        self._threads: Dict[int, threading.Thread] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}  # Address to script index entry
+        self._batches: List[List[str]] = []
+        self._index_built_at = 0.0
+
+    def start(self) -> bool:
+        """Start the client threads."""
+        if self._running:
+            logger.warning("WebSocket client already running")
+            return False
+
+        self._running = True
+        self.refresh_subscriptions()
+
+        logger.info("WebSocket client started")
+        return True
+
+    def stop(self) -> None:
+        """Stop the client threads."""
+        self._running = False
+
+    def refresh_subscriptions(self) -> None:
+        """Reload the monitored addresses and start a socket for every batch."""
+        settings = get_settings()
+        batch_size = max(settings.get('websocket_batch_size', DEFAULT_SETTINGS['websocket_batch_size']), 1)
+        entries = {entry['address']: entry for entry in build_script_index().values()}
+        addresses = sorted(entries)
+
+        with self._lock:
+            self._entries = entries
+            self._batches = [addresses[i:i + batch_size] for i in range(0, len(addresses), batch_size)]
+            self._index_built_at = time.monotonic()
+
+            for batch_index in range(len(self._batches)):
+                thread = self._threads.get(batch_index)
+                if self._running and (thread is None or not thread.is_alive()):
+                    thread = threading.Thread(target=self._socket_task, args=(batch_index,))
+                    thread.daemon = True
+                    self._threads[batch_index] = thread
+                    thread.start()
+
+    def _get_batch(self, batch_index: int) -> Optional[List[str]]:
+        """Get the addresses of a batch, or None if the batch no longer exists."""
+        with self._lock:
+            if batch_index < len(self._batches):
+                return self._batches[batch_index]
+            return None
+
+    def handle_message(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Turn a pushed message into check results.
+
+        Args:
+            message: The decoded WebSocket message
+
+        Returns:
+            List of check results for monitored addresses with new transactions
+        """
+        if 'track-addresses-error' in message:
+            logger.error(f"Address tracking rejected by the server: {message['track-addresses-error']}")
+
+        results = []
+        for address, changes in (message.get('multi-address-transactions') or {}).items():
+            with self._lock:
+                entry = self._entries.get(address)
+            if not entry:
+                continue
+
+            for tx in changes.get('mempool', []) + changes.get('confirmed', []):
+                result = record_transaction(address, entry['metadata'], tx)
+                if result:
+                    results.append(result)
+
+        return results
+
+    def _socket_task(self, batch_index: int):
+        """Background task keeping the socket of one batch connected and subscribed."""
+        reconnect_delay = 1
+
+        while self._running:
+            batch = self._get_batch(batch_index)
+            if not batch:
+                logger.info(f"WebSocket batch {batch_index} no longer needed, closing")
+                return
+
+            connection = WebSocketConnection(mempool_api.get_websocket_url())
+            try:
+                connection.connect()
+                connection.send_text(json.dumps({'track-addresses': batch}))
+                subscribed = batch
+                logger.info(f"WebSocket batch {batch_index} subscribed to {len(batch)} addresses")
+                reconnect_delay = 1
+
+                while self._running:
+                    message = connection.recv_text()
+                    if message is None:
+                        connection.ping()
+                    else:
+                        results = self.handle_message(json.loads(message))
+                        if results:
+                            logger.info(f"Received {len(results)} new transactions over WebSocket")
+                            if not send_multiple_transaction_notifications(results):
+                                logger.error("Failed to send WebSocket notifications")
+
+                    # Only the first socket reloads the addresses, the others pick up the new batches
+                    if batch_index == 0 and time.monotonic() - self._index_built_at > INDEX_REFRESH_SECONDS:
+                        self.refresh_subscriptions()
+
+                    batch = self._get_batch(batch_index)
+                    if not batch:
+                        break
+                    if batch != subscribed:
+                        connection.send_text(json.dumps({'track-addresses': batch}))
+                        subscribed = batch
+            except (OSError, ConnectionError, ValueError) as e:
+                logger.warning(f"WebSocket batch {batch_index} disconnected: {e}")
+            finally:
+                connection.close()
+
+            if self._running:
+                time.sleep(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, MAX_RECONNECT_DELAY)
+
+def start_mempool_websocket() -> bool:
+    """Start the WebSocket backend if it is enabled in the settings."""
+    settings = get_settings()
+    if not settings.get('websocket_enabled', DEFAULT_SETTINGS['websocket_enabled']):
+        return False
+    return MempoolWebSocketClient.get_instance().start()
@@ -0,0 +1,338 @@
+"""
+In-process metrics registry for SatSentry.
+
+Counters and histograms are keyed by name and labels and updated under a
+single short-held lock, so recording from the request path stays cheap. The
+snapshot is a plain dictionary the web layer and logs can read, and
+render_prometheus() serves the same values in the Prometheus text format.
+"""
+
+import os
+import time
+import bisect
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Upper bounds of the response size histogram buckets, in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Upper bounds of the check cycle duration histogram buckets, in seconds
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# Prefix of every metric name in the Prometheus exposition
+PROMETHEUS_PREFIX = 'satsentry_'
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# API requests sent per thread, see count_request()
+_thread_requests = threading.local()
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    """Turn labels into a hashable, ordered key."""
+    return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+class Histogram:
+    """Distribution of observed values over fixed buckets."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets: Sorted upper bounds of the buckets; larger values fall in an implicit +Inf bucket
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the histogram with cumulative bucket counts."""
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            cumulative.append([bound, seen])
+        return {'count': self.count, 'sum': self.sum, 'buckets': cumulative}
+
+class MetricsRegistry:
+    """Registry of the counters and histograms of the process."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def increment(self, name: str, labels: Optional[Dict[str, Any]] = None, amount: float = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name: The counter name
+            labels: The labels of the series
+            amount: The increment
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set_counter(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Set a counter to a total kept outside of the registry, e.g. by the operating system.
+
+        Args:
+            name: The counter name
+            value: The total, never decreasing
+            labels: The labels of the series
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._counters.setdefault(name, {})[key] = value
+
+    def set_gauge(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Set a gauge to its current value.
+
+        Args:
+            name: The gauge name
+            value: The value
+            labels: The labels of the series
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None,
+                buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Record a value in a histogram.
+
+        Args:
+            name: The histogram name
+            value: The observed value
+            labels: The labels of the series
+            buckets: The bucket bounds, fixed by the first observation of the name
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.setdefault(name, buckets))
+            histogram.observe(value)
+
+    def get_counter(self, name: str, labels: Optional[Dict[str, Any]] = None) -> float:
+        """Get the value of a counter series, 0 if never incremented."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def get_histogram(self, name: str, labels: Optional[Dict[str, Any]] = None) -> Optional[Histogram]:
+        """Get a histogram series, None if never observed."""
+        with self._lock:
+            return self._histograms.get(name, {}).get(_label_key(labels))
+
+    def get_observation_count(self, name: str) -> int:
+        """Get the number of values recorded in a histogram, over all its series."""
+        with self._lock:
+            return sum(histogram.count for histogram in self._histograms.get(name, {}).values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a copy of every metric.
+
+        Returns:
+            Dictionary with 'counters', 'gauges' and 'histograms', each mapping a
+            metric name to a list of {'labels', 'value'} series
+        """
+        with self._lock:
+            return {
+                'counters': {
+                    name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                'gauges': {
+                    name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                    for name, series in self._gauges.items()
+                },
+                'histograms': {
+                    name: [{'labels': dict(key), 'value': histogram.to_dict()} for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                }
+            }
+
+    def reset(self) -> None:
+        """Drop every metric."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._buckets.clear()
+
+# Registry shared by the whole process
+registry = MetricsRegistry()
+
+def increment(name: str, labels: Optional[Dict[str, Any]] = None, amount: float = 1) -> None:
+    """Increment a counter of the process registry."""
+    registry.increment(name, labels, amount)
+
+def set_gauge(name: str, value: float, labels: Optional[Dict[str, Any]] = None) -> None:
+    """Set a gauge of the process registry."""
+    registry.set_gauge(name, value, labels)
+
+def observe(name: str, value: float, labels: Optional[Dict[str, Any]] = None,
+            buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+    """Record a value in a histogram of the process registry."""
+    registry.observe(name, value, labels, buckets)
+
+def record_flush(path: str, start: float) -> None:
+    """
+    Record the duration and size of a data file write.
+
+    Args:
+        path: The written file
+        start: time.monotonic() before the write started
+    """
+    labels = {'file': os.path.basename(path)}
+    registry.observe('storage_flush_duration_seconds', time.monotonic() - start, labels)
+    try:
+        registry.set_gauge('storage_file_bytes', os.path.getsize(path), labels)
+    except OSError:
+        pass
+
+def get_rss_bytes() -> int:
+    """Get the resident set size of the process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is the peak, in kilobytes, where /proc is unavailable
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def get_request_count() -> int:
+    """Get the number of API requests answered by every backend since start."""
+    return registry.get_observation_count('api_request_duration_seconds')
+
+def count_request() -> None:
+    """
+    Count an API request sent by the calling thread, whether it gets an answer or not.
+
+    A check cycle compares these counts to tell its own requests from those of the
+    watchers and jobs, and timeouts during an outage still spend its budget.
+    """
+    _thread_requests.count = getattr(_thread_requests, 'count', 0) + 1
+
+def get_thread_request_count() -> int:
+    """Get the number of API requests sent by the calling thread since it started."""
+    return getattr(_thread_requests, 'count', 0)
+
+def snapshot() -> Dict[str, Any]:
+    """Get a copy of every metric of the process registry."""
+    return registry.snapshot()
+
+def histogram_quantile(histogram: Dict[str, Any], q: float) -> float:
+    """
+    Estimate a quantile of a snapshot histogram as the upper bound of the bucket containing it.
+
+    Args:
+        histogram: A histogram from the snapshot
+        q: The quantile, between 0 and 1
+
+    Returns:
+        The estimate, the largest bucket bound for values beyond it, 0 without observations
+    """
+    if not histogram['count']:
+        return 0.0
+
+    rank = q * histogram['count']
+    for bound, cumulative in histogram['buckets']:
+        if cumulative >= rank:
+            return bound
+    return histogram['buckets'][-1][0]
+
+def summarize_api_requests() -> List[str]:
+    """
+    Summarize the API metrics per endpoint type, for the logs.
+
+    Returns:
+        One line per endpoint type with request count, errors and latency quantiles
+    """
+    data = snapshot()
+    errors: Dict[str, float] = {}
+    for series in data['counters'].get('api_errors_total', []):
+        endpoint = series['labels'].get('endpoint')
+        errors[endpoint] = errors.get(endpoint, 0) + series['value']
+
+    lines = []
+    for series in sorted(data['histograms'].get('api_request_duration_seconds', []), key=lambda s: s['labels'].get('endpoint', '')):
+        endpoint = series['labels'].get('endpoint')
+        histogram = series['value']
+        lines.append(
+            f"{endpoint}: {histogram['count']} requests, {errors.get(endpoint, 0):.0f} errors, "
+            f"p50 <= {histogram_quantile(histogram, 0.5)}s, p95 <= {histogram_quantile(histogram, 0.95)}s"
+        )
+    return lines
+
+def _escape_label_value(value: Any) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    """Format labels as a Prometheus label set, empty without labels."""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label_value(value)}"' for key, value in sorted(labels.items())) + '}'
+
+def _format_value(value: float) -> str:
+    """Format a sample value, integers without a decimal point."""
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+def render_prometheus() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+
+    Only reads the in-memory registry, plus the process memory and CPU time,
+    so scraping never touches the data files.
+
+    Returns:
+        The exposition text
+    """
+    registry.set_gauge('process_resident_memory_bytes', get_rss_bytes())
+    registry.set_counter('process_cpu_seconds_total', time.process_time())
+    data = snapshot()
+
+    lines = []
+    for kind, type_name in (('counters', 'counter'), ('gauges', 'gauge')):
+        for name, series_list in sorted(data[kind].items()):
+            metric = PROMETHEUS_PREFIX + name
+            lines.append(f"# TYPE {metric} {type_name}")
+            for series in series_list:
+                lines.append(f"{metric}{_format_labels(series['labels'])} {_format_value(series['value'])}")
+
+    for name, series_list in sorted(data['histograms'].items()):
+        metric = PROMETHEUS_PREFIX + name
+        lines.append(f"# TYPE {metric} histogram")
+        for series in series_list:
+            labels, histogram = series['labels'], series['value']
+            for bound, cumulative in histogram['buckets']:
+                lines.append(f"{metric}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels({**labels, 'le': '+Inf'})} {histogram['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+
+    return '\n'.join(lines) + '\n'
@@ -9,11 +9,14 @@ from datetime import datetime
 from discord_webhook import DiscordWebhook, DiscordEmbed
 
 from app.services.settings import get_settings
-from app.services import mempool_api
+from app.services import mempool_api, chain_info, metrics
 from app.services.address_monitor import _determine_tx_direction
 
 logger = logging.getLogger(__name__)
 
+# Transactions listed in a digest notification, the rest are counted
+DIGEST_MAX_LINES = 20
+
 def _format_btc_amount(satoshis: int) -> str:
     """
     Format a satoshi amount as BTC.
@@ -50,7 +53,7 @@ def _estimate_confirmation_time(fee_rate: float) -> str:
         Estimated confirmation time
     """
     try:
-        fee_estimates = mempool_api.get_fee_estimates()
+        fee_estimates = chain_info.get_fee_estimates()
 
         if fee_rate >= fee_estimates.get('fastestFee', 0):
             return "~10-20 minutes (next block)"
@@ -256,4 +259,157 @@ def send_multiple_transaction_notifications(tx_data_list: List[Dict[str, Any]])
         if send_transaction_notification(tx_data):
             success_count += 1
 
+    metrics.increment('notifications_total', {'result': 'success'}, success_count)
+    metrics.increment('notifications_total', {'result': 'failure'}, len(tx_data_list) - success_count)
+    return success_count
+
+def send_digest_notification(tx_data_list: List[Dict[str, Any]], since: datetime) -> bool:
+    """
+    Send one notification summarizing the transactions missed during downtime.
+
+    Args:
+        tx_data_list: List of transaction data, one per missed transaction
+        since: Time of the last check before the downtime
+
+    Returns:
+        True if the notification was sent successfully, False otherwise
+    """
+    settings = get_settings()
+    webhook_url = settings.get('discord_webhook')
+
+    if not webhook_url:
+        logger.warning("Discord webhook URL not configured")
+        metrics.increment('notifications_total', {'result': 'failure'})
+        return False
+
+    try:
+        webhook = DiscordWebhook(url=webhook_url)
+        mempool_url = mempool_api.get_api_url().split("/api")[0]
+
+        lines = []
+        for tx_data in tx_data_list[:DIGEST_MAX_LINES]:
+            address = tx_data.get('address')
+            tx = tx_data.get('latest_tx', {})
+            txid = tx.get('txid', '')
+            direction = 'Incoming' if _determine_tx_direction(address, tx) == 'incoming' else 'Outgoing'
+            label = f" ({tx_data['label']})" if tx_data.get('label') else ''
+            lines.append(f"{direction} `{address}`{label}: [{txid[:8]}...{txid[-8:]}]({mempool_url}/tx/{txid})")
+        if len(tx_data_list) > DIGEST_MAX_LINES:
+            lines.append(f"... and {len(tx_data_list) - DIGEST_MAX_LINES} more")
+
+        embed = DiscordEmbed(
+            title=f"{len(tx_data_list)} Transaction{'s' if len(tx_data_list) > 1 else ''} Missed While Offline",
+            description="\n".join(lines),
+            color=0xf1c40f
+        )
+
+        embed.add_embed_field(
+            name="Offline Since",
+            value=since.strftime('%Y-%m-%d %H:%M:%S')
+        )
+
+        embed.set_timestamp()
+        webhook.add_embed(embed)
+        response = webhook.execute()
+
+        sent = response.status_code == 200
+        if sent:
+            logger.info(f"Digest notification sent for {len(tx_data_list)} transactions")
+        else:
+            logger.error(f"Failed to send digest notification: {response.status_code} - {response.text}")
+
+    except Exception as e:
+        logger.error(f"Error sending digest notification: {e}")
+        sent = False
+
+    metrics.increment('notifications_total', {'result': 'success' if sent else 'failure'})
+    return sent
+
+def send_confirmation_notification(event: Dict[str, Any]) -> bool:
+    """
+    Send a confirmation milestone notification via Discord webhook.
+
+    Args:
+        event: Milestone event from the confirmation tracker containing:
+            - txid, address, label and direction of the transaction
+            - confirmations: Current number of confirmations
+            - milestone: The highest milestone reached
+            - block_height: Height of the confirming block
+
+    Returns:
+        True if the notification was sent successfully, False otherwise
+    """
+    settings = get_settings()
+    webhook_url = settings.get('discord_webhook')
+
+    if not webhook_url:
+        logger.warning("Discord webhook URL not configured")
+        return False
+
+    try:
+        webhook = DiscordWebhook(url=webhook_url)
+
+        txid = event['txid']
+        milestone = event['milestone']
+        embed = DiscordEmbed(
+            title=f"Transaction Reached {milestone} Confirmation{'s' if milestone > 1 else ''}",
+            color=0x3498db
+        )
+
+        embed.add_embed_field(
+            name="Address",
+            value=f"`{event['address']}`\n{event.get('label', '')}"
+        )
+
+        embed.add_embed_field(
+            name="Direction",
+            value=event.get('direction', 'unknown').capitalize()
+        )
+
+        mempool_url = mempool_api.get_api_url().split("/api")[0]
+
+        embed.add_embed_field(
+            name="Transaction ID",
+            value=f"[{txid[:8]}...{txid[-8:]}]({mempool_url}/tx/{txid})"
+        )
+
+        embed.add_embed_field(
+            name="Confirmations",
+            value=str(event['confirmations'])
+        )
+
+        embed.add_embed_field(
+            name="Block",
+            value=str(event.get('block_height'))
+        )
+
+        embed.set_timestamp()
+        webhook.add_embed(embed)
+        response = webhook.execute()
+
+        if response.status_code == 200:
+            logger.info(f"Confirmation notification sent for transaction {txid}")
+            return True
+        else:
+            logger.error(f"Failed to send confirmation notification: {response.status_code} - {response.text}")
+            return False
+
+    except Exception as e:
+        logger.error(f"Error sending confirmation notification: {e}")
+        return False
+
+def send_confirmation_notifications(events: List[Dict[str, Any]]) -> int:
+    """
+    Send notifications for multiple confirmation milestone events.
+
+    Args:
+        events: List of milestone events
+
+    Returns:
+        Number of notifications sent successfully
+    """
+    success_count = sum(1 for event in events if send_confirmation_notification(event))
+
+    metrics.increment('notifications_total', {'result': 'success'}, success_count)
+    metrics.increment('notifications_total', {'result': 'failure'}, len(events) - success_count)
     return success_count
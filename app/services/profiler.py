@@ -0,0 +1,189 @@
+"""
+Phase-level profiling of check cycles for SatSentry.
+
+The scheduler wraps each cycle in profile_cycle(); the services mark their
+expensive steps with phase(). Phase times are exclusive: time spent in a
+nested phase is only counted once, in the innermost one. phase() outside of a
+profiled cycle, or in another thread, costs a single thread-local lookup.
+
+The profiles of the last cycles are kept in a ring buffer. With capture
+enabled, every cycle also runs under cProfile and its stats are dumped to a
+.pstats file, readable with pstats, snakeviz or flameprof.
+"""
+
+import os
+import time
+import logging
+import cProfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from app.services.settings import get_file_path
+
+logger = logging.getLogger(__name__)
+
+# Phases timed during a check cycle
+PHASES = ('load_state', 'derivation', 'http_fetch', 'direction', 'disk_save', 'notification')
+
+# Directory of the captured cProfile stats, inside the data directory
+PROFILES_DIR = 'profiles'
+
+class CycleProfile:
+    """Time spent in each phase of one check cycle."""
+
+    def __init__(self):
+        """Start profiling a cycle."""
+        self.started_at = datetime.now()
+        self.duration = 0.0
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.stats_file: Optional[str] = None
+        self._start = time.perf_counter()
+        self._stack: List[List[Any]] = []  # [name, start, time spent in nested phases]
+
+    def enter(self, name: str) -> None:
+        """Enter a phase."""
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self) -> None:
+        """Leave the innermost phase, crediting its exclusive time."""
+        name, start, nested = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        phase = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        phase['seconds'] += elapsed - nested
+        phase['calls'] += 1
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+    def finish(self) -> None:
+        """Stop the cycle clock."""
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the profile as a dictionary.
+
+        Returns:
+            Dictionary with the cycle start, duration, per-phase seconds and calls,
+            the time outside of any phase and the captured stats file if any
+        """
+        accounted = sum(phase['seconds'] for phase in self.phases.values())
+        return {
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'duration': round(self.duration, 6),
+            'phases': {
+                name: {'seconds': round(phase['seconds'], 6), 'calls': phase['calls']}
+                for name, phase in sorted(self.phases.items(), key=lambda item: -item[1]['seconds'])
+            },
+            'unaccounted': round(max(self.duration - accounted, 0.0), 6),
+            'stats_file': self.stats_file
+        }
+
+_local = threading.local()
+_history_lock = threading.Lock()
+_history: deque = deque(maxlen=20)
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Time a phase of the current check cycle.
+
+    Args:
+        name: The phase name, one of PHASES
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        yield
+        return
+
+    profile.enter(name)
+    try:
+        yield
+    finally:
+        profile.exit()
+
+def _dump_stats(profiler: cProfile.Profile, keep: int) -> str:
+    """
+    Dump cProfile stats of a cycle, keeping only the most recent files.
+
+    Args:
+        profiler: The disabled profiler of the cycle
+        keep: Number of stats files to keep
+
+    Returns:
+        Path of the written file
+    """
+    profiles_dir = os.path.join(get_file_path('data_dir'), PROFILES_DIR)
+    os.makedirs(profiles_dir, exist_ok=True)
+
+    path = os.path.join(profiles_dir, f"cycle-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.pstats")
+    profiler.dump_stats(path)
+
+    stats_files = sorted(name for name in os.listdir(profiles_dir) if name.endswith('.pstats'))
+    for name in stats_files[:-keep]:
+        os.remove(os.path.join(profiles_dir, name))
+    return path
+
+@contextmanager
+def profile_cycle(history_size: int = 20, capture: bool = False) -> Iterator[CycleProfile]:
+    """
+    Profile a check cycle run by the calling thread.
+
+    Args:
+        history_size: Number of cycle profiles kept in the ring buffer
+        capture: Whether to run the cycle under cProfile and dump its stats
+
+    Yields:
+        The profile of the cycle, added to the ring buffer when the cycle ends
+    """
+    global _history
+
+    profile = CycleProfile()
+    profiler = cProfile.Profile() if capture else None
+    _local.profile = profile
+    if profiler:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler:
+            profiler.disable()
+        _local.profile = None
+        profile.finish()
+
+        if profiler:
+            try:
+                profile.stats_file = _dump_stats(profiler, history_size)
+            except OSError as e:
+                logger.error(f"Error saving cycle profile stats: {e}")
+
+        with _history_lock:
+            if _history.maxlen != history_size:
+                _history = deque(_history, maxlen=history_size)
+            _history.append(profile)
+
+def get_cycle_profiles() -> List[Dict[str, Any]]:
+    """
+    Get the profiles of the last check cycles.
+
+    Returns:
+        List of cycle profiles, most recent first
+    """
+    with _history_lock:
+        return [profile.to_dict() for profile in reversed(_history)]
+
+def summarize(profile: CycleProfile) -> str:
+    """
+    Summarize the slowest phases of a cycle, for the logs.
+
+    Args:
+        profile: The cycle profile
+
+    Returns:
+        One line with the cycle duration and time per phase
+    """
+    data = profile.to_dict()
+    phases = ', '.join(f"{name} {phase['seconds']:.2f}s/{phase['calls']}" for name, phase in data['phases'].items())
+    return f"{data['duration']:.2f}s ({phases or 'no phases'}, other {data['unaccounted']:.2f}s)"
@@ -2,18 +2,206 @@
 Scheduler service for SatSentry.
 """
 
+import heapq
+import itertools
 import logging
+import random
 import threading
 import time
+from contextlib import ExitStack
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 from app.services.settings import get_settings, DEFAULT_SETTINGS
-from app.services.address_monitor import check_all_addresses
-from app.services.notification import send_multiple_transaction_notifications
+from app.services.address_monitor import check_address, check_all_addresses, catch_up_addresses, _iter_monitored_addresses
+from app.services.block_scanner import scan_new_blocks
+from app.services.notification import send_multiple_transaction_notifications, send_digest_notification
+from app.services import address_schedule, metrics, profiler
 
 logger = logging.getLogger(__name__)
 
+# How often the continuous mode reloads the monitored addresses, in seconds
+QUEUE_SYNC_INTERVAL = 60
+
+# Seconds to wait after an unexpected error in the check task
+ERROR_RETRY_DELAY = 60
+
+# Commands accepted by AddressScheduler.send_command
+SCHEDULER_COMMANDS = ('trigger', 'pause', 'resume', 'reschedule', 'settings_changed')
+
+def _get_check_interval(settings: Dict[str, Any]) -> int:
+    """
+    Get the interval between two check cycles.
+
+    When the WebSocket, Electrum or Bitcoin Core backend reports address activity,
+    polling only acts as a slow consistency sweep.
+
+    Args:
+        settings: The current settings
+
+    Returns:
+        The check interval in seconds
+    """
+    check_interval = settings.get('check_interval', DEFAULT_SETTINGS['check_interval'])
+    pushed = (settings.get('websocket_enabled', DEFAULT_SETTINGS['websocket_enabled']) or
+              settings.get('chain_backend', DEFAULT_SETTINGS['chain_backend']) != 'mempool')
+    if pushed:
+        return max(check_interval, settings.get('websocket_sweep_interval', DEFAULT_SETTINGS['websocket_sweep_interval']))
+    return check_interval
+
+def _get_address_filter(settings: Dict[str, Any], resumed_from: Optional[float] = None) -> Optional[Callable[..., bool]]:
+    """
+    Get the filter selecting the addresses checked in this cycle.
+
+    With adaptive polling, only the addresses whose tier interval elapsed are
+    checked; otherwise every address is checked every cycle. A resumed cycle
+    skips the addresses already checked before it was interrupted.
+
+    Args:
+        settings: The current settings
+        resumed_from: Start time of the interrupted cycle being resumed, if any
+
+    Returns:
+        The filter for check_all_addresses, or None to check every address
+    """
+    adaptive = settings.get('adaptive_polling', DEFAULT_SETTINGS['adaptive_polling'])
+    if not adaptive and resumed_from is None:
+        return None
+
+    schedule = address_schedule.AddressSchedule.get_instance()
+
+    def select(address: str, metadata: Dict[str, Any], extended_key: Optional[str], derivation_path: Optional[str]) -> bool:
+        if resumed_from is not None and (schedule.get_last_checked(address) or 0.0) >= resumed_from:
+            return False
+        return not adaptive or schedule.is_due(address, metadata, settings)
+
+    return select
+
+def _get_address_interval(settings: Dict[str, Any], address: str, metadata: Dict[str, Any], check_interval: int) -> int:
+    """Get the interval between two checks of an address, by tier with adaptive polling."""
+    if not settings.get('adaptive_polling', DEFAULT_SETTINGS['adaptive_polling']):
+        return check_interval
+
+    tier = address_schedule.AddressSchedule.get_instance().get_tier(address, metadata, settings)
+    if tier == 'hot':
+        return check_interval
+    return max(check_interval, settings.get(f'{tier}_interval', DEFAULT_SETTINGS[f'{tier}_interval']))
+
+def _get_coverage_lag(settings: Dict[str, Any], check_interval: int) -> int:
+    """
+    Get how far the least recently checked address is behind its check interval.
+
+    Addresses never checked yet are left out: they are always checked first.
+
+    Args:
+        settings: The current settings
+        check_interval: The check interval in seconds
+
+    Returns:
+        Seconds since the most overdue address should have been checked, 0 when none is overdue
+    """
+    schedule = address_schedule.AddressSchedule.get_instance()
+    now = time.time()
+    lag = 0.0
+    for address, metadata, _, _ in _iter_monitored_addresses():
+        last_checked = schedule.get_last_checked(address)
+        if last_checked is not None:
+            lag = max(lag, now - last_checked - _get_address_interval(settings, address, metadata, check_interval))
+    return int(lag)
+
+class CycleBudget:
+    """Request and wall time budget of a check cycle. A limit of 0 disables it."""
+
+    def __init__(self, max_requests: int = 0, max_seconds: float = 0):
+        """
+        Start spending the budget.
+
+        Args:
+            max_requests: Maximum number of API requests made by the cycle, counted on the calling thread
+            max_seconds: Maximum duration of the cycle in seconds
+        """
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self.deferred = 0  # Addresses left over for the next cycle
+        self._start = time.monotonic()
+        # Counted on the cycle thread only, the watchers and jobs make requests concurrently
+        self._requests_start = metrics.get_thread_request_count()
+
+    def allows(self) -> bool:
+        """
+        Check whether one more address fits in the budget, counting it as deferred otherwise.
+
+        Returns:
+            False once either limit is reached
+        """
+        if not self.deferred:
+            requests = metrics.get_thread_request_count() - self._requests_start
+            elapsed = time.monotonic() - self._start
+            if not ((self.max_requests and requests >= self.max_requests) or
+                    (self.max_seconds and elapsed >= self.max_seconds)):
+                return True
+        self.deferred += 1
+        return False
+
+class DueQueue:
+    """Min-heap of addresses ordered by the time their next check is due."""
+
+    def __init__(self):
+        """Initialize an empty queue."""
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()  # Keeps equal due times in insertion order
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, address: str, due: float) -> None:
+        """Schedule the next check of an address at the given time.time()."""
+        heapq.heappush(self._heap, (due, next(self._counter), address))
+
+    def pop_due(self, now: float) -> Optional[str]:
+        """Remove and return the most overdue address, None if no check is due yet."""
+        if self._heap and self._heap[0][0] <= now:
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def next_due(self) -> Optional[float]:
+        """Get the time the next check is due, None if the queue is empty."""
+        return self._heap[0][0] if self._heap else None
+
+    def count_due(self, now: float) -> int:
+        """Count the checks that are due."""
+        return sum(1 for due, _, _ in self._heap if due <= now)
+
+    def shift(self, seconds: float) -> None:
+        """Postpone every check by the same delay, which keeps the heap order."""
+        self._heap = [(due + seconds, seq, address) for due, seq, address in self._heap]
+
+    def expedite(self, now: float) -> None:
+        """Make every check due now, keeping their relative order."""
+        # Renumbered in due order, the sorted list stays a valid heap
+        self._heap = [(min(due, now), i, address) for i, (due, _, address) in enumerate(sorted(self._heap))]
+
+def _spread(addresses: List[str], start: float, window: float, jitter: float) -> List[Tuple[str, float]]:
+    """
+    Spread the checks of addresses evenly over a time window.
+
+    Each address gets its own slot of the window and a random time inside it,
+    scaled by jitter (0 puts every check at the start of its slot).
+
+    Args:
+        addresses: The addresses to schedule
+        start: Start of the window, as time.time()
+        window: Length of the window in seconds
+        jitter: Share of the slot used for random placement, between 0 and 1
+
+    Returns:
+        List of (address, due time)
+    """
+    if not addresses:
+        return []
+    slot = window / len(addresses)
+    return [(address, start + (i + random.random() * jitter) * slot) for i, address in enumerate(addresses)]
+
 class AddressScheduler:
     """Singleton scheduler for address monitoring."""
 
@@ -40,6 +228,24 @@ class AddressScheduler:
         self._paused_seconds_remaining = None  # Store remaining seconds when paused
         self._pause_time = None  # Store the time when paused
         self._initialized = False
+        self._coverage_lag: Optional[int] = None  # Seconds the most overdue address is behind
+        self._catch_up_since: Optional[float] = None  # Last check before the downtime to catch up on
+        self._deferred = 0  # Addresses carried over by the last cycle
+
+        # Commands change the state under this condition and notify the check task
+        self._condition = threading.Condition()
+        self._trigger_requested = False
+
+        # Continuous mode state
+        self._queue: Optional[DueQueue] = None
+        self._settings: Dict[str, Any] = {}
+        self._monitored: Dict[str, Tuple[Dict[str, Any], Optional[str], Optional[str]]] = {}
+        self._queued = set()
+        self._slots: Dict[str, float] = {}  # Address to the unjittered time of its next check
+        self._queue_synced_at = 0.0
+        self._round: Optional[ExitStack] = None
+        self._round_checked = 0
+        self._round_new_transactions = 0
 
     def start(self) -> bool:
         """Start the address check scheduler."""
@@ -52,9 +258,21 @@ class AddressScheduler:
 
         # Set initial next check time
         settings = get_settings()
-        check_interval = settings.get('check_interval', DEFAULT_SETTINGS['check_interval'])
+        check_interval = _get_check_interval(settings)
         self._last_check_time = datetime.now()
         self._next_check_time = self._last_check_time + timedelta(seconds=check_interval)
+        schedule = address_schedule.AddressSchedule.get_instance()
+        last_check = schedule.get_last_check_time()
+        if (settings.get('scan_mode', DEFAULT_SETTINGS['scan_mode']) == 'addresses' and
+                settings.get('catchup_enabled', DEFAULT_SETTINGS['catchup_enabled']) and
+                last_check is not None and time.time() - last_check > check_interval):
+            # Down for longer than a cycle: check everything right away and report what was missed at once
+            self._catch_up_since = last_check
+            self._next_check_time = self._last_check_time
+        elif schedule.has_interrupted_cycle():
+            # The last cycle did not finish before the restart: resume it right away
+            logger.info("Resuming the interrupted check cycle")
+            self._next_check_time = self._last_check_time
 
         self._thread = threading.Thread(target=self._check_addresses_task)
         self._thread.daemon = True
@@ -63,9 +281,83 @@ class AddressScheduler:
         logger.info("Scheduler started")
         return True
 
+    def stop(self) -> None:
+        """Stop the check task after the current check."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def send_command(self, command: str) -> bool:
+        """
+        Apply a command to the scheduler and wake the check task to act on it.
+
+        Args:
+            command: One of SCHEDULER_COMMANDS
+
+        Returns:
+            True if the command was accepted, False if the scheduler state doesn't allow it
+
+        Raises:
+            ValueError: If the command is unknown
+        """
+        handlers = {
+            'trigger': self._on_trigger,
+            'pause': self._on_pause,
+            'resume': self._on_resume,
+            'reschedule': self._on_reschedule,
+            'settings_changed': self._on_settings_changed
+        }
+        if command not in handlers:
+            raise ValueError(f"Unknown scheduler command: {command}")
+
+        with self._condition:
+            accepted = handlers[command]()
+            if accepted:
+                self._condition.notify_all()
+        return accepted
+
+    def trigger(self) -> bool:
+        """Check the addresses now."""
+        return self.send_command('trigger')
+
     def pause(self) -> bool:
         """Pause the address check scheduler."""
-        if not self._running or not self._thread or not self._thread.is_alive():
+        return self.send_command('pause')
+
+    def resume(self) -> bool:
+        """Resume the address check scheduler."""
+        return self.send_command('resume')
+
+    def reschedule(self) -> bool:
+        """Recompute the next check time from the last check and the current check interval."""
+        return self.send_command('reschedule')
+
+    def settings_changed(self) -> bool:
+        """Apply changed settings: check interval, scheduling mode and scan mode."""
+        return self.send_command('settings_changed')
+
+    def _is_thread_running(self) -> bool:
+        """Check whether the check task is running."""
+        return bool(self._running and self._thread and self._thread.is_alive())
+
+    def _on_trigger(self) -> bool:
+        """Handle the trigger command."""
+        if not self._is_thread_running():
+            logger.warning("Scheduler not running")
+            return False
+
+        if self._paused:
+            logger.warning("Scheduler paused, resume it to check addresses")
+            return False
+
+        # Set for immediate UI feedback, cleared by the check task once done
+        self._checking = True
+        self._trigger_requested = True
+        return True
+
+    def _on_pause(self) -> bool:
+        """Handle the pause command."""
+        if not self._is_thread_running():
             logger.warning("Scheduler not running")
             return False
 
@@ -89,9 +381,9 @@ class AddressScheduler:
         logger.info(f"Scheduler paused with {self._paused_seconds_remaining:.1f} seconds remaining until next check")
         return True
 
-    def resume(self) -> bool:
-        """Resume the address check scheduler."""
-        if not self._running or not self._thread or not self._thread.is_alive():
+    def _on_resume(self) -> bool:
+        """Handle the resume command."""
+        if not self._is_thread_running():
             logger.warning("Scheduler not running")
             return False
 
@@ -108,6 +400,10 @@ class AddressScheduler:
 
             # Set the next check time to now + remaining seconds
             self._next_check_time = resume_time + timedelta(seconds=self._paused_seconds_remaining)
+
+            # Continuous mode: postpone the queued checks by the paused time, so they don't all fire at once
+            if self._queue is not None:
+                self._queue.shift((resume_time - self._pause_time).total_seconds())
             logger.info(f"Next check rescheduled for {self._next_check_time} ({self._paused_seconds_remaining:.1f} seconds from now)")
 
             # Reset the paused seconds
@@ -118,6 +414,29 @@ class AddressScheduler:
         logger.info("Scheduler resumed")
         return True
 
+    def _on_reschedule(self) -> bool:
+        """Handle the reschedule command."""
+        if not self._initialized:
+            return False
+
+        check_interval = _get_check_interval(get_settings())
+        now = datetime.now()
+        next_check = max(self._last_check_time + timedelta(seconds=check_interval), now)
+        if self._paused:
+            self._paused_seconds_remaining = (next_check - now).total_seconds()
+        else:
+            self._next_check_time = next_check
+
+        # Continuous mode: reload the settings and the monitored addresses on the next step
+        self._queue_synced_at = 0.0
+        logger.info(f"Next check rescheduled for {next_check}")
+        return True
+
+    def _on_settings_changed(self) -> bool:
+        """Handle the settings_changed command."""
+        logger.info("Settings changed, rescheduling")
+        return self._on_reschedule()
+
     def get_status(self) -> Dict[str, Any]:
         """
         Get the current status of the scheduler.
@@ -126,7 +445,7 @@ class AddressScheduler:
             Dictionary with scheduler status information
         """
         settings = get_settings()
-        check_interval = settings.get('check_interval', DEFAULT_SETTINGS['check_interval'])
+        check_interval = _get_check_interval(settings)
 
         # Default status if scheduler is not initialized
         if not self._initialized:
@@ -146,9 +465,16 @@ class AddressScheduler:
             'checking': self._checking,
             'last_check': self._last_check_time.strftime('%Y-%m-%d %H:%M:%S') if self._last_check_time else None,
             'next_check': self._next_check_time.strftime('%Y-%m-%d %H:%M:%S') if self._next_check_time else None,
-            'check_interval': check_interval
+            'check_interval': check_interval,
+            'schedule_mode': 'continuous' if self._queue is not None else 'burst',
+            'coverage_lag': self._coverage_lag,
+            'deferred_addresses': self._deferred
         }
 
+        if self._queue is not None:
+            # Checks done in the current round, out of all monitored addresses
+            status['round_progress'] = {'checked': self._round_checked, 'total': len(self._monitored)}
+
         # Calculate time until next check
         if self._paused and self._paused_seconds_remaining is not None:
             # When paused, use the stored remaining time
@@ -167,79 +493,342 @@ class AddressScheduler:
 
         return status
 
-    def _check_addresses_task(self):
-        """Background task to check addresses."""
-        logger.info("Starting address check task")
+    def _is_continuous(self) -> bool:
+        """
+        Check whether the continuous mode is active, switching modes when the settings changed.
+
+        The settings are only read again every QUEUE_SYNC_INTERVAL while in continuous mode,
+        together with the list of monitored addresses.
+        """
+        if self._queue is not None and time.time() - self._queue_synced_at < QUEUE_SYNC_INTERVAL:
+            return True
 
-        # Initialize next check time
         settings = get_settings()
-        check_interval = settings.get('check_interval', DEFAULT_SETTINGS['check_interval'])
-        self._next_check_time = datetime.now() + timedelta(seconds=check_interval)
+        continuous = (settings.get('schedule_mode', DEFAULT_SETTINGS['schedule_mode']) == 'continuous' and
+                      settings.get('scan_mode', DEFAULT_SETTINGS['scan_mode']) == 'addresses')
+        if continuous:
+            self._sync_queue(settings)
+        elif self._queue is not None:
+            logger.info("Leaving continuous scheduling")
+            self._finish_round()
+            self._queue = None
+            self._monitored, self._queued, self._slots = {}, set(), {}
+        return continuous
+
+    def _sync_queue(self, settings: Dict[str, Any]) -> None:
+        """
+        Reload the monitored addresses and queue the new ones.
 
-        while self._running:
-            try:
-                # Skip checks if paused
-                if self._paused:
-                    # When paused, just sleep a bit and continue
-                    time.sleep(5)
-                    continue
-
-                # Wait until it's time for the next check
-                now = datetime.now()
-                if self._next_check_time > now:
-                    # Not time yet, sleep a bit
-                    sleep_time = min((self._next_check_time - now).total_seconds(), 5)
-                    time.sleep(sleep_time)
-                    continue
-
-                # Get current settings (might have changed)
-                settings = get_settings()
-                check_interval = settings.get('check_interval', DEFAULT_SETTINGS['check_interval'])
-
-                # Set checking flag to true
-                self._checking = True
-
-                # Record the check start time
-                self._last_check_time = datetime.now()
-                logger.info(f"Checking addresses at {self._last_check_time}")
-
-                # Perform the check
-                new_transactions = check_all_addresses()
-
-                if new_transactions:
-                    logger.info(f"Found {len(new_transactions)} new transactions")
-                    # Send notifications
-                    if send_multiple_transaction_notifications(new_transactions):
-                        logger.info(f"Successfully sent batch notification for {len(new_transactions)} transactions")
-                    else:
-                        logger.error("Failed to send batch notification")
+        On the first sync every address is spread over the check interval, the least
+        recently checked first so a restart doesn't delay them further; addresses
+        added later are spread over the next sync interval. Removed addresses are
+        dropped when they come out of the queue.
+
+        Args:
+            settings: The current settings
+        """
+        check_interval = _get_check_interval(settings)
+        now = time.time()
+        self._settings = settings
+        self._monitored = {address: (metadata, extended_key, deriv_path)
+                           for address, metadata, extended_key, deriv_path in _iter_monitored_addresses()}
+
+        schedule = address_schedule.AddressSchedule.get_instance()
+        new_addresses = [address for address in self._monitored if address not in self._queued]
+        if self._queue is None:
+            logger.info(f"Starting continuous scheduling of {len(self._monitored)} addresses")
+            self._queue = DueQueue()
+            window = check_interval
+            new_addresses.sort(key=lambda address: schedule.get_last_checked(address) or 0.0)
+            self._start_round(check_interval)
+        else:
+            window = min(check_interval, QUEUE_SYNC_INTERVAL)
+
+        jitter = settings.get('schedule_jitter', DEFAULT_SETTINGS['schedule_jitter'])
+        for address, due in _spread(new_addresses, now, window, jitter):
+            self._slots[address] = due
+            self._queue.push(address, due)
+            self._queued.add(address)
+
+        self._queue_synced_at = now
+
+    def _start_round(self, check_interval: int) -> None:
+        """Start a round of the continuous mode: one check interval, profiled like a cycle."""
+        self._round = ExitStack()
+        self._round.enter_context(profiler.profile_cycle(
+            self._settings.get('profile_history', DEFAULT_SETTINGS['profile_history']),
+            self._settings.get('profile_capture', DEFAULT_SETTINGS['profile_capture'])
+        ))
+        self._round_checked = 0
+        self._round_new_transactions = 0
+        address_schedule.AddressSchedule.get_instance().begin_cycle(
+            self._settings.get('checkpoint_interval', DEFAULT_SETTINGS['checkpoint_interval'])
+        )
+        self._last_check_time = datetime.now()
+        self._next_check_time = self._last_check_time + timedelta(seconds=check_interval)
+
+    def _finish_round(self) -> None:
+        """Finish the current round of the continuous mode and report it."""
+        if self._round is None:
+            return
+
+        self._round.close()
+        self._round = None
+        metrics.set_gauge('check_cycle_addresses', self._round_checked)
+        metrics.set_gauge('last_check_timestamp_seconds', time.time())
+        address_schedule.AddressSchedule.get_instance().end_cycle()
+        self._set_coverage_lag(_get_coverage_lag(self._settings, _get_check_interval(self._settings)))
+        logger.info(f"Round finished: checked {self._round_checked} addresses, "
+                    f"found {self._round_new_transactions} new transactions")
+
+    def _continuous_step(self, triggered: bool = False) -> None:
+        """
+        Check the most overdue address, if any check is due.
+
+        Args:
+            triggered: Whether a check of every address was requested
+        """
+        check_interval = _get_check_interval(self._settings)
+        now = time.time()
+
+        if triggered or datetime.now() >= self._next_check_time:
+            self._finish_round()
+            if triggered:
+                logger.info("Checking all addresses now")
+                self._queue.expedite(now)
+            self._start_round(check_interval)
+
+        address = self._queue.pop_due(now)
+        if address is not None:
+            self._check_queued_address(address, now, check_interval)
+
+        # A triggered check is over once no address is overdue anymore
+        next_due = self._queue.next_due()
+        if next_due is None or next_due > time.time():
+            self._checking = False
+
+    def _check_queued_address(self, address: str, now: float, check_interval: int) -> None:
+        """
+        Check an address taken from the queue and queue its next check.
+
+        Args:
+            address: The address
+            now: The time it was taken from the queue
+            check_interval: The current check interval
+        """
+        if address not in self._monitored:
+            # No longer monitored
+            self._queued.discard(address)
+            self._slots.pop(address, None)
+            return
+
+        metadata, extended_key, deriv_path = self._monitored[address]
+        try:
+            new_transactions = check_address(address, metadata, extended_key, deriv_path)
+        finally:
+            # Keep the slot of the address so its checks stay evenly spread, even after a trigger
+            interval = _get_address_interval(self._settings, address, metadata, check_interval)
+            slot = self._slots.get(address, now) + interval
+            if slot < now:
+                slot += interval * ((now - slot) // interval + 1)
+            self._slots[address] = slot
+            jitter = self._settings.get('schedule_jitter', DEFAULT_SETTINGS['schedule_jitter'])
+            self._queue.push(address, slot + random.uniform(-jitter, jitter) * interval / 2)
+
+        self._round_checked += 1
+        if new_transactions:
+            logger.info(f"Found {len(new_transactions)} new transactions for {address}")
+            self._round_new_transactions += len(new_transactions)
+            metrics.increment('new_transactions_total', amount=len(new_transactions))
+            with profiler.phase('notification'):
+                if not send_multiple_transaction_notifications(new_transactions):
+                    logger.error("Failed to send notifications")
+
+    def _run_cycle(self) -> None:
+        """Check the addresses in one burst and schedule the next cycle."""
+        # Get current settings (might have changed)
+        settings = get_settings()
+        check_interval = _get_check_interval(settings)
+
+        # Set checking flag to true
+        self._checking = True
+
+        # Record the check start time
+        self._last_check_time = datetime.now()
+        logger.info(f"Checking addresses at {self._last_check_time}")
+
+        history_size = settings.get('profile_history', DEFAULT_SETTINGS['profile_history'])
+        capture = settings.get('profile_capture', DEFAULT_SETTINGS['profile_capture'])
+        with profiler.profile_cycle(history_size, capture) as cycle_profile:
+            # Perform the check
+            cycle_start = time.monotonic()
+            if settings.get('scan_mode', DEFAULT_SETTINGS['scan_mode']) == 'blocks':
+                new_transactions = scan_new_blocks()
+            else:
+                schedule = address_schedule.AddressSchedule.get_instance()
+                resumed_from = schedule.begin_cycle(settings.get('checkpoint_interval', DEFAULT_SETTINGS['checkpoint_interval']))
+                if resumed_from is not None:
+                    logger.info(f"Resuming the cycle started at {datetime.fromtimestamp(resumed_from)}")
+                budget = CycleBudget(settings.get('cycle_budget_requests', DEFAULT_SETTINGS['cycle_budget_requests']),
+                                     settings.get('cycle_budget_seconds', DEFAULT_SETTINGS['cycle_budget_seconds']))
+                new_transactions = check_all_addresses(_get_address_filter(settings, resumed_from),
+                                                       schedule.get_check_priority, budget.allows)
+                self._deferred = budget.deferred
+                if budget.deferred:
+                    # The cycle stays open: the next one resumes it with the deferred addresses
+                    logger.warning(f"Cycle budget exhausted, {budget.deferred} addresses deferred to the next cycle")
+                else:
+                    schedule.end_cycle()
+                self._set_coverage_lag(_get_coverage_lag(settings, check_interval))
+            metrics.observe('check_cycle_duration_seconds', time.monotonic() - cycle_start, buckets=metrics.CYCLE_BUCKETS)
+            metrics.increment('new_transactions_total', amount=len(new_transactions))
+            metrics.set_gauge('last_check_timestamp_seconds', time.time())
+
+            if new_transactions:
+                logger.info(f"Found {len(new_transactions)} new transactions")
+                # Send notifications
+                with profiler.phase('notification'):
+                    sent = send_multiple_transaction_notifications(new_transactions)
+                if sent:
+                    logger.info(f"Successfully sent batch notification for {len(new_transactions)} transactions")
                 else:
-                    logger.info("No new transactions found")
+                    logger.error("Failed to send batch notification")
+            else:
+                logger.info("No new transactions found")
 
-                # Calculate next check time based on when the current check completes
-                # This ensures the full interval between the end of one check and the start of the next
-                now = datetime.now()
-                self._next_check_time = now + timedelta(seconds=check_interval)
+        logger.info(f"Cycle profile: {profiler.summarize(cycle_profile)}")
 
-                logger.info(f"Next check scheduled for {self._next_check_time}")
+        api_summary = metrics.summarize_api_requests()
+        if api_summary:
+            logger.info(f"API metrics since start: {'; '.join(api_summary)}")
 
-                # Set checking flag to false
-                self._checking = False
+        # Calculate next check time based on when the current check completes
+        # This ensures the full interval between the end of one check and the start of the next
+        self._next_check_time = datetime.now() + timedelta(seconds=check_interval)
+        logger.info(f"Next check scheduled for {self._next_check_time}")
 
+        # Set checking flag to false
+        self._checking = False
+
+    def _set_coverage_lag(self, lag: int) -> None:
+        """Report the coverage lag measured at the end of a cycle or round."""
+        self._coverage_lag = lag
+        metrics.set_gauge('check_coverage_lag_seconds', lag)
+        if lag:
+            logger.warning(f"Address checks are {lag}s behind the check interval")
+
+    def _run_catch_up(self) -> None:
+        """Check every address after downtime and report the missed transactions in one digest."""
+        settings = get_settings()
+        check_interval = _get_check_interval(settings)
+        since = datetime.fromtimestamp(self._catch_up_since)
+        self._catch_up_since = None
+
+        self._checking = True
+        self._last_check_time = datetime.now()
+        logger.info(f"Catching up on transactions missed since {since}")
+
+        schedule = address_schedule.AddressSchedule.get_instance()
+        history_size = settings.get('profile_history', DEFAULT_SETTINGS['profile_history'])
+        capture = settings.get('profile_capture', DEFAULT_SETTINGS['profile_capture'])
+        with profiler.profile_cycle(history_size, capture) as cycle_profile:
+            cycle_start = time.monotonic()
+            # Checks every address, so it also completes an interrupted cycle
+            schedule.begin_cycle(settings.get('checkpoint_interval', DEFAULT_SETTINGS['checkpoint_interval']))
+            new_transactions = catch_up_addresses(settings.get('catchup_workers', DEFAULT_SETTINGS['catchup_workers']))
+            schedule.end_cycle()
+            metrics.observe('check_cycle_duration_seconds', time.monotonic() - cycle_start, buckets=metrics.CYCLE_BUCKETS)
+            metrics.increment('new_transactions_total', amount=len(new_transactions))
+            metrics.set_gauge('last_check_timestamp_seconds', time.time())
+
+            if new_transactions:
+                logger.info(f"Found {len(new_transactions)} transactions missed while offline")
+                with profiler.phase('notification'):
+                    send_digest_notification(new_transactions, since)
+            else:
+                logger.info("No transactions missed while offline")
+
+        logger.info(f"Catch-up profile: {profiler.summarize(cycle_profile)}")
+        self._set_coverage_lag(_get_coverage_lag(settings, check_interval))
+
+        self._next_check_time = datetime.now() + timedelta(seconds=check_interval)
+        logger.info(f"Next check scheduled for {self._next_check_time}")
+        self._checking = False
+
+    def _run_due_work(self) -> None:
+        """Run the check cycle, or continuous mode check, that is due."""
+        with self._condition:
+            triggered = self._trigger_requested
+            self._trigger_requested = False
+
+        if self._paused:
+            return
+
+        if self._catch_up_since is not None:
+            self._run_catch_up()
+        elif self._is_continuous():
+            self._continuous_step(triggered)
+        elif triggered or datetime.now() >= self._next_check_time:
+            self._run_cycle()
+
+    def _get_wait_seconds(self) -> Optional[float]:
+        """
+        Get how long the check task can sleep before it has work to do.
+
+        Must be called with the condition held, so no command is missed.
+
+        Returns:
+            Seconds until the next due check, None to sleep until a command arrives
+        """
+        if self._trigger_requested:
+            return 0
+        if self._paused:
+            return None
+
+        deadline = self._next_check_time.timestamp()
+        if self._queue is not None:
+            deadline = min(deadline, self._queue_synced_at + QUEUE_SYNC_INTERVAL)
+            next_due = self._queue.next_due()
+            if next_due is not None:
+                deadline = min(deadline, next_due)
+        return max(deadline - time.time(), 0)
+
+    def _check_addresses_task(self):
+        """Background task to check addresses, sleeping until a check is due or a command arrives."""
+        logger.info("Starting address check task")
+
+        while self._running:
+            try:
+                self._run_due_work()
+                wait = None
             except Exception as e:
                 logger.exception(f"Error in address check task: {e}")
                 # Reset checking flag in case of error
                 self._checking = False
-                # Sleep for a bit before retrying
-                time.sleep(60)
-                # Reschedule next check
-                self._next_check_time = datetime.now() + timedelta(seconds=check_interval)
+                # Reschedule next check after a pause
+                check_interval = _get_check_interval(get_settings())
+                self._next_check_time = datetime.now() + timedelta(seconds=ERROR_RETRY_DELAY + check_interval)
+                wait = ERROR_RETRY_DELAY
+
+            with self._condition:
+                if self._running:
+                    wait = self._get_wait_seconds() if wait is None else wait
+                    if wait is None or wait > 0:
+                        self._condition.wait(wait)
 
 # Compatibility functions for existing code
 def start_scheduler() -> bool:
     """Start the address check scheduler."""
     return AddressScheduler.get_instance().start()
 
+def trigger_check() -> bool:
+    """Check the addresses now."""
+    return AddressScheduler.get_instance().trigger()
+
+def notify_settings_changed() -> bool:
+    """Let the scheduler apply changed settings."""
+    return AddressScheduler.get_instance().settings_changed()
+
 def pause_scheduler() -> bool:
     """Pause the address check scheduler."""
     return AddressScheduler.get_instance().pause()
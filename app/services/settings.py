@@ -14,6 +14,27 @@ DATA_DIR = 'data'
 SETTINGS_FILE = f'{DATA_DIR}/settings.json'
 SINGLE_ADDRESSES_FILE = f'{DATA_DIR}/single_addresses.json'
 EXTENDED_KEYS_FILE = f'{DATA_DIR}/extended_public_keys.json'
+BLOCK_SCANNER_FILE = f'{DATA_DIR}/block_scanner.json'
+ELECTRUM_STATUS_FILE = f'{DATA_DIR}/electrum_status.json'
+BITCOIND_SCANNER_FILE = f'{DATA_DIR}/bitcoind_scanner.json'
+ADDRESS_SCHEDULE_FILE = f'{DATA_DIR}/address_schedule.json'
+PENDING_TRANSACTIONS_FILE = f'{DATA_DIR}/pending_transactions.json'
+JOBS_FILE = f'{DATA_DIR}/jobs.json'
+
+# Monitoring modes: poll every address, or follow the chain tip and scan new blocks
+SCAN_MODES = ('addresses', 'blocks')
+
+# Chain backends pushing address activity, in addition to the mempool REST API
+CHAIN_BACKENDS = ('mempool', 'electrum', 'bitcoind')
+
+# Endpoint selection strategies when several mempool endpoints are configured
+ENDPOINT_SELECTIONS = ('round_robin', 'least_latency')
+
+# Scheduling modes: check every due address in one burst per interval, or spread the checks over it
+SCHEDULE_MODES = ('burst', 'continuous')
+
+# Mempool watcher sources: the latest transactions only, or the full txids delta
+MEMPOOL_WATCH_SOURCES = ('recent', 'txids')
 
 DEFAULT_SETTINGS = {
     'check_interval': 300,  # 5 minutes
@@ -24,6 +45,46 @@ DEFAULT_SETTINGS = {
     'gap': 20,
     'initial_addresses': 10,
     'check_interval_min_self_hosted': 30,
+    'scan_mode': 'addresses',
+    'mempool_endpoints': [],
+    'endpoint_selection': 'round_robin',
+    'chain_info_ttl': 60,
+    'chain_info_refresh_interval': 15,
+    'mempool_watch_enabled': False,
+    'mempool_watch_interval': 10,
+    'mempool_watch_source': 'recent',
+    'websocket_enabled': False,
+    'websocket_batch_size': 100,
+    'websocket_sweep_interval': 3600,
+    'chain_backend': 'mempool',
+    'electrum_host': 'localhost',
+    'electrum_port': 50001,
+    'electrum_ssl': False,
+    'electrum_batch_size': 500,
+    'bitcoind_url': 'http://127.0.0.1:8332',
+    'bitcoind_user': '',
+    'bitcoind_password': '',
+    'bitcoind_cookie_file': '',
+    'bitcoind_poll_interval': 30,
+    'profile_history': 20,
+    'profile_capture': False,
+    'adaptive_polling': False,
+    'hot_window': 86400,  # 1 day
+    'warm_window': 2592000,  # 30 days
+    'warm_interval': 1800,  # 30 minutes
+    'cold_interval': 21600,  # 6 hours
+    'schedule_mode': 'burst',
+    'schedule_jitter': 0.1,
+    'checkpoint_interval': 30,  # Seconds between two saves of the check progress
+    'cycle_budget_requests': 0,  # API requests per check cycle, 0 for no limit
+    'cycle_budget_seconds': 0,  # Duration of a check cycle, 0 for no limit
+    'confirmation_tracking_enabled': True,
+    'confirmation_milestones': [1, 3, 6],
+    'confirmation_check_interval': 30,
+    'catchup_enabled': True,
+    'catchup_workers': 4,
+    'discovery_workers': 8,  # Addresses fetched concurrently when discovering a new extended key
+    'job_concurrency': 2,  # Background jobs (imports, gap limit changes, rescans) run at once
 }
 
 def initialize_settings() -> None:
@@ -83,6 +144,111 @@ def validate_settings() -> bool:
         logger.error(f"Check interval must be at least {min_interval} seconds")
         return False
 
+    # Check scan mode
+    if settings.get('scan_mode', DEFAULT_SETTINGS['scan_mode']) not in SCAN_MODES:
+        logger.error(f"Scan mode must be one of {', '.join(SCAN_MODES)}")
+        return False
+
+    # Check scheduling mode
+    if settings.get('schedule_mode', DEFAULT_SETTINGS['schedule_mode']) not in SCHEDULE_MODES:
+        logger.error(f"Schedule mode must be one of {', '.join(SCHEDULE_MODES)}")
+        return False
+
+    if not 0 <= settings.get('schedule_jitter', DEFAULT_SETTINGS['schedule_jitter']) <= 1:
+        logger.error("Schedule jitter must be between 0 and 1")
+        return False
+
+    if settings.get('checkpoint_interval', DEFAULT_SETTINGS['checkpoint_interval']) < 1:
+        logger.error("Checkpoint interval must be at least 1 second")
+        return False
+
+    if settings.get('cycle_budget_requests', DEFAULT_SETTINGS['cycle_budget_requests']) < 0:
+        logger.error("Cycle request budget cannot be negative")
+        return False
+
+    if settings.get('cycle_budget_seconds', DEFAULT_SETTINGS['cycle_budget_seconds']) < 0:
+        logger.error("Cycle time budget cannot be negative")
+        return False
+
+    # Check confirmation milestones
+    milestones = settings.get('confirmation_milestones', DEFAULT_SETTINGS['confirmation_milestones'])
+    if not isinstance(milestones, list) or not milestones or not all(
+            isinstance(milestone, int) and milestone >= 1 for milestone in milestones):
+        logger.error("Confirmation milestones must be a non-empty list of positive block counts")
+        return False
+
+    if settings.get('confirmation_check_interval', DEFAULT_SETTINGS['confirmation_check_interval']) < 1:
+        logger.error("Confirmation check interval must be at least 1 second")
+        return False
+
+    if settings.get('catchup_workers', DEFAULT_SETTINGS['catchup_workers']) < 1:
+        logger.error("Catch-up workers must be at least 1")
+        return False
+
+    if settings.get('discovery_workers', DEFAULT_SETTINGS['discovery_workers']) < 1:
+        logger.error("Discovery workers must be at least 1")
+        return False
+
+    if settings.get('job_concurrency', DEFAULT_SETTINGS['job_concurrency']) < 1:
+        logger.error("Job concurrency must be at least 1")
+        return False
+
+    # Check mempool endpoints
+    endpoints = settings.get('mempool_endpoints', DEFAULT_SETTINGS['mempool_endpoints'])
+    if not isinstance(endpoints, list) or not all(
+            isinstance(endpoint, str) or (isinstance(endpoint, dict) and 'url' in endpoint) for endpoint in endpoints):
+        logger.error("Mempool endpoints must be a list of URLs or {\"url\", \"weight\"} objects")
+        return False
+
+    if settings.get('endpoint_selection', DEFAULT_SETTINGS['endpoint_selection']) not in ENDPOINT_SELECTIONS:
+        logger.error(f"Endpoint selection must be one of {', '.join(ENDPOINT_SELECTIONS)}")
+        return False
+
+    if settings.get('chain_info_refresh_interval', DEFAULT_SETTINGS['chain_info_refresh_interval']) < 1:
+        logger.error("Chain info refresh interval must be at least 1 second")
+        return False
+
+    # Check mempool watcher
+    if settings.get('mempool_watch_source', DEFAULT_SETTINGS['mempool_watch_source']) not in MEMPOOL_WATCH_SOURCES:
+        logger.error(f"Mempool watch source must be one of {', '.join(MEMPOOL_WATCH_SOURCES)}")
+        return False
+
+    if settings.get('mempool_watch_interval', DEFAULT_SETTINGS['mempool_watch_interval']) < 1:
+        logger.error("Mempool watch interval must be at least 1 second")
+        return False
+
+    # Check WebSocket backend
+    if settings.get('websocket_batch_size', DEFAULT_SETTINGS['websocket_batch_size']) < 1:
+        logger.error("WebSocket batch size must be at least 1")
+        return False
+
+    # Check chain backend
+    if settings.get('chain_backend', DEFAULT_SETTINGS['chain_backend']) not in CHAIN_BACKENDS:
+        logger.error(f"Chain backend must be one of {', '.join(CHAIN_BACKENDS)}")
+        return False
+
+    if settings.get('electrum_batch_size', DEFAULT_SETTINGS['electrum_batch_size']) < 1:
+        logger.error("Electrum batch size must be at least 1")
+        return False
+
+    if settings.get('bitcoind_poll_interval', DEFAULT_SETTINGS['bitcoind_poll_interval']) < 1:
+        logger.error("Bitcoin Core poll interval must be at least 1 second")
+        return False
+
+    # Check cycle profiling
+    if settings.get('profile_history', DEFAULT_SETTINGS['profile_history']) < 1:
+        logger.error("Profile history must keep at least 1 cycle")
+        return False
+
+    # Check adaptive polling tiers
+    if settings.get('warm_window', DEFAULT_SETTINGS['warm_window']) < settings.get('hot_window', DEFAULT_SETTINGS['hot_window']):
+        logger.error("Warm window must be at least as long as the hot window")
+        return False
+
+    if settings.get('cold_interval', DEFAULT_SETTINGS['cold_interval']) < settings.get('warm_interval', DEFAULT_SETTINGS['warm_interval']):
+        logger.error("Cold interval must be at least as long as the warm interval")
+        return False
+
     return True
 
 
@@ -101,6 +267,12 @@ def get_file_path(path_key: str) -> str:
         'settings_file': SETTINGS_FILE,
         'single_addresses_file': SINGLE_ADDRESSES_FILE,
         'extended_keys_file': EXTENDED_KEYS_FILE,
+        'block_scanner_file': BLOCK_SCANNER_FILE,
+        'electrum_status_file': ELECTRUM_STATUS_FILE,
+        'bitcoind_scanner_file': BITCOIND_SCANNER_FILE,
+        'address_schedule_file': ADDRESS_SCHEDULE_FILE,
+        'pending_transactions_file': PENDING_TRANSACTIONS_FILE,
+        'jobs_file': JOBS_FILE,
     }
 
     # Return the path if it exists in our mapping
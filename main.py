@@ -43,6 +43,34 @@ def main():
     from app.services.scheduler import start_scheduler
     start_scheduler()
 
+    # Keep fee estimates and the chain tip cached for notifications and status
+    from app.services.chain_info import start_chain_info_cache
+    start_chain_info_cache()
+
+    # Start the mempool watcher - it stays idle until enabled in the settings
+    from app.services.mempool_watcher import start_mempool_watcher
+    start_mempool_watcher()
+
+    # Recheck unconfirmed transactions on each new block and notify their confirmation milestones
+    from app.services.confirmation_tracker import start_confirmation_tracker
+    start_confirmation_tracker()
+
+    # Run extended key imports, gap limit changes and rescans outside the web request threads
+    from app.services.job_queue import start_job_queue
+    start_job_queue()
+
+    # Start the WebSocket backend if enabled - polling then only acts as a consistency sweep
+    from app.services.mempool_websocket import start_mempool_websocket
+    start_mempool_websocket()
+
+    # Start the Electrum backend if selected
+    from app.services.electrum_api import start_electrum_backend
+    start_electrum_backend()
+
+    # Start the Bitcoin Core backend if selected
+    from app.services.bitcoind_api import start_bitcoind_backend
+    start_bitcoind_backend()
+
     # Run the app
     serve(app, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,32 @@
+"""
+Shared test fixtures.
+"""
+
+import pytest
+
+from app.services import extended_key_manager
+from app.services.address_schedule import AddressSchedule
+from app.services.confirmation_tracker import ConfirmationTracker
+
+
+@pytest.fixture(autouse=True)
+def confirmation_tracker(monkeypatch, tmp_path):
+    """Keep the transactions tracked by any test in a temporary file."""
+    monkeypatch.setattr(ConfirmationTracker, "_instance", None)
+    monkeypatch.setattr("app.services.confirmation_tracker.get_file_path",
+                        lambda key: str(tmp_path / 'pending.json') if key == 'pending_transactions_file' else str(tmp_path))
+    return ConfirmationTracker.get_instance()
+
+
+@pytest.fixture(autouse=True)
+def isolated_schedule(monkeypatch, tmp_path):
+    """Start every test from an empty address schedule, whose checks and counters persist across cycles."""
+    monkeypatch.setattr(AddressSchedule, "_instance", None)
+    monkeypatch.setattr("app.services.address_schedule.get_file_path",
+                        lambda key: str(tmp_path / 'schedule.json') if key == 'address_schedule_file' else str(tmp_path))
+
+
+@pytest.fixture(autouse=True)
+def unsettled_gap_paths(monkeypatch):
+    """Make every test evaluate the gap limit of its derivation paths."""
+    monkeypatch.setattr(extended_key_manager, "_settled_paths", set())
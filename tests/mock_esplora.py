@@ -0,0 +1,74 @@
+"""
+Minimal mock of the mempool/esplora HTTP API for tests.
+"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockEsploraServer:
+    """
+    Serve canned responses for esplora API paths on a local port.
+
+    Routes map a path (without the /api prefix) to a JSON-serializable value,
+    or to a string served as plain text. Every requested path is recorded.
+    Set `fail_status` to answer every request with that HTTP status instead,
+    and `delay` to wait that many seconds before answering.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.requests = []
+        self.fail_status = None
+        self.delay = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path[len('/api'):] if self.path.startswith('/api') else self.path
+                server.requests.append(path)
+                time.sleep(server.delay)
+
+                if server.fail_status:
+                    self.send_response(server.fail_status)
+                    self.end_headers()
+                    return
+
+                if path not in server.routes:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                body = server.routes[path]
+                if isinstance(body, str):
+                    payload, content_type = body.encode(), 'text/plain'
+                else:
+                    payload, content_type = json.dumps(body).encode(), 'application/json'
+
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def api_url(self):
+        """Base API URL of the server."""
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/api"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
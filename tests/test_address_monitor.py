@@ -2,6 +2,9 @@
 Tests for the address monitoring functionality.
 """
 
+import threading
+from datetime import datetime
+
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -11,11 +14,21 @@ from app.services.address_monitor import (
     is_valid_bitcoin_address,
     add_single_address,
     add_extended_public_key,
+    check_new_extended_key,
     get_all_addresses,
     get_all_extended_keys,
     delete_address,
-    delete_extended_key
+    delete_extended_key,
+    _check_single_address,
+    _store_last_tx,
+    _expand_new_transactions,
+    _fetch_transactions_since,
+    catch_up_addresses,
+    check_all_addresses
 )
+from app.services.endpoint_pool import EndpointPool
+
+from tools.mock_esplora_server import SyntheticChain, SyntheticEsploraServer
 
 # Sample test data
 SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
@@ -112,6 +125,28 @@ def test_delete_address(setup_test_files):
         delete_address("nonexistent")
 
 
+def test_concurrent_writers_keep_every_address(monkeypatch, tmp_path):
+    """Test that addresses added while another thread stores transactions are all kept in the file."""
+    monkeypatch.setattr("app.services.address_monitor.get_file_path", lambda key: str(tmp_path / key))
+    add_single_address(SAMPLE_ADDRESS, "Test Address")
+    addresses = [f"bc1q{index:038d}" for index in range(8)]
+
+    def store_transactions():
+        for index in range(20):
+            _store_last_tx(SAMPLE_ADDRESS, {'label': 'Test Address'}, {'txid': f"tx{index}"})
+
+    threads = [threading.Thread(target=add_single_address, args=(address,)) for address in addresses]
+    threads.append(threading.Thread(target=store_transactions))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = get_all_addresses()
+    assert sorted(stored) == sorted(addresses + [SAMPLE_ADDRESS])
+    assert stored[SAMPLE_ADDRESS]['last_tx'] == {'txid': 'tx19'}
+
+
 @patch("app.services.extended_key_manager.AddressGenerator")
 def test_add_extended_public_key(mock_generator, setup_test_files):
     """Test adding an extended public key."""
@@ -138,6 +173,22 @@ def test_add_extended_public_key(mock_generator, setup_test_files):
     assert len(keys[SAMPLE_XPUB]["derivation_paths"][deriv_path]["derived_addresses"]) >= 2
 
 
+def test_check_new_extended_key(monkeypatch):
+    """Test that invalid keys and existing derivation paths are rejected before an import is queued."""
+    monkeypatch.setattr("app.services.address_monitor.get_all_extended_keys", lambda: {})
+    assert check_new_extended_key(SAMPLE_XPUB) == "m/44'/0'/0'"
+    assert check_new_extended_key(SAMPLE_XPUB, "m/84'/0'/0'") == "m/84'/0'/0'"
+
+    with pytest.raises(ValueError):
+        check_new_extended_key("xpubinvalid", "m/44'/0'/0'")
+
+    monkeypatch.setattr("app.services.address_monitor.get_all_extended_keys",
+                        lambda: {SAMPLE_XPUB: {'derivation_paths': {"m/44'/0'/0'": {}}}})
+    with pytest.raises(ValueError, match="already exists"):
+        check_new_extended_key(SAMPLE_XPUB)
+    assert check_new_extended_key(SAMPLE_XPUB, "m/49'/0'/0'") == "m/49'/0'/0'"
+
+
 @patch("app.services.extended_key_manager.AddressGenerator")
 def test_delete_extended_key(mock_generator, setup_test_files):
     """Test deleting an extended key."""
@@ -149,8 +200,9 @@ def test_delete_extended_key(mock_generator, setup_test_files):
 
     # Add an extended key
     with patch("app.services.extended_key_manager.is_valid_extended_key", return_value=True), \
-         patch("app.services.extended_key_manager.detect_key_type", return_value=KeyType.XPUB):
-        add_extended_public_key(SAMPLE_XPUB, "Test Key")
+         patch("app.services.extended_key_manager.detect_key_type", return_value=KeyType.XPUB), \
+         patch("app.services.extended_key_manager.discover_addresses"):
+        add_extended_public_key(SAMPLE_XPUB, label="Test Key")
 
     # Delete the key
     delete_extended_key(SAMPLE_XPUB)
@@ -162,3 +214,169 @@ def test_delete_extended_key(mock_generator, setup_test_files):
     # Try to delete a non-existent key
     with pytest.raises(ValueError):
         delete_extended_key("nonexistent")
+
+
+def _address_stats(chain_tx_count=0, funded=0, spent=0, mempool_tx_count=0):
+    """Build an /address/{addr} summary with the given counters."""
+    return {
+        'address': SAMPLE_ADDRESS,
+        'chain_stats': {'tx_count': chain_tx_count, 'funded_txo_sum': funded, 'spent_txo_sum': spent},
+        'mempool_stats': {'tx_count': mempool_tx_count, 'funded_txo_sum': 0, 'spent_txo_sum': 0},
+    }
+
+
+def test_check_single_address_skips_history_when_stats_unchanged(setup_test_files, monkeypatch):
+    """Test that the transaction history is only fetched when the address counters change."""
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+    add_single_address(SAMPLE_ADDRESS, "Test Address")
+    tx = {'txid': 'a' * 64, 'vin': [], 'vout': [{'scriptpubkey_address': SAMPLE_ADDRESS, 'value': 1000}]}
+
+    with patch("app.services.mempool_api.get_address_stats", return_value=_address_stats(1, 1000)), \
+         patch("app.services.mempool_api.get_address_transactions", return_value=[tx]) as mock_txs, \
+         patch("app.services.mempool_api.get_transaction_details", return_value={'status': {'confirmed': False}}), \
+         patch("app.services.extended_key_manager.update_address_used_status"):
+        first = _check_single_address(SAMPLE_ADDRESS, get_all_addresses()[SAMPLE_ADDRESS])
+        second = _check_single_address(SAMPLE_ADDRESS, get_all_addresses()[SAMPLE_ADDRESS])
+
+    assert first['new_transactions']
+    assert not second['new_transactions']
+    assert mock_txs.call_count == 1
+
+
+def test_check_single_address_skips_history_for_unused_address(setup_test_files, monkeypatch):
+    """Test that an address without any activity never downloads its history."""
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+
+    with patch("app.services.mempool_api.get_address_stats", return_value=_address_stats()), \
+         patch("app.services.mempool_api.get_address_transactions") as mock_txs:
+        result = _check_single_address(SAMPLE_ADDRESS, {'label': '', 'last_tx': None})
+
+    assert not result['new_transactions']
+    assert result['message'] == 'No transactions found'
+    assert not mock_txs.called
+
+
+def test_check_single_address_pages_until_cursor(setup_test_files, monkeypatch):
+    """Test that every transaction newer than the last seen one is reported exactly once."""
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+    monkeypatch.setattr("app.services.mempool_api.CHAIN_TXS_PAGE_SIZE", 2)
+    add_single_address(SAMPLE_ADDRESS, "Test Address")
+
+    def make_tx(txid, block_time=None):
+        status = {'confirmed': True, 'block_time': block_time} if block_time else {'confirmed': False}
+        return {'txid': txid, 'status': status, 'vin': [], 'vout': [{'scriptpubkey_address': SAMPLE_ADDRESS, 'value': 1000}]}
+
+    cursor = make_tx('cursor', 1700000000)
+    metadata = get_all_addresses()[SAMPLE_ADDRESS]
+    metadata['last_tx'] = {'txid': 'cursor', 'direction': 'incoming', 'timestamp': '2023-11-14T22:13:20'}
+
+    chain_pages = {
+        None: [make_tx('chain1', 1700000300), make_tx('chain2', 1700000200)],
+        'chain2': [cursor, make_tx('older', 1690000000)],
+    }
+
+    with patch("app.services.mempool_api.get_address_stats", return_value=_address_stats(4, 4000, 0, 1)), \
+         patch("app.services.mempool_api.get_address_mempool_transactions", return_value=[make_tx('pending')]), \
+         patch("app.services.mempool_api.get_address_chain_transactions", side_effect=lambda addr, last=None: chain_pages[last]) as mock_chain, \
+         patch("app.services.extended_key_manager.update_address_used_status"):
+        result = _check_single_address(SAMPLE_ADDRESS, metadata)
+
+    assert mock_chain.call_count == 2
+    assert [tx['txid'] for tx in result['new_txs']] == ['pending', 'chain1', 'chain2']
+    assert get_all_addresses()[SAMPLE_ADDRESS]['last_tx']['txid'] == 'pending'
+
+    # One result per new transaction, oldest first, so each one gets its own notification
+    expanded = _expand_new_transactions(result)
+    assert [r['latest_tx']['txid'] for r in expanded] == ['chain2', 'chain1', 'pending']
+
+
+def test_fetch_transactions_since_vanished_cursor(monkeypatch):
+    """Test where paging stops when the cursor transaction left the history."""
+    def make_tx(txid, block_height, block_time):
+        return {'txid': txid, 'status': {'confirmed': True, 'block_height': block_height, 'block_time': block_time}}
+
+    history = [make_tx('new1', 103, 1700007200), make_tx('new2', 102, 1699997000), make_tx('older', 101, 1699970000)]
+    monkeypatch.setattr("app.services.mempool_api.get_address_mempool_transactions", lambda address: [])
+    monkeypatch.setattr("app.services.mempool_api.get_address_chain_transactions", lambda address, last=None: history)
+
+    # Unconfirmed cursor replaced in the mempool: its first-seen time is local, blocks mined
+    # shortly before it still count, only those older than the tolerance stop the paging
+    first_seen = datetime.fromtimestamp(1700000000).isoformat()
+    new_txs, cursor_tx = _fetch_transactions_since(SAMPLE_ADDRESS, {'txid': 'replaced', 'timestamp': first_seen, 'block_height': None})
+    assert [tx['txid'] for tx in new_txs] == ['new1', 'new2']
+    assert cursor_tx is None
+
+    # Confirmed cursor reorganized out: block heights decide, whatever the block times
+    new_txs, _ = _fetch_transactions_since(SAMPLE_ADDRESS, {'txid': 'reorged', 'timestamp': first_seen, 'block_height': 103})
+    assert [tx['txid'] for tx in new_txs] == ['new1']
+
+
+def test_catch_up_reports_every_missed_transaction(monkeypatch):
+    """Test that catching up after downtime reports all missed transactions, fetching only the changed histories."""
+    chain = SyntheticChain(20, initial_active=0.5, seed=3)
+    addresses = {address: {'label': '', 'last_tx': None} for address in chain.addresses}
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(addresses))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", addresses.update)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+
+    with SyntheticEsploraServer(chain) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        check_all_addresses()
+
+        # Several payments to one address while offline, then a restart
+        missed = [chain.create_transaction(chain.addresses[0]) for _ in range(3)]
+        chain.mine_block()
+        missed.append(chain.create_transaction(chain.addresses[1]))
+        monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+
+        requests_before = server.request_count
+        results = catch_up_addresses(workers=4)
+        requests = server.request_count - requests_before
+
+    assert sorted(result['latest_tx']['txid'] for result in results) == sorted(missed)
+    # One summary per address, history only for the two that changed
+    assert requests <= len(chain.addresses) + 4
+
+
+def test_check_all_addresses_leaves_gap_limits_once_budget_spent(monkeypatch):
+    """Test that gap limits are not extended once the cycle budget is spent."""
+    monitored = [(f"addr{index}", {'label': ''}, 'xpub1', "m/84'/0'/0'") for index in range(3)]
+    monkeypatch.setattr("app.services.address_monitor._iter_monitored_addresses", lambda: iter(monitored))
+    monkeypatch.setattr("app.services.address_monitor._check_single_address", lambda address, metadata: {'address': address})
+    extended = []
+    monkeypatch.setattr("app.services.extended_key_manager.ensure_gap_limit", lambda *path: extended.append(path) or 0)
+
+    budget = iter([True, True, False])
+    check_all_addresses(within_budget=lambda: next(budget, False))
+    assert not extended
+
+    check_all_addresses(within_budget=lambda: True)
+    assert extended == [('xpub1', "m/84'/0'/0'")]
+
+
+def test_address_seen_empty_reports_every_page(setup_test_files, monkeypatch):
+    """Test that an address seen empty before reports its whole history since, not only the first page."""
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {SAMPLE_ADDRESS: (0, 0, 0, 0)})
+    monkeypatch.setattr("app.services.mempool_api.CHAIN_TXS_PAGE_SIZE", 2)
+    add_single_address(SAMPLE_ADDRESS, "Test Address")
+
+    def make_tx(txid, block_time):
+        return {'txid': txid, 'status': {'confirmed': True, 'block_time': block_time},
+                'vin': [], 'vout': [{'scriptpubkey_address': SAMPLE_ADDRESS, 'value': 1000}]}
+
+    chain_pages = {
+        None: [make_tx('tx3', 1700000300), make_tx('tx2', 1700000200)],
+        'tx2': [make_tx('tx1', 1700000100)],
+    }
+
+    with patch("app.services.mempool_api.get_address_stats", return_value=_address_stats(3, 3000)), \
+         patch("app.services.mempool_api.get_address_mempool_transactions", return_value=[]), \
+         patch("app.services.mempool_api.get_address_chain_transactions", side_effect=lambda addr, last=None: chain_pages[last]), \
+         patch("app.services.extended_key_manager.update_address_used_status"):
+        result = _check_single_address(SAMPLE_ADDRESS, get_all_addresses()[SAMPLE_ADDRESS])
+
+    assert [tx['txid'] for tx in result['new_txs']] == ['tx3', 'tx2', 'tx1']
+    assert get_all_addresses()[SAMPLE_ADDRESS]['last_tx']['txid'] == 'tx3'
@@ -0,0 +1,191 @@
+"""
+Tests for the adaptive polling schedule.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import address_monitor, extended_key_manager
+from app.services.address_schedule import AddressSchedule
+from app.services.endpoint_pool import EndpointPool
+
+from tools.mock_esplora_server import SyntheticChain, SyntheticEsploraServer
+
+ADDRESS = "bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh"
+SETTINGS = {'hot_window': 86400, 'warm_window': 2592000, 'warm_interval': 1800, 'cold_interval': 21600}
+
+
+@pytest.fixture
+def schedule(monkeypatch, tmp_path):
+    """Start from an empty schedule stored in a temporary file."""
+    monkeypatch.setattr(AddressSchedule, "_instance", None)
+    monkeypatch.setattr("app.services.address_schedule.get_file_path",
+                        lambda key: str(tmp_path / 'schedule.json') if key == 'address_schedule_file' else str(tmp_path))
+    return AddressSchedule.get_instance()
+
+
+def _metadata(days_ago):
+    """Metadata of an address whose last transaction is days_ago old."""
+    timestamp = (datetime.now() - timedelta(days=days_ago)).isoformat()
+    return {'label': '', 'last_tx': {'txid': 'ab' * 32, 'direction': 'incoming', 'timestamp': timestamp}}
+
+
+def test_tiers(schedule):
+    """Test that addresses are tiered by their last activity and pending transactions."""
+    assert schedule.get_tier(ADDRESS, _metadata(0.5), SETTINGS) == 'hot'
+    assert schedule.get_tier(ADDRESS, _metadata(10), SETTINGS) == 'warm'
+    assert schedule.get_tier(ADDRESS, _metadata(400), SETTINGS) == 'cold'
+    assert schedule.get_tier(ADDRESS, {'label': '', 'last_tx': None}, SETTINGS) == 'warm'
+
+    schedule.record_check(ADDRESS, pending=True, active=False)
+    assert schedule.get_tier(ADDRESS, _metadata(400), SETTINGS) == 'hot'
+
+
+def test_cold_addresses_are_checked_at_their_interval(schedule, monkeypatch):
+    """Test that a dormant address is only due once the cold interval elapsed."""
+    metadata = _metadata(400)
+    assert schedule.is_due(ADDRESS, metadata, SETTINGS)
+
+    schedule.record_check(ADDRESS, pending=False, active=False)
+    assert not schedule.is_due(ADDRESS, metadata, SETTINGS)
+
+    now = time.time()
+    monkeypatch.setattr("app.services.address_schedule.time.time", lambda: now + SETTINGS['cold_interval'])
+    assert schedule.is_due(ADDRESS, metadata, SETTINGS)
+
+
+def test_state_is_saved_and_reloaded(schedule, monkeypatch):
+    """Test that the schedule survives a restart."""
+    schedule.record_check(ADDRESS, pending=False, active=False)
+    schedule.save()
+
+    monkeypatch.setattr(AddressSchedule, "_instance", None)
+    assert not AddressSchedule.get_instance().is_due(ADDRESS, _metadata(400), SETTINGS)
+
+
+def test_recorded_transaction_promotes_address(schedule, monkeypatch):
+    """Test that a transaction seen outside of polling moves a dormant address to the hot tier."""
+    metadata = _metadata(400)
+    schedule.record_check(ADDRESS, pending=False, active=False)
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: {})
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.address_monitor._store_last_tx", lambda address, metadata, tx_info: None)
+    monkeypatch.setattr("app.services.extended_key_manager.update_address_used_status", lambda *args: True)
+
+    address_monitor.record_transaction(ADDRESS, metadata, {'txid': 'cd' * 32, 'vin': [], 'vout': [], 'status': {'confirmed': False}})
+
+    assert schedule.get_tier(ADDRESS, metadata, SETTINGS) == 'hot'
+    assert schedule.is_due(ADDRESS, metadata, SETTINGS)
+
+
+def test_recorded_transactions_are_notified_once(schedule, monkeypatch):
+    """Test that transactions seen again by another watcher are not reported twice and never move the cursor back."""
+    metadata = {'label': '', 'last_tx': None}
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: {})
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.address_monitor._store_last_tx",
+                        lambda address, metadata, tx_info: metadata.update(last_tx=tx_info))
+    monkeypatch.setattr("app.services.extended_key_manager.update_address_used_status", lambda *args: True)
+    older = {'txid': 'ab' * 32, 'vin': [], 'vout': [], 'status': {'confirmed': True, 'block_height': 100, 'block_time': 1700000000}}
+    newer = {'txid': 'cd' * 32, 'vin': [], 'vout': [], 'status': {'confirmed': True, 'block_height': 101, 'block_time': 1700000600}}
+
+    results = [address_monitor.record_transaction(ADDRESS, metadata, tx) for tx in (older, newer, older, newer)]
+    assert [result['latest_tx']['txid'] for result in results if result] == [older['txid'], newer['txid']]
+    assert metadata['last_tx']['txid'] == newer['txid']
+
+    # First seen in a rescanned block after the newer one
+    metadata = {'label': '', 'last_tx': None}
+    monkeypatch.setattr(AddressSchedule, "_instance", None)
+    assert address_monitor.record_transaction(ADDRESS, metadata, newer)
+    assert address_monitor.record_transaction(ADDRESS, metadata, older)
+    assert metadata['last_tx']['txid'] == newer['txid']
+
+    # Notified transactions survive a restart
+    AddressSchedule.get_instance().save()
+    monkeypatch.setattr(AddressSchedule, "_instance", None)
+    assert address_monitor.record_transaction(ADDRESS, metadata, older) is None
+
+
+def test_recorded_transaction_compares_stored_cursor(schedule, monkeypatch):
+    """Test that outdated metadata from a script index neither moves the cursor back nor drops stored fields."""
+    newer_info = {'txid': 'cd' * 32, 'direction': 'incoming', 'timestamp': '2023-11-14T22:23:20', 'block_height': 101}
+    addresses = {ADDRESS: {'label': 'renamed', 'added_date': '2023-11-01 00:00:00', 'last_tx': newer_info}}
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(addresses))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", addresses.update)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager.update_address_used_status", lambda *args: True)
+    stale_metadata = {'label': '', 'last_tx': None}
+    older = {'txid': 'ab' * 32, 'vin': [], 'vout': [], 'status': {'confirmed': True, 'block_height': 100, 'block_time': 1700000000}}
+    latest = {'txid': 'ef' * 32, 'vin': [], 'vout': [], 'status': {'confirmed': False}}
+
+    assert address_monitor.record_transaction(ADDRESS, stale_metadata, older)
+    assert addresses[ADDRESS]['last_tx'] == newer_info
+
+    assert address_monitor.record_transaction(ADDRESS, stale_metadata, latest)
+    assert addresses[ADDRESS]['last_tx']['txid'] == latest['txid']
+    assert (addresses[ADDRESS]['label'], addresses[ADDRESS]['added_date']) == ('renamed', '2023-11-01 00:00:00')
+
+
+def test_check_all_addresses_only_checks_selected(schedule, monkeypatch):
+    """Test that addresses rejected by the filter are not queried."""
+    chain = SyntheticChain(10, initial_active=0, seed=1)
+    addresses = {address: {'label': '', 'last_tx': None} for address in chain.addresses}
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(addresses))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", addresses.update)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+
+    selected = chain.addresses[0]
+    chain.create_transaction(chain.addresses[0])
+    chain.create_transaction(chain.addresses[1])
+    with SyntheticEsploraServer(chain) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        results = address_monitor.check_all_addresses(lambda address, *_: address == selected)
+
+    assert [result['address'] for result in results] == [selected]
+    assert schedule.get_tier(selected, addresses[selected], SETTINGS) == 'hot'  # Pending in the mempool
+
+
+def test_check_all_addresses_checks_oldest_first(schedule, monkeypatch):
+    """Test that addresses are checked by their last check time, never checked ones first."""
+    addresses = {f"addr{index}": {'label': ''} for index in range(3)}
+    checks = []
+    monkeypatch.setattr("app.services.address_monitor._iter_monitored_addresses",
+                        lambda: ((address, metadata, None, None) for address, metadata in addresses.items()))
+    monkeypatch.setattr("app.services.address_monitor._check_single_address",
+                        lambda address, metadata: checks.append(address) or {'new_transactions': []})
+    schedule.record_check('addr0', pending=False, active=False)
+    schedule.record_check('addr2', pending=False, active=False)
+
+    address_monitor.check_all_addresses(order=schedule.get_check_priority)
+
+    assert checks == ['addr1', 'addr0', 'addr2']
+
+
+def test_first_unused_gap_addresses_are_hot(schedule):
+    """Test that the next addresses of a gap window are polled every cycle, the rest of the window less often."""
+    path_data = {'last_used_index': 4, 'change': {'last_used_index': -1}}
+    assert extended_key_manager.get_gap_position(path_data, "m/84'/0'/0'/0/5") == 1
+    assert extended_key_manager.get_gap_position(path_data, "m/84'/0'/0'/0/4") is None
+    assert extended_key_manager.get_gap_position(path_data, "m/84'/0'/0'/1/0") == 1
+
+    for index, tier in ((5, 'hot'), (7, 'hot'), (8, 'warm')):
+        metadata = {'last_tx': None, 'gap_position': extended_key_manager.get_gap_position(path_data, f"m/84'/0'/0'/0/{index}")}
+        assert schedule.get_tier(f"address{index}", metadata, SETTINGS) == tier
+
+
+def test_polled_activity_promotes_address(schedule, monkeypatch):
+    """Test that an address whose counters moved between two polls is checked first in the next cycle."""
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {ADDRESS: (1, 1000, 0, 0)})
+    monkeypatch.setattr("app.services.address_monitor._fetch_address_changes",
+                        lambda address, metadata: ((2, 2000, 0, 0), ([], None)))
+    metadata = _metadata(400)
+
+    address_monitor._check_single_address(ADDRESS, metadata)
+
+    assert schedule.get_check_priority(ADDRESS)[0] == 0
+    assert schedule.get_tier(ADDRESS, metadata, SETTINGS) == 'hot'
@@ -0,0 +1,113 @@
+"""
+Tests for recording and replaying mempool API traffic.
+"""
+
+import pytest
+
+from app.services import mempool_api, metrics
+from app.services.address_monitor import check_all_addresses
+from app.services.address_schedule import AddressSchedule
+from app.services.api_cassette import Cassette
+from app.services.endpoint_pool import EndpointPool
+
+from tests.mock_esplora import MockEsploraServer
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+SAMPLE_TX = {
+    'txid': 'recorded',
+    'status': {'confirmed': True, 'block_time': 1700000000},
+    'vin': [],
+    'vout': [{'scriptpubkey_address': SAMPLE_ADDRESS, 'value': 1000}],
+}
+ROUTES = {
+    f'/address/{SAMPLE_ADDRESS}': {
+        'chain_stats': {'tx_count': 1, 'funded_txo_sum': 1000, 'spent_txo_sum': 0},
+        'mempool_stats': {'tx_count': 0, 'funded_txo_sum': 0, 'spent_txo_sum': 0},
+    },
+    f'/address/{SAMPLE_ADDRESS}/txs': [SAMPLE_TX],
+    '/tx/recorded': SAMPLE_TX,
+}
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Keep a fresh copy of the addresses in memory for every cycle."""
+    data = {}
+
+    def reset():
+        data['single_addresses'] = {SAMPLE_ADDRESS: {'label': 'Test Address', 'last_tx': None}}
+        monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+        monkeypatch.setattr(AddressSchedule, "_instance", None)
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    reset()
+    data['reset'] = reset
+    yield data
+    mempool_api.set_cassette(None)
+
+
+def test_record_and_replay_check_cycle(storage, monkeypatch, tmp_path):
+    """Test that a replayed check cycle gives the same results and requests without the server."""
+    cassette_file = str(tmp_path / 'cycle.json.gz')
+
+    with MockEsploraServer(ROUTES) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        recorder = Cassette(cassette_file, mode='record')
+        mempool_api.set_cassette(recorder)
+        recorded = check_all_addresses()
+        recorder.save()
+
+    storage['reset']()
+    player = Cassette(cassette_file)
+    mempool_api.set_cassette(player)
+    requests_before = metrics.get_thread_request_count()
+    replayed = check_all_addresses()
+
+    assert [r['latest_tx']['txid'] for r in replayed] == [r['latest_tx']['txid'] for r in recorded] == ['recorded']
+    assert player.requests == recorder.requests
+    assert player.request_count == len(server.requests)
+    # Replayed requests spend a cycle budget like the recorded ones
+    assert metrics.get_thread_request_count() - requests_before == player.request_count
+
+
+def test_replay_sequences_and_injected_errors(storage, monkeypatch, tmp_path):
+    """Test that successive responses replay in order and errors are injected deterministically."""
+    cassette_file = str(tmp_path / 'tip.json.gz')
+    routes = {'/blocks/tip/hash': 'first'}
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        recorder = Cassette(cassette_file, mode='record')
+        mempool_api.set_cassette(recorder)
+        mempool_api.get_tip_hash()
+        routes['/blocks/tip/hash'] = 'second'
+        mempool_api.get_tip_hash()
+        recorder.save()
+
+    mempool_api.set_cassette(Cassette(cassette_file))
+    assert [mempool_api.get_tip_hash() for _ in range(3)] == ['first', 'second', 'second']
+
+    with pytest.raises(ValueError):
+        mempool_api.get_block('unknown')
+
+    def failures(seed):
+        mempool_api.set_cassette(Cassette(cassette_file, error_rate=0.5, seed=seed))
+        outcome = []
+        for _ in range(10):
+            try:
+                mempool_api.get_tip_hash()
+                outcome.append(True)
+            except ValueError:
+                outcome.append(False)
+        return outcome
+
+    assert failures(1) == failures(1)
+    assert False in failures(1) and True in failures(1)
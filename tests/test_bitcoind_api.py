@@ -0,0 +1,183 @@
+"""
+Tests for the Bitcoin Core backend against a stubbed JSON-RPC server.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.services.address_schedule import AddressSchedule
+from app.services.bitcoind_api import (
+    BASIC_FILTER_P,
+    BLOCK_TIME_TOLERANCE,
+    BitcoindBackend,
+    _siphash24,
+    hash_to_range,
+    match_block_filter,
+)
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+SAMPLE_SCRIPT = "0014e8df018c7e326cc253faac7e46cdc51e68542c42"
+OTHER_SCRIPT = "76a91462e907b15cbf27d5425399ebf6f0fb50ebb88f1888ac"
+
+# Testnet genesis block and its basic filter (BIP158 test vectors)
+GENESIS_HASH = "000000000933ea01ad0ee984209779baaec3ced90fa3f408719526f8d77f4943"
+GENESIS_SCRIPT = (
+    "4104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f61de"
+    "b649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac"
+)
+
+
+def _encode_filter(block_hash, scripts):
+    """Build a BIP158 basic filter containing the given scripts."""
+    n = len(scripts)
+    values = sorted({hash_to_range(block_hash, bytes.fromhex(script), n) for script in scripts})
+    bits = ''
+    previous = 0
+    for value in values:
+        delta, previous = value - previous, value
+        bits += '1' * (delta >> BASIC_FILTER_P) + '0' + format(delta & ((1 << BASIC_FILTER_P) - 1), f'0{BASIC_FILTER_P}b')
+    bits += '0' * (-len(bits) % 8)
+    return (bytes([n]) + int(bits, 2).to_bytes(len(bits) // 8, 'big')).hex()
+
+
+def _block(height, scripts):
+    block_hash = f"{height:064x}"
+    return {
+        'hash': block_hash,
+        'height': height,
+        'time': 1700000000 + height,
+        'filter': _encode_filter(block_hash, scripts),
+        'tx': [{
+            'txid': f"{height:02x}" * 32,
+            'vin': [{'txid': 'ee' * 32, 'vout': 0, 'prevout': {'value': 0.0005, 'scriptPubKey': {'hex': OTHER_SCRIPT}}}],
+            'vout': [{'value': 0.0004, 'n': 0, 'scriptPubKey': {'hex': script, 'address': SAMPLE_ADDRESS if script == SAMPLE_SCRIPT else None}}
+                     for script in scripts],
+        }],
+    }
+
+
+class StubBitcoind:
+    """Answer JSON-RPC batches from canned blocks and record every call."""
+
+    def __init__(self, blocks):
+        self.blocks = {block['height']: block for block in blocks}
+        self.calls = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                replies = [{'id': call['id'], 'result': stub.answer(call['method'], call['params']), 'error': None}
+                           for call in payload]
+                body = json.dumps(replies).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def answer(self, method, params):
+        self.calls.append((method, params))
+        by_hash = {block['hash']: block for block in self.blocks.values()}
+        if method == 'getblockcount':
+            return max(self.blocks)
+        if method == 'getblockhash':
+            return self.blocks[params[0]]['hash'] if params[0] in self.blocks else f"{params[0]:064x}"
+        if method == 'getblockfilter':
+            return {'filter': by_hash[params[0]]['filter'], 'header': '00' * 32}
+        if method == 'getblock':
+            return by_hash[params[0]]
+        if method == 'getblockheader':
+            # Headers of the blocks before the canned ones are made up
+            height = int(params[0], 16)
+            return {'hash': params[0], 'height': height, 'time': 1700000000 + height}
+        return None
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Keep addresses and scanner state in memory."""
+    data = {'single_addresses': {SAMPLE_ADDRESS: {'label': 'Test Address', 'last_tx': None}}, 'state': None}
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    monkeypatch.setattr(BitcoindBackend, "_load_state", lambda self: data['state'])
+    monkeypatch.setattr(BitcoindBackend, "_save_state", lambda self, state: data.update(state=state))
+    return data
+
+
+def test_siphash_and_filter_vectors():
+    """Test SipHash-2-4 and filter matching against reference vectors."""
+    k0 = int.from_bytes(bytes(range(8)), 'little')
+    k1 = int.from_bytes(bytes(range(8, 16)), 'little')
+    assert _siphash24(k0, k1, b'') == 0x726fdb47dd0e0e31
+    assert _siphash24(k0, k1, bytes(range(15))) == 0xa129ca6149be45e5
+
+    assert match_block_filter('019dfca8', GENESIS_HASH, [bytes.fromhex(GENESIS_SCRIPT)])
+    assert not match_block_filter('019dfca8', GENESIS_HASH, [bytes.fromhex(SAMPLE_SCRIPT)])
+
+
+def test_bitcoind_backend_fetches_only_matching_blocks(storage, monkeypatch):
+    """Test that full blocks are only downloaded on a filter match and the height is persisted."""
+    blocks = [_block(100, [OTHER_SCRIPT]), _block(101, [SAMPLE_SCRIPT, OTHER_SCRIPT]), _block(102, [OTHER_SCRIPT])]
+    server = StubBitcoind(blocks)
+    monkeypatch.setattr("app.services.bitcoind_api.get_settings", lambda: {'bitcoind_url': server.url})
+    storage['state'] = {'height': 100, 'hash': blocks[0]['hash']}
+
+    backend = BitcoindBackend()
+    try:
+        results = backend.scan_new_blocks()
+    finally:
+        server.close()
+
+    assert [r['latest_tx']['txid'] for r in results] == ['65' * 32]
+    assert results[0]['latest_tx']['status']['block_time'] == 1700000101
+    assert results[0]['latest_tx']['vout'][0]['value'] == 40000
+
+    assert [params for method, params in server.calls if method == 'getblock'] == [[blocks[1]['hash'], 3]]
+    assert storage['state'] == {'height': 102, 'hash': blocks[2]['hash']}
+    assert storage['single_addresses'][SAMPLE_ADDRESS]['last_tx']['txid'] == '65' * 32
+
+
+def test_first_scan_starts_from_last_polling_check(storage, monkeypatch):
+    """Test that a first scan catches up from the last polling check instead of starting at the tip."""
+    blocks = [_block(height, [SAMPLE_SCRIPT] if height == 104 else [OTHER_SCRIPT]) for height in range(100, 106)]
+    server = StubBitcoind(blocks)
+    monkeypatch.setattr("app.services.bitcoind_api.get_settings", lambda: {'bitcoind_url': server.url})
+    # Last checked right after block 103 was mined, its timestamp up to two hours ahead
+    monkeypatch.setattr("app.services.address_schedule.time.time", lambda: blocks[3]['time'] + BLOCK_TIME_TOLERANCE)
+    AddressSchedule.get_instance().record_check(SAMPLE_ADDRESS, pending=False, active=False)
+
+    backend = BitcoindBackend()
+    try:
+        results = backend.scan_new_blocks()
+    finally:
+        server.close()
+
+    assert [r['latest_tx']['txid'] for r in results] == ['68' * 32]
+    assert [params[0] for method, params in server.calls if method == 'getblockfilter'] == [blocks[3]['hash'], blocks[4]['hash'], blocks[5]['hash']]
+    assert storage['state'] == {'height': 105, 'hash': blocks[5]['hash']}
@@ -0,0 +1,191 @@
+"""
+Tests for the block scanning service against a mock esplora server.
+"""
+
+import json
+
+import pytest
+
+from app.btc_addr_gen.utils.script import address_to_script
+from app.services import block_scanner, extended_key_manager
+
+from tests.mock_esplora import MockEsploraServer
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+SAMPLE_SCRIPT = "0014e8df018c7e326cc253faac7e46cdc51e68542c42"
+OTHER_SCRIPT = "76a91462e907b15cbf27d5425399ebf6f0fb50ebb88f1888ac"
+SCRIPT_ADDRESSES = {SAMPLE_SCRIPT: SAMPLE_ADDRESS, OTHER_SCRIPT: "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"}
+
+
+def _tx(txid, vout_scripts=(), prevout_scripts=(), block_time=1700000000):
+    """Build an esplora transaction paying to and spending from the given scripts."""
+    return {
+        'txid': txid,
+        'status': {'confirmed': True, 'block_time': block_time},
+        'vin': [
+            {'prevout': {'scriptpubkey': script, 'scriptpubkey_address': SCRIPT_ADDRESSES[script], 'value': 5000}}
+            for script in prevout_scripts
+        ],
+        'vout': [
+            {'scriptpubkey': script, 'scriptpubkey_address': SCRIPT_ADDRESSES[script], 'value': 1000}
+            for script in vout_scripts
+        ],
+    }
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Keep addresses and scanner state in memory."""
+    data = {
+        'single_addresses': {SAMPLE_ADDRESS: {'label': 'Test Address', 'last_tx': None}},
+        'state': {'hash': 'h100', 'height': 100},
+    }
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    def save_state(state):
+        data['state'] = state
+
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.block_scanner._load_state", lambda: data['state'])
+    monkeypatch.setattr("app.services.block_scanner._save_state", save_state)
+    return data
+
+
+def test_address_to_script():
+    """Test output scripts derived from addresses."""
+    assert address_to_script(SAMPLE_ADDRESS).hex() == SAMPLE_SCRIPT
+    assert address_to_script("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa").hex() == OTHER_SCRIPT
+    assert address_to_script("3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy").hex() == "a914b472a266d0bd89c13706a4132ccfb16f7c3b9fcb87"
+
+    with pytest.raises(ValueError):
+        address_to_script("bc1invalid")
+
+
+def test_scan_new_blocks(storage, monkeypatch):
+    """Test that outputs and prevouts of every new block are matched against monitored scripts."""
+    filler = [_tx(f"filler{i}", vout_scripts=[OTHER_SCRIPT]) for i in range(25)]
+    incoming = _tx('incoming', vout_scripts=[SAMPLE_SCRIPT])
+    outgoing = _tx('outgoing', vout_scripts=[OTHER_SCRIPT], prevout_scripts=[SAMPLE_SCRIPT], block_time=1700000600)
+
+    routes = {
+        '/blocks/tip/hash': 'h102',
+        '/block-height/101': 'h101',
+        '/block-height/102': 'h102',
+        '/block/h102': {'id': 'h102', 'height': 102, 'tx_count': 1, 'previousblockhash': 'h101'},
+        '/block/h101': {'id': 'h101', 'height': 101, 'tx_count': 27, 'previousblockhash': 'h100'},
+        '/block/h101/txs/0': filler,
+        '/block/h101/txs/25': [_tx('filler25'), incoming],
+        '/block/h102/txs/0': [outgoing],
+    }
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        results = block_scanner.scan_new_blocks()
+
+        # Nothing happens until the tip moves again
+        assert block_scanner.scan_new_blocks() == []
+
+    assert [r['latest_tx']['txid'] for r in results] == ['incoming', 'outgoing']
+    assert all(r['address'] == SAMPLE_ADDRESS for r in results)
+    assert (storage['state']['hash'], storage['state']['height']) == ('h102', 102)
+    assert storage['single_addresses'][SAMPLE_ADDRESS]['last_tx']['txid'] == 'outgoing'
+    assert storage['single_addresses'][SAMPLE_ADDRESS]['last_tx']['direction'] == 'outgoing'
+
+    # Only block data was requested, never the per-address endpoints
+    assert not any(path.startswith('/address/') for path in server.requests)
+
+
+def _chain_routes(blocks, txs=None):
+    """Build the routes of a chain of (hash, height, previous hash) blocks, the last one being the tip."""
+    txs = txs or {}
+    routes = {'/blocks/tip/hash': blocks[-1][0]}
+    for block_hash, height, previous_hash in blocks:
+        routes[f'/block-height/{height}'] = block_hash
+        routes[f'/block/{block_hash}'] = {'id': block_hash, 'height': height, 'tx_count': len(txs.get(block_hash, [])),
+                                          'previousblockhash': previous_hash}
+        routes[f'/block/{block_hash}/txs/0'] = txs.get(block_hash, [])
+    return routes
+
+
+def test_scan_continues_forward_in_chunks(storage, monkeypatch):
+    """Test that a scanner far behind the tip scans forward from its last block over several scans."""
+    monkeypatch.setattr(block_scanner, "MAX_BLOCKS_PER_SCAN", 2)
+    blocks = [(f'h{height}', height, f'h{height - 1}') for height in range(101, 106)]
+    routes = _chain_routes(blocks, {'h101': [_tx('first', vout_scripts=[SAMPLE_SCRIPT])],
+                                    'h105': [_tx('last', vout_scripts=[SAMPLE_SCRIPT], block_time=1700003000)]})
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        assert [r['latest_tx']['txid'] for r in block_scanner.scan_new_blocks()] == ['first']
+        assert storage['state']['height'] == 102
+        assert block_scanner.scan_new_blocks() == []
+        assert [r['latest_tx']['txid'] for r in block_scanner.scan_new_blocks()] == ['last']
+
+    assert (storage['state']['hash'], storage['state']['height']) == ('h105', 105)
+
+
+def test_reorg_rescans_from_fork_point(storage, monkeypatch):
+    """Test that blocks replacing scanned ones are scanned from the last common block."""
+    storage['state'] = {'hash': 'h101', 'height': 101, 'recent': [[99, 'h99'], [100, 'h100'], [101, 'h101']]}
+    blocks = [('h99', 99, 'h98'), ('h100b', 100, 'h99'), ('h101b', 101, 'h100b'), ('h102b', 102, 'h101b')]
+    routes = _chain_routes(blocks, {'h100b': [_tx('replaced', vout_scripts=[SAMPLE_SCRIPT])]})
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        results = block_scanner.scan_new_blocks()
+
+    assert [r['latest_tx']['txid'] for r in results] == ['replaced']
+    assert storage['state']['recent'] == [[99, 'h99'], [100, 'h100b'], [101, 'h101b'], [102, 'h102b']]
+
+    # A reorganization deeper than the remembered blocks checks every address instead
+    storage['state'] = {'hash': 'h101', 'height': 101, 'recent': [[101, 'h101']]}
+    swept = []
+    monkeypatch.setattr("app.services.block_scanner.check_all_addresses", lambda: swept.append(True) or [])
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        assert block_scanner.scan_new_blocks() == []
+
+    assert swept == [True]
+    assert (storage['state']['hash'], storage['state']['height']) == ('h102b', 102)
+
+
+def test_addresses_derived_during_scan_are_matched(storage, monkeypatch):
+    """Test that addresses derived after a used one are matched in the same block, without API checks."""
+    xpub = "xpub6CUGRUonZSQ4TWtTMmzXdrXDtypWKiKrhko4egpiMZbpiaQL2jkwSB1icqYh2cfDfVxdx4df189oLKnC5fSwqPfgyP3hooxujYzAu3fDVmz"
+    addresses = [address for _, address in extended_key_manager._derive_addresses(xpub, 0, 3)]
+    scripts = [address_to_script(address).hex() for address in addresses]
+    for script, address in zip(scripts, addresses):
+        monkeypatch.setitem(SCRIPT_ADDRESSES, script, address)
+    keys = {xpub: {'label': 'Key', 'derivation_paths': {"m/44'/0'/0'": {
+        'gap_limit': 2, 'current_index': 1, 'last_used_index': -1,
+        'derived_addresses': {f"m/44'/0'/0'/0/{i}": {'address': addresses[i], 'used': False, 'last_tx': None}
+                              for i in range(2)},
+    }}}}
+
+    def save_extended_keys(new_keys):
+        keys.clear()
+        keys.update(json.loads(json.dumps(new_keys)))
+
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: json.loads(json.dumps(keys)))
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: json.loads(json.dumps(keys)))
+    monkeypatch.setattr("app.services.extended_key_manager._save_extended_keys", save_extended_keys)
+    # The first address and the one derived past it are paid in the same block
+    routes = _chain_routes([('h101', 101, 'h100')],
+                           {'h101': [_tx('first', vout_scripts=[scripts[0]]), _tx('second', vout_scripts=[scripts[2]])]})
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        results = block_scanner.scan_new_blocks()
+
+    assert [(r['address'], r['latest_tx']['txid']) for r in results] == [(addresses[0], 'first'), (addresses[2], 'second')]
+    assert not any(path.startswith('/address/') for path in server.requests)
+    derived = keys[xpub]['derivation_paths']["m/44'/0'/0'"]['derived_addresses']
+    assert derived["m/44'/0'/0'/0/2"]['last_tx']['txid'] == 'second'
+    # Two more addresses keep the gap past the second used one
+    assert len(derived) == 5
@@ -0,0 +1,49 @@
+"""
+Tests for the chain information cache.
+"""
+
+import pytest
+
+from app.services.chain_info import ChainInfoCache
+from app.services.endpoint_pool import EndpointPool
+from app.services.notification import _estimate_confirmation_time
+
+from tests.mock_esplora import MockEsploraServer
+
+FEES = {'fastestFee': 20, 'halfHourFee': 10, 'hourFee': 5}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Serve the chain tip and fees, with a fresh cache."""
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr(ChainInfoCache, "_instance", None)
+    routes = {'/blocks/tip/hash': 'aa' * 32, '/blocks/tip/height': '800000', '/v1/fees/recommended': FEES}
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        yield server
+
+
+def test_notification_burst_fetches_fees_once(server):
+    """Test that estimating many confirmation times only fetches the fees once."""
+    estimates = [_estimate_confirmation_time(rate) for rate in [25, 12, 6, 1] * 10]
+
+    assert estimates[:4] == ["~10-20 minutes (next block)", "~30 minutes", "~1 hour", "More than 1 hour"]
+    assert server.requests.count('/v1/fees/recommended') == 1
+
+
+def test_new_block_refreshes_cached_values(server):
+    """Test that the cached values are only fetched again when the tip changed."""
+    cache = ChainInfoCache.get_instance()
+    cache.refresh()
+    cache.refresh()
+    assert cache.get_tip_height() == 800000
+    assert server.requests.count('/blocks/tip/height') == 1
+
+    server.routes['/blocks/tip/hash'] = 'bb' * 32
+    server.routes['/blocks/tip/height'] = '800001'
+    cache.refresh()
+
+    assert cache.get_tip_hash() == 'bb' * 32
+    assert cache.get_tip_height() == 800001
+    assert server.requests.count('/v1/fees/recommended') == 2
@@ -0,0 +1,109 @@
+"""
+Tests for the confirmation tracker.
+"""
+
+import pytest
+
+from app.services import address_monitor
+from app.services.chain_info import ChainInfoCache
+from app.services.confirmation_tracker import ConfirmationTracker
+from app.services.endpoint_pool import EndpointPool
+
+from tests.mock_esplora import MockEsploraServer
+
+TXID = 'ab' * 32
+ADDRESS = "bc1qxy2kgdygjrsqtzq2n0yrf2493p83kkfjhx0wlh"
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Serve the chain tip and the status of one unconfirmed transaction."""
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr(ChainInfoCache, "_instance", None)
+    monkeypatch.setattr("app.services.confirmation_tracker.get_settings", lambda: {})
+    monkeypatch.setattr("app.services.chain_info.get_settings", lambda: {'chain_info_ttl': 0})
+    routes = {'/blocks/tip/height': '800000', f'/tx/{TXID}/status': {'confirmed': False}}
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        yield server
+
+
+def _mine(server, tip_height, block_height=800001):
+    """Move the chain tip, with the tracked transaction confirmed at block_height."""
+    server.routes['/blocks/tip/height'] = str(tip_height)
+    server.routes[f'/tx/{TXID}/status'] = {'confirmed': True, 'block_height': block_height}
+
+
+def test_milestones_are_emitted_once(server, confirmation_tracker):
+    """Test that each milestone emits one event and the transaction is dropped after the last."""
+    assert confirmation_tracker.track(ADDRESS, 'cold storage', TXID, 'incoming')
+    assert not confirmation_tracker.track(ADDRESS, 'cold storage', TXID, 'incoming')
+    assert confirmation_tracker.poll_once() == []
+
+    _mine(server, 800001)
+    events = confirmation_tracker.poll_once()
+    assert [(event['txid'], event['confirmations'], event['milestone']) for event in events] == [(TXID, 1, 1)]
+    assert events[0]['label'] == 'cold storage'
+
+    # Same tip: the status is not fetched again
+    requests = server.requests.count(f'/tx/{TXID}/status')
+    assert confirmation_tracker.poll_once() == []
+    assert server.requests.count(f'/tx/{TXID}/status') == requests
+
+    _mine(server, 800002)
+    assert confirmation_tracker.poll_once() == []
+
+    # Two milestones crossed between polls are reported as one event
+    _mine(server, 800006)
+    assert [event['milestone'] for event in confirmation_tracker.poll_once()] == [6]
+    assert confirmation_tracker.get_pending_transactions() == []
+
+
+def test_tracked_transactions_survive_restart(server, confirmation_tracker):
+    """Test that the tracked transactions are reloaded from file."""
+    confirmation_tracker.track(ADDRESS, '', TXID, 'outgoing')
+
+    ConfirmationTracker._instance = None
+    pending = ConfirmationTracker.get_instance().get_pending_transactions()
+
+    assert [(entry['txid'], entry['direction'], entry['milestones']) for entry in pending] == [(TXID, 'outgoing', [])]
+
+
+def test_reorg_unconfirms_transaction(server, confirmation_tracker):
+    """Test that a transaction reorganized out of the chain is tracked until it confirms again."""
+    confirmation_tracker.track(ADDRESS, '', TXID, 'incoming')
+    _mine(server, 800001)
+    confirmation_tracker.poll_once()
+
+    server.routes['/blocks/tip/height'] = '800002'
+    server.routes[f'/tx/{TXID}/status'] = {'confirmed': False}
+    assert confirmation_tracker.poll_once() == []
+    assert confirmation_tracker.get_pending_transactions()[0]['block_height'] is None
+
+
+def test_failed_status_fetch_is_retried_at_same_tip(server, confirmation_tracker):
+    """Test that a poll whose status requests all failed does not consume the new tip."""
+    confirmation_tracker.track(ADDRESS, '', TXID, 'incoming')
+    server.routes['/blocks/tip/height'] = '800001'
+    del server.routes[f'/tx/{TXID}/status']
+    assert confirmation_tracker.poll_once() == []
+
+    server.routes[f'/tx/{TXID}/status'] = {'confirmed': True, 'block_height': 800001}
+    assert [event['milestone'] for event in confirmation_tracker.poll_once()] == [1]
+
+
+def test_recorded_unconfirmed_transaction_is_tracked(confirmation_tracker, monkeypatch):
+    """Test that a transaction seen in the mempool is handed to the tracker, a confirmed one is not."""
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: {})
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.address_monitor._store_last_tx", lambda address, metadata, tx_info: None)
+    monkeypatch.setattr("app.services.extended_key_manager.update_address_used_status", lambda *args: True)
+    monkeypatch.setattr("app.services.address_schedule.promote", lambda address: None)
+    vout = [{'scriptpubkey_address': ADDRESS, 'value': 1000}]
+
+    address_monitor.record_transaction(ADDRESS, {'label': 'savings'}, {'txid': TXID, 'vin': [], 'vout': vout, 'status': {'confirmed': False}})
+    address_monitor.record_transaction(ADDRESS, {'label': 'savings'}, {'txid': 'cd' * 32, 'vin': [], 'vout': vout,
+                                                                       'status': {'confirmed': True, 'block_time': 1700000000}})
+
+    pending = confirmation_tracker.get_pending_transactions()
+    assert [(entry['txid'], entry['label'], entry['direction']) for entry in pending] == [(TXID, 'savings', 'incoming')]
@@ -0,0 +1,207 @@
+"""
+Tests for the Electrum backend against a local fake Electrum server.
+"""
+
+import json
+import socket
+import hashlib
+import struct
+import threading
+
+import pytest
+
+from app.services.electrum_api import ElectrumBackend, parse_transaction, script_to_scripthash
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+SAMPLE_SCRIPT = "0014e8df018c7e326cc253faac7e46cdc51e68542c42"
+OTHER_ADDRESS = "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"
+OTHER_SCRIPT = "76a91462e907b15cbf27d5425399ebf6f0fb50ebb88f1888ac"
+BLOCK_TIME = 1700000000
+
+
+def _raw_tx(inputs, outputs, segwit=False):
+    """Serialize a transaction spending (txid, vout) inputs to (script, value) outputs."""
+    data = struct.pack('<I', 2) + (b'\x00\x01' if segwit else b'') + bytes([len(inputs)])
+    for txid, vout in inputs:
+        data += bytes.fromhex(txid)[::-1] + struct.pack('<I', vout) + b'\x00' + b'\xff\xff\xff\xff'
+    data += bytes([len(outputs)])
+    for script, value in outputs:
+        script = bytes.fromhex(script)
+        data += struct.pack('<Q', value) + bytes([len(script)]) + script
+    if segwit:
+        data += b'\x01\x02\xab\xcd' * len(inputs)
+    return (data + b'\x00\x00\x00\x00').hex()
+
+
+EXTERNAL_TXID = 'ee' * 32
+FUNDING_TXID = 'aa' * 32
+SPENDING_TXID = 'bb' * 32
+RAW_TXS = {
+    EXTERNAL_TXID: _raw_tx([('11' * 32, 0)], [(OTHER_SCRIPT, 50000)]),
+    FUNDING_TXID: _raw_tx([(EXTERNAL_TXID, 0)], [(SAMPLE_SCRIPT, 40000), (OTHER_SCRIPT, 9000)], segwit=True),
+    SPENDING_TXID: _raw_tx([(FUNDING_TXID, 0)], [(OTHER_SCRIPT, 39000)], segwit=True),
+}
+
+
+class FakeElectrumServer:
+    """Answer Electrum JSON-RPC requests from canned data and push status notifications."""
+
+    def __init__(self):
+        self.statuses = {script_to_scripthash(SAMPLE_SCRIPT): 'status1'}
+        self.histories = {script_to_scripthash(SAMPLE_SCRIPT): [{'tx_hash': FUNDING_TXID, 'height': 800000}]}
+        self.history_requests = []
+        self.failing = set()  # (method, first param) pairs answered with an error
+        self._conn = None
+        self._sock = socket.socket()
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def port(self):
+        return self._sock.getsockname()[1]
+
+    def _answer(self, request):
+        method, params = request['method'], request['params']
+        if (method, params[0] if params else None) in self.failing:
+            return {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': 2, 'message': 'daemon error'}}
+        if method == 'blockchain.scripthash.subscribe':
+            result = self.statuses.get(params[0])
+        elif method == 'blockchain.scripthash.get_history':
+            self.history_requests.append(params[0])
+            result = self.histories.get(params[0], [])
+        elif method == 'blockchain.transaction.get':
+            result = RAW_TXS[params[0]]
+        elif method == 'blockchain.block.header':
+            result = (b'\x00' * 68 + struct.pack('<I', BLOCK_TIME) + b'\x00' * 8).hex()
+        elif method == 'server.version':
+            result = ['FakeElectrum', '1.4']
+        else:
+            result = None
+        return {'jsonrpc': '2.0', 'id': request['id'], 'result': result}
+
+    def _serve(self):
+        self._conn, _ = self._sock.accept()
+        buffer = b''
+        while True:
+            chunk = self._conn.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                request = json.loads(line)
+                if isinstance(request, list):
+                    response = [self._answer(item) for item in request]
+                else:
+                    response = self._answer(request)
+                self._conn.sendall(json.dumps(response).encode() + b'\n')
+
+    def push_status(self, scripthash, status):
+        self.statuses[scripthash] = status
+        notification = {'jsonrpc': '2.0', 'method': 'blockchain.scripthash.subscribe', 'params': [scripthash, status]}
+        self._conn.sendall(json.dumps(notification).encode() + b'\n')
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+        self._sock.close()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Keep addresses and statuses in memory."""
+    data = {
+        'single_addresses': {
+            SAMPLE_ADDRESS: {'label': 'Test Address', 'last_tx': None},
+            OTHER_ADDRESS: {'label': 'Unused Address', 'last_tx': None},
+        },
+        'statuses': {},
+    }
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    monkeypatch.setattr(ElectrumBackend, "_load_statuses", lambda self: data['statuses'])
+    monkeypatch.setattr(ElectrumBackend, "_save_statuses", lambda self: None)
+    return data
+
+
+def test_parse_transaction():
+    """Test decoding inputs and outputs of legacy and segwit transactions."""
+    tx = parse_transaction(RAW_TXS[FUNDING_TXID])
+    assert tx['vin'] == [{'txid': EXTERNAL_TXID, 'vout': 0, 'is_coinbase': False}]
+    assert tx['vout'] == [{'scriptpubkey': SAMPLE_SCRIPT, 'value': 40000}, {'scriptpubkey': OTHER_SCRIPT, 'value': 9000}]
+
+    assert script_to_scripthash(SAMPLE_SCRIPT) == hashlib.sha256(bytes.fromhex(SAMPLE_SCRIPT)).digest()[::-1].hex()
+
+
+def test_electrum_backend_only_queries_changed_scripthashes(storage, monkeypatch):
+    """Test batched subscriptions and history queries driven by status notifications."""
+    server = FakeElectrumServer()
+    monkeypatch.setattr("app.services.electrum_api.get_settings", lambda: {
+        'electrum_host': '127.0.0.1', 'electrum_port': server.port, 'electrum_ssl': False, 'electrum_batch_size': 10,
+    })
+    sample_scripthash = script_to_scripthash(SAMPLE_SCRIPT)
+
+    backend = ElectrumBackend()
+    try:
+        backend.connect()
+        initial = backend.subscribe_all()
+
+        # A new unconfirmed spend is announced by a status change
+        server.histories[sample_scripthash] = [
+            {'tx_hash': FUNDING_TXID, 'height': 800000},
+            {'tx_hash': SPENDING_TXID, 'height': 0},
+        ]
+        server.push_status(sample_scripthash, 'status2')
+        pushed = backend.process_notifications()
+    finally:
+        backend.close()
+        server.close()
+
+    assert [r['latest_tx']['txid'] for r in initial] == [FUNDING_TXID]
+    assert initial[0]['latest_tx']['status'] == {'confirmed': True, 'block_height': 800000, 'block_time': BLOCK_TIME}
+
+    assert [r['latest_tx']['txid'] for r in pushed] == [SPENDING_TXID]
+    last_tx = storage['single_addresses'][SAMPLE_ADDRESS]['last_tx']
+    assert last_tx['txid'] == SPENDING_TXID
+    assert last_tx['direction'] == 'outgoing'
+
+    # The unused address was subscribed but its history never requested
+    assert server.history_requests == [sample_scripthash, sample_scripthash]
+    assert storage['statuses'][sample_scripthash] == 'status2'
+
+
+def test_electrum_backend_skips_failed_batch_items(storage, monkeypatch):
+    """Test that an error for one item of a batch neither drops the connection nor the other items."""
+    server = FakeElectrumServer()
+    monkeypatch.setattr("app.services.electrum_api.get_settings", lambda: {
+        'electrum_host': '127.0.0.1', 'electrum_port': server.port, 'electrum_ssl': False, 'electrum_batch_size': 10,
+    })
+    sample_scripthash = script_to_scripthash(SAMPLE_SCRIPT)
+    other_scripthash = script_to_scripthash(OTHER_SCRIPT)
+    server.failing = {('blockchain.scripthash.subscribe', other_scripthash), ('blockchain.transaction.get', FUNDING_TXID)}
+
+    backend = ElectrumBackend()
+    try:
+        backend.connect()
+        assert backend.subscribe_all() == []
+        assert backend._subscribed == {sample_scripthash}
+        # Fetched again once the server answers
+        assert sample_scripthash not in storage['statuses']
+
+        server.failing = set()
+        server.push_status(sample_scripthash, 'status1')
+        pushed = backend.process_notifications()
+    finally:
+        backend.close()
+        server.close()
+
+    assert [r['latest_tx']['txid'] for r in pushed] == [FUNDING_TXID]
+    assert storage['statuses'][sample_scripthash] == 'status1'
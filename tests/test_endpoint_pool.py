@@ -0,0 +1,92 @@
+"""
+Tests for mempool endpoint failover and load balancing.
+"""
+
+import socket
+
+import pytest
+
+from app.services import mempool_api, metrics
+from app.services.endpoint_pool import EndpointPool, FAILURE_THRESHOLD
+
+from tests.mock_esplora import MockEsploraServer
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+ROUTES = {f'/address/{SAMPLE_ADDRESS}': {'address': SAMPLE_ADDRESS}, '/blocks/tip/height': '800000'}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Start every test with a fresh endpoint pool."""
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    return EndpointPool.get_instance()
+
+
+def _use_endpoints(monkeypatch, endpoints, strategy='round_robin'):
+    monkeypatch.setattr("app.services.mempool_api.get_settings",
+                        lambda: {'mempool_endpoints': endpoints, 'endpoint_selection': strategy})
+
+
+def _stats_requests(server):
+    return server.requests.count(f'/address/{SAMPLE_ADDRESS}')
+
+
+def test_weighted_round_robin(pool, monkeypatch):
+    """Test that requests are spread according to the endpoint weights."""
+    with MockEsploraServer(ROUTES) as first, MockEsploraServer(ROUTES) as second:
+        _use_endpoints(monkeypatch, [{'url': first.api_url, 'weight': 2}, second.api_url])
+        for _ in range(6):
+            mempool_api.get_address_stats(SAMPLE_ADDRESS)
+
+    assert (_stats_requests(first), _stats_requests(second)) == (4, 2)
+
+
+def test_failover_circuit_breaker_and_failback(pool, monkeypatch):
+    """Test that a failing endpoint is skipped once its breaker opens and probed back in later."""
+    with MockEsploraServer(ROUTES) as primary, MockEsploraServer(ROUTES) as backup:
+        _use_endpoints(monkeypatch, [primary.api_url, backup.api_url])
+        primary.fail_status = 503
+
+        # Every request succeeds through the backup
+        for _ in range(2 * FAILURE_THRESHOLD):
+            assert mempool_api.get_address_stats(SAMPLE_ADDRESS) == {'address': SAMPLE_ADDRESS}
+        assert _stats_requests(primary) == FAILURE_THRESHOLD
+        assert _stats_requests(backup) == 2 * FAILURE_THRESHOLD
+
+        # Once the cooldown expired, the recovered endpoint is probed and used again
+        primary.fail_status = None
+        monkeypatch.setattr("app.services.endpoint_pool.BREAKER_COOLDOWN", 0)
+        for _ in range(2):
+            mempool_api.get_address_stats(SAMPLE_ADDRESS)
+
+    assert '/blocks/tip/height' in primary.requests
+    assert _stats_requests(primary) == FAILURE_THRESHOLD + 1
+
+
+def test_client_errors_do_not_fail_over(pool, monkeypatch):
+    """Test that a 404 is reported without trying the other endpoints or opening the breaker."""
+    with MockEsploraServer(ROUTES) as first, MockEsploraServer(ROUTES) as second:
+        _use_endpoints(monkeypatch, [first.api_url, second.api_url], strategy='least_latency')
+        for _ in range(FAILURE_THRESHOLD):
+            with pytest.raises(ValueError):
+                mempool_api.get_transaction_details('missing')
+
+    assert len(first.requests) + len(second.requests) == FAILURE_THRESHOLD
+    assert all(not endpoint.is_open for endpoint in pool._endpoints.values())
+
+
+def test_unanswered_requests_are_counted(pool, monkeypatch):
+    """Test that requests failing to connect are counted for the thread like answered ones."""
+    with socket.socket() as closed:
+        closed.bind(('127.0.0.1', 0))
+        unreachable = f"http://127.0.0.1:{closed.getsockname()[1]}/api"
+
+    with MockEsploraServer(ROUTES) as server:
+        _use_endpoints(monkeypatch, [unreachable, server.api_url])
+        requests_before = metrics.get_thread_request_count()
+        for _ in range(2):
+            mempool_api.get_address_stats(SAMPLE_ADDRESS)
+
+    # One request of the two fails over from the unreachable endpoint
+    assert metrics.get_thread_request_count() - requests_before == 3
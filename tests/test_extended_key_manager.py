@@ -2,8 +2,11 @@
 Tests for the extended key manager functionality with isolated mocks.
 """
 
+import threading
 from unittest.mock import patch, MagicMock
 
+import pytest
+
 from app.services import extended_key_manager
 from app.btc_addr_gen.core.key_types import KeyType
 
@@ -32,7 +35,8 @@ def test_add_extended_key(mock_save, mock_load, mock_generator):
 
     # Add an extended key
     with patch("app.services.extended_key_manager.is_valid_extended_key", return_value=True), \
-        patch("app.services.extended_key_manager.detect_key_type", return_value=KeyType.XPUB):
+        patch("app.services.extended_key_manager.detect_key_type", return_value=KeyType.XPUB), \
+        patch("app.services.extended_key_manager.discover_addresses") as mock_discover:
         extended_key_manager.add_extended_key(
             extended_key=SAMPLE_XPUB,
             label="Test Key",
@@ -62,6 +66,10 @@ def test_add_extended_key(mock_save, mock_load, mock_generator):
     assert derived_addresses["m/44'/0'/0'/0/0"]["address"] == "address1"
     assert not derived_addresses["m/44'/0'/0'/0/0"]["used"]
 
+    # The history of both chains is discovered once the key is stored
+    assert mock_discover.call_args[0][:2] == (SAMPLE_XPUB, "m/44'/0'/0'")
+    assert path_data["change"] == {"current_index": -1, "last_used_index": -1}
+
 
 @patch("app.services.extended_key_manager.AddressGenerator")
 @patch("app.services.extended_key_manager._load_extended_keys")
@@ -97,7 +105,8 @@ def test_ensure_gap_limit_no_used_addresses(mock_save, mock_load, mock_generator
 
     # Since no addresses are used and we have 3 addresses with a gap limit of 5,
     # ensure_gap_limit should generate 2 more addresses
-    with patch("app.services.mempool_api.get_address_transactions", return_value=[]):
+    with patch("app.services.mempool_api.get_address_stats", return_value={}), \
+         patch("app.services.mempool_api.get_address_transactions", return_value=[]):
         extended_key_manager.ensure_gap_limit(SAMPLE_XPUB2, "m/44'/0'/0'")
 
     # Check that save was called with the correct data
@@ -158,7 +167,8 @@ def test_ensure_gap_limit_with_used_addresses(mock_save, mock_load, mock_generat
     # Since addresses 0 and 1 are used, and we have addresses 2, 3, 4, 5 unused,
     # we already have 4 consecutive unused addresses. With a gap limit of 5,
     # ensure_gap_limit should generate 1 more address
-    with patch("app.services.mempool_api.get_address_transactions", return_value=[]):
+    with patch("app.services.mempool_api.get_address_stats", return_value={}), \
+         patch("app.services.mempool_api.get_address_transactions", return_value=[]):
         extended_key_manager.ensure_gap_limit(SAMPLE_XPUB3, "m/44'/0'/0'")
 
     # Check that save was called with the correct data
@@ -215,7 +225,8 @@ def test_ensure_gap_limit_with_transactions_in_last_addresses(mock_save, mock_lo
 
     # Since the last address is used, we have 0 consecutive unused addresses.
     # With a gap limit of 5, ensure_gap_limit should generate 5 more addresses
-    with patch("app.services.mempool_api.get_address_transactions", return_value=[]):
+    with patch("app.services.mempool_api.get_address_stats", return_value={}), \
+         patch("app.services.mempool_api.get_address_transactions", return_value=[]):
         extended_key_manager.ensure_gap_limit(SAMPLE_XPUB4, "m/44'/0'/0'")
 
     # Check that save was called with the correct data
@@ -325,3 +336,167 @@ def test_update_gap_limit(mock_save, mock_load, mock_generator):
 
     # Check that we still have 3 addresses, none other should be generated yet
     assert len(derived_addresses) == 3
+
+
+def _path_data(current_index, used_indexes=(), **extra):
+    """Build the data of a derivation path with addresses 0 to current_index."""
+    return {
+        "start_index": 0,
+        "current_index": current_index,
+        "gap_limit": 3,
+        "derived_addresses": {
+            f"m/44'/0'/0'/0/{i}": {"address": f"address{i}", "used": i in used_indexes, "last_tx": None}
+            for i in range(current_index + 1)
+        },
+        **extra
+    }
+
+
+@patch("app.services.extended_key_manager._load_extended_keys")
+@patch("app.services.extended_key_manager._save_extended_keys")
+def test_update_address_used_status_advances_last_used_index(mock_save, mock_load):
+    """Test that a used-status event moves the last used index counter of its path."""
+    path_data = _path_data(4, last_used_index=1)
+    mock_load.return_value = {SAMPLE_XPUB7: {"label": "Test Key", "derivation_paths": {"m/44'/0'/0'": path_data}}}
+
+    extended_key_manager.update_address_used_status("address3", True, {"txid": "aa", "timestamp": None})
+    assert path_data["last_used_index"] == 3
+
+    # An older address being used does not move the counter back
+    extended_key_manager.update_address_used_status("address0", True, {"txid": "bb", "timestamp": None})
+    assert path_data["last_used_index"] == 3
+
+    # Marking the last used address unused falls back to the previous used one
+    path_data["derived_addresses"]["m/44'/0'/0'/0/0"]["used"] = True
+    extended_key_manager.update_address_used_status("address3", False)
+    assert path_data["last_used_index"] == 0
+
+
+@patch("app.services.extended_key_manager._derive_addresses")
+@patch("app.services.extended_key_manager._load_extended_keys")
+@patch("app.services.extended_key_manager._save_extended_keys")
+def test_ensure_gap_limit_skips_settled_paths(mock_save, mock_load, mock_derive):
+    """Test that a path is only evaluated again after a used-status event touched it."""
+    path_data = _path_data(3, used_indexes=(0,))
+    mock_load.return_value = {SAMPLE_XPUB7: {"label": "Test Key", "derivation_paths": {"m/44'/0'/0'": path_data}}}
+
+    # The counter of a path stored without it is filled by a single scan
+    assert extended_key_manager.ensure_gap_limit(SAMPLE_XPUB7, "m/44'/0'/0'") == 0
+    assert path_data["last_used_index"] == 0
+    assert mock_save.called
+
+    mock_load.reset_mock()
+    assert extended_key_manager.ensure_gap_limit(SAMPLE_XPUB7, "m/44'/0'/0'") == 0
+    assert not mock_load.called
+
+    mock_derive.return_value = [(4, "address4"), (5, "address5")]
+    extended_key_manager.update_address_used_status("address2", True, {"txid": "aa", "timestamp": None})
+    with patch("app.services.address_monitor.check_address", return_value=[]) as mock_check:
+        assert extended_key_manager.ensure_gap_limit(SAMPLE_XPUB7, "m/44'/0'/0'") == 2
+
+    mock_derive.assert_called_once_with(SAMPLE_XPUB7, 4, 2, False)
+    assert path_data["current_index"] == 5
+    assert [call.args[0] for call in mock_check.call_args_list] == ["address4", "address5"]
+
+
+@patch("app.services.extended_key_manager._derive_addresses")
+@patch("app.services.extended_key_manager._load_extended_keys")
+@patch("app.services.extended_key_manager._save_extended_keys")
+def test_ensure_gap_limit_extends_after_used_new_addresses(mock_save, mock_load, mock_derive):
+    """Test that new addresses found used by their follow-up check are followed by more addresses."""
+    path_data = _path_data(2, used_indexes=(2,), last_used_index=2)
+    mock_load.return_value = {SAMPLE_XPUB7: {"label": "Test Key", "derivation_paths": {"m/44'/0'/0'": path_data}}}
+    mock_derive.side_effect = lambda key, start, count, change: [(i, f"address{i}") for i in range(start, start + count)]
+
+    def check_address(address, metadata):
+        # The first new address has a transaction
+        if address == "address3":
+            extended_key_manager.update_address_used_status(address, True, {"txid": "aa", "timestamp": None})
+            return [{"address": address}]
+        return []
+
+    with patch("app.services.address_monitor.check_address", side_effect=check_address):
+        assert extended_key_manager.ensure_gap_limit(SAMPLE_XPUB7, "m/44'/0'/0'") == 4
+
+    assert path_data["last_used_index"] == 3
+    assert path_data["current_index"] == 6
+    assert [call.args[1:] for call in mock_derive.call_args_list] == [(3, 3, False), (6, 1, False)]
+
+
+@patch("app.services.extended_key_manager._derive_addresses")
+@patch("app.services.extended_key_manager._load_extended_keys")
+@patch("app.services.extended_key_manager._save_extended_keys")
+def test_discover_addresses(mock_save, mock_load, mock_derive):
+    """Test discovering the used addresses of both chains in concurrently checked batches."""
+    path_data = _path_data(1, last_used_index=-1, change={"current_index": -1, "last_used_index": -1})
+    mock_load.return_value = {SAMPLE_XPUB7: {"label": "Test Key", "derivation_paths": {"m/44'/0'/0'": path_data}}}
+    mock_derive.side_effect = lambda key, start, count, change: [
+        (i, f"{'change' if change else 'address'}{i}") for i in range(start, start + count)
+    ]
+
+    # Receive addresses 0 to 4 and change address 1 have a history
+    used = {f"address{i}" for i in range(5)} | {"change1"}
+    batches = []
+
+    def check_addresses_concurrently(entries, workers):
+        batches.append([address for address, _ in entries])
+        for address, _ in entries:
+            if address in used:
+                extended_key_manager.update_address_used_status(address, True, {"txid": address, "timestamp": None})
+        return []
+
+    progress = []
+    with patch("app.services.address_monitor.check_addresses_concurrently", side_effect=check_addresses_concurrently):
+        stats = extended_key_manager.discover_addresses(SAMPLE_XPUB7, "m/44'/0'/0'", 4, progress.append)
+
+    assert batches == [
+        ["address0", "address1"],
+        ["address2", "address3", "address4"],
+        ["address5", "address6", "address7"],
+        ["change0", "change1", "change2"],
+        ["change3", "change4"]
+    ]
+    assert stats == {"checked": 13, "derived": 11}
+    assert path_data["last_used_index"] == 4
+    assert path_data["current_index"] == 7
+    assert path_data["change"] == {"current_index": 4, "last_used_index": 1}
+    assert "m/44'/0'/0'/1/4" in path_data["derived_addresses"]
+    assert progress[-1] == {"chain": "change", "checked": 13, "derived": 11, "last_used_index": 1}
+
+
+def test_concurrent_adds_keep_every_key(monkeypatch, tmp_path):
+    """Test that keys added from several threads are all kept in the keys file."""
+    monkeypatch.setattr("app.services.extended_key_manager.get_file_path",
+                        lambda key: str(tmp_path / 'keys.json') if key == 'extended_keys_file' else str(tmp_path))
+    monkeypatch.setattr("app.services.extended_key_manager.is_valid_extended_key", lambda key: True)
+    monkeypatch.setattr("app.services.extended_key_manager.detect_key_type", lambda key: KeyType.XPUB)
+    monkeypatch.setattr("app.services.extended_key_manager._derive_addresses",
+                        lambda key, start, count, change=False: [(i, f"{key}-{i}") for i in range(start, start + count)])
+    monkeypatch.setattr("app.services.extended_key_manager.discover_addresses", lambda *args: None)
+
+    keys = [f"xpub{index}" for index in range(8)]
+    threads = [threading.Thread(target=extended_key_manager.add_extended_key, args=(key,),
+                                kwargs={'derivation_path': "m/44'/0'/0'", 'initial_addresses': 2})
+               for key in keys]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(extended_key_manager._load_extended_keys()) == keys
+
+
+@patch("app.services.extended_key_manager.AddressGenerator")
+@patch("app.services.extended_key_manager._load_extended_keys")
+@patch("app.services.extended_key_manager._save_extended_keys")
+def test_add_extended_key_reports_discovery_errors(mock_save, mock_load, mock_generator):
+    """Test that a failed discovery fails the import instead of only being logged."""
+    mock_load.return_value = {}
+    mock_generator.return_value.generate_addresses.return_value = [(0, "address1")]
+
+    with patch("app.services.extended_key_manager.is_valid_extended_key", return_value=True), \
+         patch("app.services.extended_key_manager.detect_key_type", return_value=KeyType.XPUB), \
+         patch("app.services.extended_key_manager.discover_addresses",
+               side_effect=ValueError("Derivation path not found for this extended key")), \
+         pytest.raises(ValueError):
+        extended_key_manager.add_extended_key(SAMPLE_XPUB, derivation_path="m/44'/0'/0'", initial_addresses=1)
@@ -0,0 +1,170 @@
+"""
+Tests for the background job queue.
+"""
+
+import time
+import threading
+
+import pytest
+
+from app.services import job_queue
+from app.services.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(monkeypatch, tmp_path):
+    """A job queue persisted to a temporary file."""
+    monkeypatch.setattr(JobQueue, "_instance", None)
+    monkeypatch.setattr("app.services.job_queue.get_file_path",
+                        lambda key: str(tmp_path / 'jobs.json') if key == 'jobs_file' else str(tmp_path))
+    return JobQueue.get_instance()
+
+
+def _reload(monkeypatch):
+    """Drop the queue instance, as after a restart."""
+    monkeypatch.setattr(JobQueue, "_instance", None)
+    return JobQueue.get_instance()
+
+
+def test_job_runs_with_progress_and_result(queue, monkeypatch):
+    """Test that a queued job runs and keeps its progress and result."""
+    def rescan(params, progress, resumed):
+        progress({'chain': 'receive', 'checked': 5, 'derived': 0})
+        return {'checked': 5, 'key': params['extended_key']}
+
+    monkeypatch.setitem(job_queue._HANDLERS, 'rescan', rescan)
+    job = queue.submit('rescan', {'extended_key': 'xpub1', 'derivation_path': "m/44'/0'/0'"})
+    assert job['status'] == 'queued'
+
+    assert queue.run_pending() == 1
+    job = queue.get_job(job['id'])
+    assert job['status'] == 'completed'
+    assert job['progress'] == {'chain': 'receive', 'checked': 5, 'derived': 0}
+    assert job['result'] == {'checked': 5, 'key': 'xpub1'}
+
+    with pytest.raises(ValueError):
+        queue.submit('unknown', {})
+
+
+def test_failed_job_keeps_error(queue, monkeypatch):
+    """Test that an error fails the job without stopping the queue."""
+    def gap_limit(params, progress, resumed):
+        raise ValueError("Derivation path not found for this extended key")
+
+    monkeypatch.setitem(job_queue._HANDLERS, 'gap_limit', gap_limit)
+    job = queue.submit('gap_limit', {'extended_key': 'xpub1', 'derivation_path': "m/44'/0'/0'"})
+    queue.run_pending()
+
+    job = queue.get_job(job['id'])
+    assert job['status'] == 'failed'
+    assert job['error'] == "Derivation path not found for this extended key"
+
+
+def test_cancel_queued_and_running_jobs(queue, monkeypatch):
+    """Test that a queued job is cancelled at once and a running one at its next progress report."""
+    batches = []
+
+    def rescan(params, progress, resumed):
+        for batch in range(3):
+            batches.append(batch)
+            if batch == 0:
+                queue.cancel(running['id'])
+            progress({'checked': batch})
+
+    monkeypatch.setitem(job_queue._HANDLERS, 'rescan', rescan)
+    running = queue.submit('rescan', {'extended_key': 'xpub1', 'derivation_path': "m/44'/0'/0'"})
+    queued = queue.submit('rescan', {'extended_key': 'xpub2', 'derivation_path': "m/44'/0'/0'"})
+
+    assert queue.cancel(queued['id'])
+    assert queue.get_job(queued['id'])['status'] == 'cancelled'
+
+    assert queue.run_pending() == 1
+    assert batches == [0]
+    assert queue.get_job(running['id'])['status'] == 'cancelled'
+    assert not queue.cancel(running['id'])
+
+    with pytest.raises(ValueError):
+        queue.cancel('missing')
+
+
+def test_interrupted_jobs_resume_after_restart(queue, monkeypatch):
+    """Test that queued and interrupted jobs are persisted and run again after a restart."""
+    calls = []
+    monkeypatch.setitem(job_queue._HANDLERS, 'add_extended_key',
+                        lambda params, progress, resumed: calls.append((params['extended_key'], resumed)))
+
+    first = queue.submit('add_extended_key', {'extended_key': 'xpub1'})
+    queue.submit('add_extended_key', {'extended_key': 'xpub2'})
+    assert queue._take_job(wait=False)['id'] == first['id']
+
+    # The process stops while the first job runs
+    queue = _reload(monkeypatch)
+    assert [job['status'] for job in queue.get_jobs()] == ['queued', 'queued']
+
+    assert queue.run_pending() == 2
+    assert calls == [('xpub1', True), ('xpub2', False)]
+
+
+def test_workers_cap_concurrency(queue, monkeypatch):
+    """Test that no more jobs run at once than the configured concurrency."""
+    monkeypatch.setattr("app.services.job_queue.get_settings", lambda: {'job_concurrency': 2})
+    lock = threading.Lock()
+    running = [0, 0]  # Current and highest number of running jobs
+    done = threading.Semaphore(0)
+    release = threading.Event()
+
+    def rescan(params, progress, resumed):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+        done.release()
+
+    monkeypatch.setitem(job_queue._HANDLERS, 'rescan', rescan)
+    for index in range(4):
+        queue.submit('rescan', {'extended_key': f'xpub{index}', 'derivation_path': ''})
+
+    queue.start()
+    try:
+        deadline = time.monotonic() + 5
+        while running[0] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        assert running[0] == 2
+        assert sum(1 for job in queue.get_jobs() if job['status'] == 'queued') == 2
+
+        release.set()
+        for _ in range(4):
+            assert done.acquire(timeout=5)
+    finally:
+        release.set()
+        queue.stop()
+        for thread in queue._threads:
+            thread.join(5)
+
+    assert running[1] == 2
+    assert all(job['status'] == 'completed' for job in queue.get_jobs())
+
+
+def test_interrupted_import_resumes_discovery(monkeypatch):
+    """Test that an import interrupted after storing its key resumes the address discovery."""
+    monkeypatch.setattr("app.services.job_queue.get_settings", lambda: {'discovery_workers': 3})
+    monkeypatch.setattr("app.services.address_monitor.get_default_derivation_path", lambda key: "m/84'/0'/0'")
+    monkeypatch.setattr("app.services.address_monitor.get_all_extended_keys",
+                        lambda: {'zpub1': {'derivation_paths': {"m/84'/0'/0'": {}}}})
+    added = []
+    monkeypatch.setattr("app.services.address_monitor.add_extended_public_key", lambda **params: added.append(params))
+    discovered = []
+    monkeypatch.setattr("app.services.extended_key_manager.discover_addresses",
+                        lambda key, path, workers, progress: discovered.append((key, path, workers)) or {'checked': 40, 'derived': 20})
+
+    result = job_queue._run_add_extended_key({'extended_key': 'zpub1', 'derivation_path': ''}, lambda update: None, True)
+    assert discovered == [('zpub1', "m/84'/0'/0'", 3)]
+    assert not added
+    assert result == {'derivation_path': "m/84'/0'/0'", 'checked': 40, 'derived': 20}
+
+    # A first attempt adds the key
+    job_queue._run_add_extended_key({'extended_key': 'zpub1', 'derivation_path': ''}, lambda update: None, False)
+    assert added[0]['derivation_path'] == "m/84'/0'/0'"
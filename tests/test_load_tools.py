@@ -0,0 +1,52 @@
+"""
+Tests for the synthetic esplora server used by the load test.
+"""
+
+import pytest
+
+from app.services.address_monitor import check_all_addresses
+from app.services.endpoint_pool import EndpointPool
+
+from tools.mock_esplora_server import SyntheticChain, SyntheticEsploraServer
+
+
+@pytest.fixture
+def chain():
+    return SyntheticChain(50, initial_active=0.2, seed=1)
+
+
+@pytest.fixture
+def storage(monkeypatch, chain):
+    """Monitor every synthetic address, kept in memory."""
+    data = {'single_addresses': {address: {'label': '', 'last_tx': None} for address in chain.addresses}}
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr("app.services.address_monitor._address_stats_cache", {})
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    return data
+
+
+def test_check_cycles_against_synthetic_chain(chain, storage, monkeypatch):
+    """Test that check cycles see the initial history and then only newly created transactions."""
+    active = {address for address in chain.addresses if chain.confirmed.get(address)}
+
+    with SyntheticEsploraServer(chain) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        initial = check_all_addresses()
+
+        txid = chain.create_transaction(chain.addresses[0])
+        pending = check_all_addresses()
+
+        chain.mine_block()
+        confirmed = check_all_addresses()
+
+    assert {r['address'] for r in initial} == active
+    assert [r['latest_tx']['txid'] for r in pending] == [txid]
+    assert confirmed == []
+    assert storage['single_addresses'][chain.addresses[0]]['last_tx']['txid'] == txid
@@ -0,0 +1,93 @@
+"""
+Tests for the mempool API client.
+"""
+
+import threading
+
+import pytest
+
+from app.services import mempool_api, metrics
+from app.services.endpoint_pool import EndpointPool
+
+from tests.mock_esplora import MockEsploraServer
+
+# Sample test data
+SAMPLE_TXID = "ab" * 32
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Serve a slow transaction from a single endpoint."""
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    with MockEsploraServer({f'/tx/{SAMPLE_TXID}': {'txid': SAMPLE_TXID}}) as server:
+        server.delay = 0.3
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        yield server
+
+
+def _call_concurrently(function, count=5):
+    """Call function from several threads at once, collecting results and errors."""
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(_outcome(function))) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def _outcome(function):
+    try:
+        return function()
+    except ValueError as e:
+        return e
+
+
+def test_identical_requests_are_coalesced(server):
+    """Test that concurrent requests for the same resource share one upstream call."""
+    outcomes = _call_concurrently(lambda: mempool_api.get_transaction_details(SAMPLE_TXID))
+
+    assert outcomes == [{'txid': SAMPLE_TXID}] * 5
+    assert server.requests == [f'/tx/{SAMPLE_TXID}']
+
+    # Once finished, the next request goes upstream again
+    mempool_api.get_transaction_details(SAMPLE_TXID)
+    assert len(server.requests) == 2
+
+
+def test_coalesced_requests_share_errors(server):
+    """Test that every waiter gets the error of the shared call."""
+    outcomes = _call_concurrently(lambda: mempool_api.get_transaction_details('missing'))
+
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert server.requests == ['/tx/missing']
+
+
+def test_endpoint_types():
+    """Test that identifiers are stripped from API paths."""
+    assert mempool_api._endpoint_type(f"/tx/{SAMPLE_TXID}") == "/tx/:txid"
+    assert mempool_api._endpoint_type("/address/bc1qxyz/txs/chain/abc") == "/address/:address/txs/chain/:txid"
+    assert mempool_api._endpoint_type("/block/00ff/txs/25") == "/block/:hash/txs/:index"
+    assert mempool_api._endpoint_type("/blocks/tip/height") == "/blocks/tip/height"
+
+
+def test_request_metrics(monkeypatch):
+    """Test that latency, sizes, statuses, throttles and retries are recorded per endpoint type."""
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    monkeypatch.setattr("app.services.metrics.registry", metrics.MetricsRegistry())
+    tx = {'txid': SAMPLE_TXID}
+
+    with MockEsploraServer({f'/tx/{SAMPLE_TXID}': tx}) as throttled, MockEsploraServer({f'/tx/{SAMPLE_TXID}': tx}) as healthy:
+        throttled.fail_status = 429
+        monkeypatch.setattr("app.services.mempool_api.get_settings", lambda: {
+            'mempool_endpoints': [throttled.api_url, healthy.api_url], 'endpoint_selection': 'round_robin'})
+        for _ in range(2):
+            mempool_api.get_transaction_details(SAMPLE_TXID)
+
+    labels = {'backend': 'mempool', 'endpoint': '/tx/:txid'}
+    assert metrics.registry.get_histogram('api_request_duration_seconds', labels).count == 3
+    assert metrics.registry.get_histogram('api_response_bytes', labels).sum > 0
+    assert metrics.registry.get_counter('api_responses_total', {**labels, 'status': 200}) == 2
+    assert metrics.registry.get_counter('api_throttled_total', labels) == 1
+    assert metrics.registry.get_counter('api_retries_total', labels) == 1
+    assert metrics.summarize_api_requests()[0].startswith('/tx/:txid: 3 requests, 1 errors')
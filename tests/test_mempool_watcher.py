@@ -0,0 +1,77 @@
+"""
+Tests for the mempool watcher against a mock esplora server.
+"""
+
+import pytest
+
+from app.services.mempool_watcher import MempoolWatcher
+
+from tests.mock_esplora import MockEsploraServer
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+SAMPLE_SCRIPT = "0014e8df018c7e326cc253faac7e46cdc51e68542c42"
+OTHER_SCRIPT = "76a91462e907b15cbf27d5425399ebf6f0fb50ebb88f1888ac"
+
+
+def _mempool_tx(txid, script):
+    """Build an unconfirmed esplora transaction paying to a script."""
+    return {
+        'txid': txid,
+        'status': {'confirmed': False},
+        'vin': [{'prevout': {'scriptpubkey': OTHER_SCRIPT, 'value': 5000}}],
+        'vout': [{'scriptpubkey': script, 'scriptpubkey_address': SAMPLE_ADDRESS, 'value': 1000}],
+    }
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Keep addresses in memory."""
+    data = {'single_addresses': {SAMPLE_ADDRESS: {'label': 'Test Address', 'last_tx': None}}}
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    return data
+
+
+def test_poll_recent_mempool(storage, monkeypatch):
+    """Test that recent mempool transactions touching monitored scripts are reported once."""
+    monkeypatch.setattr("app.services.mempool_watcher.get_settings", lambda: {'mempool_watch_source': 'recent'})
+    routes = {
+        '/mempool/recent': [{'txid': 'ours'}, {'txid': 'theirs'}],
+        '/tx/ours': _mempool_tx('ours', SAMPLE_SCRIPT),
+        '/tx/theirs': _mempool_tx('theirs', OTHER_SCRIPT),
+    }
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        watcher = MempoolWatcher()
+        results = watcher.poll_once()
+        # Already seen transactions are not fetched again
+        assert watcher.poll_once() == []
+
+    assert [r['latest_tx']['txid'] for r in results] == ['ours']
+    assert storage['single_addresses'][SAMPLE_ADDRESS]['last_tx']['txid'] == 'ours'
+    assert server.requests.count('/tx/ours') == 1
+
+
+def test_poll_mempool_txids_delta(storage, monkeypatch):
+    """Test that only txids added since the previous snapshot are fetched."""
+    monkeypatch.setattr("app.services.mempool_watcher.get_settings", lambda: {'mempool_watch_source': 'txids'})
+    routes = {'/mempool/txids': ['old'], '/tx/new': _mempool_tx('new', SAMPLE_SCRIPT)}
+
+    with MockEsploraServer(routes) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        watcher = MempoolWatcher()
+        assert watcher.poll_once() == []
+
+        routes['/mempool/txids'] = ['old', 'new']
+        results = watcher.poll_once()
+
+    assert [r['latest_tx']['txid'] for r in results] == ['new']
+    assert '/tx/old' not in server.requests
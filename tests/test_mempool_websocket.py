@@ -0,0 +1,128 @@
+"""
+Tests for the mempool WebSocket backend against a local stand-in server.
+"""
+
+import json
+import time
+import base64
+import socket
+import hashlib
+import threading
+
+import pytest
+
+from app.services.mempool_websocket import (
+    MempoolWebSocketClient,
+    OPCODE_TEXT,
+    WEBSOCKET_GUID,
+    _encode_frame,
+    _read_frame,
+)
+
+# Sample test data
+SAMPLE_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+SAMPLE_SCRIPT = "0014e8df018c7e326cc253faac7e46cdc51e68542c42"
+
+
+class StandInWebSocketServer:
+    """Accept WebSocket connections, record subscriptions and push one message per connection."""
+
+    def __init__(self, push_message):
+        self.push_message = push_message
+        self.subscriptions = []
+        self._sock = socket.socket()
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._sock.getsockname()
+        return f"ws://{host}:{port}/api/v1/ws"
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+
+            request = b''
+            while b'\r\n\r\n' not in request:
+                request += conn.recv(4096)
+            key = [line.split(':', 1)[1].strip() for line in request.decode().split('\r\n')
+                   if line.lower().startswith('sec-websocket-key')][0]
+            accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+            conn.sendall((
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode())
+
+            def read_exact(size):
+                data = b''
+                while len(data) < size:
+                    data += conn.recv(size - len(data))
+                return data
+
+            _, _, payload = _read_frame(read_exact)
+            self.subscriptions.append(json.loads(payload))
+
+            # Push activity, then drop the connection to force a reconnect
+            conn.sendall(_encode_frame(OPCODE_TEXT, json.dumps(self.push_message).encode(), masked=False))
+            time.sleep(0.1)
+            conn.close()
+
+    def close(self):
+        self._sock.close()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Keep addresses in memory."""
+    data = {'single_addresses': {SAMPLE_ADDRESS: {'label': 'Test Address', 'last_tx': None}}}
+
+    def save_single_addresses(addresses):
+        data['single_addresses'] = addresses
+
+    monkeypatch.setattr("app.services.address_monitor._load_single_addresses", lambda: dict(data['single_addresses']))
+    monkeypatch.setattr("app.services.address_monitor._save_single_addresses", save_single_addresses)
+    monkeypatch.setattr("app.services.address_monitor._load_extended_keys", lambda: {})
+    monkeypatch.setattr("app.services.extended_key_manager._load_extended_keys", lambda: {})
+    return data
+
+
+def test_websocket_subscribes_and_reconnects(storage, monkeypatch):
+    """Test that pushed activity becomes check results and subscriptions survive reconnects."""
+    tx = {
+        'txid': 'pushed',
+        'status': {'confirmed': False},
+        'vin': [],
+        'vout': [{'scriptpubkey': SAMPLE_SCRIPT, 'scriptpubkey_address': SAMPLE_ADDRESS, 'value': 1000}],
+    }
+    server = StandInWebSocketServer({
+        'multi-address-transactions': {SAMPLE_ADDRESS: {'mempool': [tx], 'confirmed': [], 'removed': []}}
+    })
+    notified = []
+
+    monkeypatch.setattr("app.services.mempool_websocket.get_settings", lambda: {'websocket_batch_size': 100})
+    monkeypatch.setattr("app.services.mempool_api.get_websocket_url", lambda: server.url)
+    monkeypatch.setattr("app.services.mempool_websocket.send_multiple_transaction_notifications",
+                        lambda results: notified.extend(results) or len(results))
+
+    client = MempoolWebSocketClient()
+    client.start()
+    try:
+        deadline = time.monotonic() + 10
+        while len(server.subscriptions) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        client.stop()
+        server.close()
+
+    # Every (re)connection subscribes all monitored addresses again
+    assert server.subscriptions[:2] == [{'track-addresses': [SAMPLE_ADDRESS]}] * 2
+
+    # The same pushed transaction is only reported once
+    assert [r['latest_tx']['txid'] for r in notified] == ['pushed']
+    assert storage['single_addresses'][SAMPLE_ADDRESS]['last_tx']['txid'] == 'pushed'
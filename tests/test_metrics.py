@@ -0,0 +1,57 @@
+"""
+Tests for the metrics registry and its Prometheus exposition.
+"""
+
+import pytest
+
+from app.services import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Use an empty registry."""
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr("app.services.metrics.registry", registry)
+    return registry
+
+
+def test_render_prometheus(registry):
+    """Test that counters, gauges and histograms are rendered in the text format."""
+    metrics.increment('notifications_total', {'result': 'success'}, 3)
+    metrics.set_gauge('check_cycle_addresses', 120)
+    metrics.observe('api_request_duration_seconds', 0.02, {'backend': 'mempool', 'endpoint': '/tx/:txid'})
+    metrics.observe('api_request_duration_seconds', 0.3, {'backend': 'mempool', 'endpoint': '/tx/:txid'})
+
+    lines = metrics.render_prometheus().splitlines()
+
+    assert '# TYPE satsentry_notifications_total counter' in lines
+    assert 'satsentry_notifications_total{result="success"} 3' in lines
+    assert 'satsentry_check_cycle_addresses 120' in lines
+    assert '# TYPE satsentry_api_request_duration_seconds histogram' in lines
+    labels = 'backend="mempool",endpoint="/tx/:txid"'
+    assert f'satsentry_api_request_duration_seconds_bucket{{{labels},le="0.025"}} 1' in lines
+    assert f'satsentry_api_request_duration_seconds_bucket{{{labels},le="0.5"}} 2' in lines
+    assert f'satsentry_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f'satsentry_api_request_duration_seconds_count{{{labels}}} 2' in lines
+    assert any(line.startswith('satsentry_process_resident_memory_bytes ') for line in lines)
+    assert '# TYPE satsentry_process_cpu_seconds_total counter' in lines
+    assert any(line.startswith('satsentry_process_cpu_seconds_total ') for line in lines)
+
+
+def test_label_values_are_escaped(registry):
+    """Test that quotes, backslashes and newlines in label values are escaped."""
+    metrics.increment('api_errors_total', {'error': 'bad "quote"\\\n'})
+
+    assert 'satsentry_api_errors_total{error="bad \\"quote\\"\\\\\\n"} 1' in metrics.render_prometheus()
+
+
+def test_record_flush(registry, tmp_path):
+    """Test that the duration and size of a data file write are recorded per file."""
+    path = tmp_path / 'single_addresses.json'
+    path.write_text('{}')
+
+    metrics.record_flush(str(path), 0)
+
+    labels = {'file': 'single_addresses.json'}
+    assert registry.get_histogram('storage_flush_duration_seconds', labels).count == 1
+    assert registry.snapshot()['gauges']['storage_file_bytes'] == [{'labels': labels, 'value': 2}]
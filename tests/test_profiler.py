@@ -0,0 +1,83 @@
+"""
+Tests for the check cycle profiler.
+"""
+
+import os
+import time
+import pstats
+
+import pytest
+
+from app.services import mempool_api, profiler
+from app.services.endpoint_pool import EndpointPool
+
+from tests.mock_esplora import MockEsploraServer
+
+SAMPLE_TXID = "ab" * 32
+
+
+@pytest.fixture(autouse=True)
+def history(monkeypatch):
+    """Start from an empty ring buffer."""
+    monkeypatch.setattr("app.services.profiler._history", profiler.deque(maxlen=20))
+
+
+def test_nested_phases_are_exclusive():
+    """Test that time in a nested phase is only counted in the innermost phase."""
+    with profiler.profile_cycle() as profile:
+        with profiler.phase('derivation'):
+            time.sleep(0.02)
+            with profiler.phase('http_fetch'):
+                time.sleep(0.05)
+
+    phases = profile.to_dict()['phases']
+    assert list(phases) == ['http_fetch', 'derivation']
+    assert 0.05 <= phases['http_fetch']['seconds'] < 0.07
+    assert 0.02 <= phases['derivation']['seconds'] < 0.04
+    assert profile.duration >= 0.07
+
+
+def test_phases_outside_of_a_cycle_are_ignored():
+    """Test that phase() is a no-op without a profiled cycle."""
+    with profiler.phase('disk_save'):
+        pass
+
+    assert profiler.get_cycle_profiles() == []
+
+
+def test_ring_buffer_keeps_last_cycles():
+    """Test that only the last cycles are kept, most recent first."""
+    for calls in range(1, 5):
+        with profiler.profile_cycle(history_size=3):
+            for _ in range(calls):
+                with profiler.phase('direction'):
+                    pass
+
+    profiles = profiler.get_cycle_profiles()
+    assert [p['phases']['direction']['calls'] for p in profiles] == [4, 3, 2]
+
+
+def test_http_fetches_are_timed(monkeypatch):
+    """Test that API requests made during a cycle are credited to http_fetch."""
+    monkeypatch.setattr(EndpointPool, "_instance", None)
+    with MockEsploraServer({f'/tx/{SAMPLE_TXID}': {'txid': SAMPLE_TXID}}) as server:
+        monkeypatch.setattr("app.services.mempool_api.get_api_url", lambda: server.api_url)
+        with profiler.profile_cycle() as profile:
+            mempool_api.get_transaction_details(SAMPLE_TXID)
+            mempool_api.get_transaction_details(SAMPLE_TXID)
+
+    assert profile.phases['http_fetch']['calls'] == 2
+
+
+def test_capture_dumps_pstats(tmp_path, monkeypatch):
+    """Test that captured cycles are dumped as pstats files, pruned to the history size."""
+    monkeypatch.setattr("app.services.profiler.get_file_path", lambda key: str(tmp_path))
+
+    for _ in range(3):
+        with profiler.profile_cycle(history_size=2, capture=True):
+            sum(range(1000))
+
+    stats_files = sorted(os.listdir(tmp_path / profiler.PROFILES_DIR))
+    assert len(stats_files) == 2
+    assert profiler.get_cycle_profiles()[0]['stats_file'].endswith(stats_files[-1])
+    pstats.Stats(str(tmp_path / profiler.PROFILES_DIR / stats_files[-1]))
@@ -0,0 +1,265 @@
+"""
+Tests for the scheduler commands and the continuous scheduling mode.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+from app.services import metrics
+from app.services.address_schedule import AddressSchedule
+from app.services.scheduler import AddressScheduler, DueQueue, _get_address_filter, _spread
+
+ADDRESSES = [f"addr{i}" for i in range(4)]
+
+
+def test_spread_is_even():
+    """Test that checks get one slot each over the window."""
+    dues = [due for _, due in _spread(ADDRESSES, 1000.0, 100.0, jitter=0)]
+    assert dues == [1000.0, 1025.0, 1050.0, 1075.0]
+
+    for i, (_, due) in enumerate(_spread(ADDRESSES, 1000.0, 100.0, jitter=1)):
+        assert 1000.0 + i * 25 <= due < 1000.0 + (i + 1) * 25
+
+
+def test_due_queue():
+    """Test that addresses come out by due time, and shift and expedite keep the order."""
+    queue = DueQueue()
+    for address, due in zip(ADDRESSES, (30, 10, 20, 40)):
+        queue.push(address, due)
+
+    assert queue.pop_due(5) is None
+    assert queue.pop_due(25) == 'addr1'
+
+    queue.shift(100)
+    assert queue.next_due() == 120
+    assert queue.count_due(125) == 1
+
+    queue.expedite(50)
+    assert [queue.pop_due(50) for _ in range(3)] == ['addr2', 'addr0', 'addr3']
+
+
+@pytest.fixture(autouse=True)
+def schedule(monkeypatch, tmp_path):
+    """Keep the address schedule and its cycle checkpoints in a temporary file."""
+    monkeypatch.setattr(AddressSchedule, "_instance", None)
+    monkeypatch.setattr("app.services.address_schedule.get_file_path",
+                        lambda key: str(tmp_path / 'schedule.json') if key == 'address_schedule_file' else str(tmp_path))
+    return AddressSchedule.get_instance()
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """Scheduler in continuous mode over four addresses, with checks recorded instead of sent."""
+    checks = []
+    monkeypatch.setattr(AddressScheduler, "_instance", None)
+    monkeypatch.setattr("app.services.scheduler.get_settings", lambda: {
+        'check_interval': 100, 'schedule_mode': 'continuous', 'schedule_jitter': 0})
+    monkeypatch.setattr("app.services.scheduler._iter_monitored_addresses",
+                        lambda: ((address, {'label': ''}, None, None) for address in ADDRESSES))
+    monkeypatch.setattr("app.services.scheduler.check_address", lambda address, *args: checks.append(address) or [])
+
+    scheduler = AddressScheduler.get_instance()
+    scheduler._initialized = True
+    scheduler.checks = checks
+    return scheduler
+
+
+def test_continuous_mode_spreads_checks(scheduler, monkeypatch):
+    """Test that only due addresses are checked, then rescheduled one interval later."""
+    start = time.time()
+    assert scheduler._is_continuous()
+    assert len(scheduler._queue) == 4
+
+    monkeypatch.setattr("app.services.scheduler.time.time", lambda: start + 30)
+    for _ in range(4):
+        scheduler._continuous_step()
+
+    # Slots at 0, 25, 50 and 75 seconds: two are due 30 seconds in
+    assert scheduler.checks == ['addr0', 'addr1']
+    assert scheduler._slots['addr0'] == pytest.approx(start + 100, abs=1)
+    assert scheduler.get_status()['round_progress'] == {'checked': 2, 'total': 4}
+
+
+def test_trigger_checks_every_address(scheduler):
+    """Test that a triggered check expedites the queue but keeps the slots of the addresses."""
+    scheduler._is_continuous()
+    slots = dict(scheduler._slots)
+
+    scheduler._checking = True
+    scheduler._continuous_step(triggered=True)
+    for _ in range(4):
+        scheduler._continuous_step()
+
+    assert sorted(scheduler.checks) == ADDRESSES
+    assert not scheduler._checking
+    assert all(scheduler._slots[address] == pytest.approx(slots[address] + 100) for address in ADDRESSES)
+
+
+def test_continuous_mode_starts_with_least_recently_checked(scheduler, schedule, monkeypatch):
+    """Test that after a restart the addresses checked longest ago get the first slots."""
+    for seconds_ago, address in enumerate(ADDRESSES[1:]):
+        with monkeypatch.context() as patch:
+            patch.setattr("app.services.address_schedule.time.time", lambda: 1000.0 - seconds_ago)
+            schedule.record_check(address, pending=False, active=False)
+
+    scheduler._is_continuous()
+
+    assert sorted(scheduler._slots, key=scheduler._slots.get) == ['addr0', 'addr3', 'addr2', 'addr1']
+
+
+def test_resumed_cycle_skips_checked_addresses(schedule):
+    """Test that a resumed cycle only checks the addresses the interrupted one did not reach."""
+    schedule.begin_cycle(checkpoint_interval=0)
+    schedule.record_check('addr0', pending=False, active=False)
+    schedule.record_check('addr1', pending=False, active=False)
+
+    # Restart: the checkpoint written by the last check holds the cycle cursor
+    AddressSchedule._instance = None
+    schedule = AddressSchedule.get_instance()
+    assert schedule.has_interrupted_cycle()
+    resumed_from = schedule.begin_cycle(checkpoint_interval=30)
+    assert resumed_from is not None
+
+    select = _get_address_filter({'adaptive_polling': False}, resumed_from)
+    assert [address for address in ADDRESSES if select(address, {'label': ''}, None, None)] == ['addr2', 'addr3']
+
+    schedule.end_cycle()
+    assert not schedule.has_interrupted_cycle()
+    assert _get_address_filter({'adaptive_polling': False}, schedule.begin_cycle(checkpoint_interval=30)) is None
+
+
+def test_cycle_budget_carries_rest_to_next_cycle(schedule, monkeypatch):
+    """Test that a cycle out of budget defers its remaining addresses to the next one."""
+    checks = []
+
+    def check_single_address(address, metadata):
+        checks.append(address)
+        metrics.count_request()
+        # Requests of the watchers running meanwhile are not charged to the cycle
+        watcher = threading.Thread(target=metrics.count_request)
+        watcher.start()
+        watcher.join()
+        schedule.record_check(address, pending=False, active=False)
+        return {'new_transactions': []}
+
+    monitored = lambda: ((address, {'label': ''}, None, None) for address in ADDRESSES)
+    monkeypatch.setattr("app.services.address_monitor._iter_monitored_addresses", monitored)
+    monkeypatch.setattr("app.services.scheduler._iter_monitored_addresses", monitored)
+    monkeypatch.setattr("app.services.address_monitor._check_single_address", check_single_address)
+    monkeypatch.setattr("app.services.scheduler.get_settings", lambda: {'check_interval': 100, 'cycle_budget_requests': 3})
+    monkeypatch.setattr(AddressScheduler, "_instance", None)
+    scheduler = AddressScheduler.get_instance()
+    scheduler._initialized = True
+
+    scheduler._run_cycle()
+    assert checks == ADDRESSES[:3]
+    assert scheduler.get_status()['deferred_addresses'] == 1
+    assert schedule.has_interrupted_cycle()
+
+    scheduler._run_cycle()
+    assert checks == ADDRESSES
+    assert scheduler.get_status()['deferred_addresses'] == 0
+    assert scheduler.get_status()['coverage_lag'] == 0
+    assert not schedule.has_interrupted_cycle()
+
+
+def test_startup_after_downtime_catches_up(schedule, monkeypatch):
+    """Test that a restart after more than a cycle of downtime catches up at once and sends one digest."""
+    now = time.time()
+    with monkeypatch.context() as patch:
+        patch.setattr("app.services.address_schedule.time.time", lambda: now - 3600)
+        schedule.record_check('addr0', pending=False, active=False)
+
+    missed = [{'address': 'addr0', 'latest_tx': {'txid': txid}} for txid in ('tx1', 'tx2')]
+    digests = []
+    caught_up = threading.Event()
+    monkeypatch.setattr("app.services.scheduler.get_settings", lambda: {'check_interval': 300})
+    monkeypatch.setattr("app.services.scheduler._iter_monitored_addresses", lambda: iter(()))
+    monkeypatch.setattr("app.services.scheduler.catch_up_addresses", lambda workers: list(missed))
+    monkeypatch.setattr("app.services.scheduler.send_digest_notification",
+                        lambda results, since: digests.append((results, since)) or caught_up.set())
+    monkeypatch.setattr(AddressScheduler, "_instance", None)
+
+    scheduler = AddressScheduler.get_instance()
+    scheduler.start()
+    try:
+        assert caught_up.wait(2)
+    finally:
+        scheduler.stop()
+        scheduler._thread.join(timeout=5)
+
+    assert digests[0][0] == missed
+    assert digests[0][1].timestamp() == pytest.approx(now - 3600, abs=1)
+    assert scheduler.get_status()['seconds_to_next_check'] > 250
+
+
+@pytest.fixture
+def running_scheduler(monkeypatch):
+    """Scheduler running in burst mode with a long interval, signalling each check cycle."""
+    settings = {'check_interval': 300}
+    cycles = []
+    checked = threading.Event()
+
+    def check_all_addresses(select=None, order=None, within_budget=None):
+        cycles.append(time.monotonic())
+        checked.set()
+        return []
+
+    monkeypatch.setattr(AddressScheduler, "_instance", None)
+    monkeypatch.setattr("app.services.scheduler.get_settings", lambda: settings)
+    monkeypatch.setattr("app.services.scheduler.check_all_addresses", check_all_addresses)
+    monkeypatch.setattr("app.services.scheduler._iter_monitored_addresses", lambda: iter(()))
+
+    scheduler = AddressScheduler.get_instance()
+    scheduler.start()
+    scheduler.settings, scheduler.cycles, scheduler.checked = settings, cycles, checked
+    yield scheduler
+    scheduler.stop()
+    scheduler._thread.join(timeout=5)
+
+
+def test_trigger_starts_check_immediately(running_scheduler):
+    """Test that a trigger wakes the idle scheduler thread right away."""
+    start = time.monotonic()
+    assert running_scheduler.trigger()
+
+    assert running_scheduler.checked.wait(2)
+    assert running_scheduler.cycles[0] - start < 0.5
+    assert len(running_scheduler.cycles) == 1
+
+
+def test_pause_and_resume(running_scheduler):
+    """Test that a paused scheduler rejects triggers until resumed."""
+    assert running_scheduler.pause()
+    assert not running_scheduler.pause()
+    assert not running_scheduler.trigger()
+    assert running_scheduler.get_status()['paused']
+
+    assert running_scheduler.resume()
+    assert running_scheduler.trigger()
+    assert running_scheduler.checked.wait(2)
+
+
+def test_settings_changed_reschedules(running_scheduler):
+    """Test that a shorter check interval moves the next check forward."""
+    running_scheduler.settings['check_interval'] = 60
+    assert running_scheduler.settings_changed()
+
+    assert running_scheduler._next_check_time == running_scheduler._last_check_time + timedelta(seconds=60)
+
+
+def test_unknown_command(running_scheduler):
+    """Test that unknown commands are rejected."""
+    with pytest.raises(ValueError):
+        running_scheduler.send_command('restart')
+
+
+def test_stop_wakes_idle_thread(running_scheduler):
+    """Test that stopping does not wait for the next check."""
+    running_scheduler.stop()
+    running_scheduler._thread.join(timeout=1)
+
+    assert not running_scheduler._thread.is_alive()
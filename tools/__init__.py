@@ -0,0 +1,3 @@
+"""
+Development tools for SatSentry.
+"""
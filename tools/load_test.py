@@ -0,0 +1,177 @@
+"""
+End-to-end load test of SatSentry against the synthetic esplora server.
+
+For every watch list size, starts a SyntheticEsploraServer, writes the
+addresses to a temporary data directory and lets the real AddressScheduler run
+check_all_addresses cycles against it. Reports cycle duration, requests per
+cycle, CPU time, RSS and the latency from transaction creation to notification.
+
+Usage:
+    python -m tools.load_test --sizes 1000,10000,100000 --cycles 3 --json results.json
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+from typing import Dict, Any, List
+from unittest.mock import patch
+
+from app.services import address_monitor, metrics
+from app.services.address_schedule import AddressSchedule
+from app.services.chain_info import ChainInfoCache
+from app.services.endpoint_pool import EndpointPool
+from app.services.scheduler import AddressScheduler
+from tools.mock_esplora_server import SyntheticChain, SyntheticEsploraServer, export_addresses
+
+def _rss_mb() -> float:
+    """Current resident set size of the process in MB."""
+    return metrics.get_rss_bytes() / 1024 / 1024
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Nearest-rank percentile, 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percentile), len(ordered) - 1)]
+
+def _write_data_dir(chain: SyntheticChain, server: SyntheticEsploraServer, check_interval: int, adaptive: bool) -> None:
+    """Write the settings and addresses of the run to ./data."""
+    os.makedirs('data', exist_ok=True)
+    settings = {
+        'check_interval': check_interval,
+        'use_self_hosted': True,
+        'node_url': '127.0.0.1',
+        'node_port': server.port,
+        'discord_webhook': '',
+        'adaptive_polling': adaptive
+    }
+    with open('data/settings.json', 'w') as f:
+        json.dump(settings, f)
+    with open('data/extended_public_keys.json', 'w') as f:
+        json.dump({}, f)
+    export_addresses(chain, 'data/single_addresses.json')
+
+def run_scenario(address_count: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the scheduler against a synthetic chain of address_count addresses.
+
+    Args:
+        address_count: Number of watched addresses
+        args: The command line arguments
+
+    Returns:
+        The measurements of the run
+    """
+    chain = SyntheticChain(address_count, args.initial_active, args.seed)
+    server = SyntheticEsploraServer(chain, latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                                    activity_rate=args.activity, block_interval=args.block_interval)
+    cycles: List[Dict[str, Any]] = []
+    latencies: List[float] = []
+    cycles_done = threading.Event()
+
+    from app.services.scheduler import check_all_addresses as real_check_all_addresses
+
+    def measured_check_all_addresses(select=None, order=None, within_budget=None):
+        start, cpu_start, requests_start = time.perf_counter(), time.process_time(), server.request_count
+        results = real_check_all_addresses(select, order, within_budget)
+        cycles.append({
+            'duration': time.perf_counter() - start,
+            'cpu': time.process_time() - cpu_start,
+            'requests': server.request_count - requests_start,
+            'new_transactions': len(results),
+            'rss_mb': _rss_mb()
+        })
+        if len(cycles) >= args.cycles:
+            cycles_done.set()
+        return results
+
+    def record_notifications(results):
+        now = time.time()
+        for result in results:
+            seen_at = chain.first_seen.get(result['latest_tx']['txid'])
+            if seen_at:  # Initial history has no creation time
+                latencies.append(now - seen_at)
+        return len(results)
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, server:
+        os.chdir(workdir)
+        AddressScheduler._instance = None
+        AddressSchedule._instance = None
+        EndpointPool._instance = None
+        ChainInfoCache._instance = None
+        address_monitor._address_stats_cache.clear()
+
+        try:
+            _write_data_dir(chain, server, args.interval, args.adaptive)
+            with patch('app.services.scheduler.check_all_addresses', measured_check_all_addresses), \
+                 patch('app.services.scheduler.send_multiple_transaction_notifications', record_notifications):
+                scheduler = AddressScheduler.get_instance()
+                scheduler.start()
+                cycles_done.wait(args.timeout)
+                scheduler.stop()
+                scheduler._thread.join(timeout=10)
+        finally:
+            os.chdir(original_dir)
+
+    durations = [cycle['duration'] for cycle in cycles]
+    return {
+        'addresses': address_count,
+        'cycles': len(cycles),
+        'cycle_duration_mean': statistics.mean(durations) if durations else 0.0,
+        'cycle_duration_max': max(durations, default=0.0),
+        'requests_per_cycle': statistics.mean(cycle['requests'] for cycle in cycles) if cycles else 0.0,
+        'cpu_per_cycle': statistics.mean(cycle['cpu'] for cycle in cycles) if cycles else 0.0,
+        'rss_mb': max((cycle['rss_mb'] for cycle in cycles), default=_rss_mb()),
+        'rate_limited': server.rate_limited_count,
+        'notifications': len(latencies),
+        'notification_latency_p50': _percentile(latencies, 0.5),
+        'notification_latency_p95': _percentile(latencies, 0.95),
+        'per_cycle': cycles
+    }
+
+def _print_report(reports: List[Dict[str, Any]]) -> None:
+    """Print the measurements as a table."""
+    header = (f"{'addresses':>10} {'cycles':>6} {'cycle s':>9} {'max s':>8} {'req/cycle':>10} "
+              f"{'cpu s':>7} {'rss MB':>7} {'429s':>6} {'notifs':>6} {'lat p50':>8} {'lat p95':>8}")
+    print(header)
+    print('-' * len(header))
+    for r in reports:
+        print(f"{r['addresses']:>10} {r['cycles']:>6} {r['cycle_duration_mean']:>9.2f} {r['cycle_duration_max']:>8.2f} "
+              f"{r['requests_per_cycle']:>10.0f} {r['cpu_per_cycle']:>7.2f} {r['rss_mb']:>7.1f} {r['rate_limited']:>6} "
+              f"{r['notifications']:>6} {r['notification_latency_p50']:>8.2f} {r['notification_latency_p95']:>8.2f}")
+
+def main():
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description="Load test SatSentry against a synthetic esplora server")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="Comma separated watch list sizes")
+    parser.add_argument('--cycles', type=int, default=3, help="Check cycles measured per size")
+    parser.add_argument('--interval', type=int, default=5, help="Scheduler check interval in seconds")
+    parser.add_argument('--timeout', type=float, default=3600, help="Maximum seconds per size")
+    parser.add_argument('--initial-active', type=float, default=0.1, help="Share of addresses with history at start")
+    parser.add_argument('--activity', type=float, default=1.0, help="New transactions per second")
+    parser.add_argument('--block-interval', type=float, default=30, help="Seconds between blocks")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum random extra latency in seconds")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Requests per second before answering 429")
+    parser.add_argument('--adaptive', action='store_true', help="Enable adaptive polling tiers")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="Write the full measurements to this file")
+    args = parser.parse_args()
+
+    reports = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        print(f"Running {args.cycles} cycles with {size} addresses...", flush=True)
+        reports.append(run_scenario(size, args))
+
+    _print_report(reports)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=4)
+
+if __name__ == '__main__':
+    main()
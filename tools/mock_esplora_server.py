@@ -0,0 +1,393 @@
+"""
+Synthetic mempool/esplora API server for load testing SatSentry.
+
+Generates a deterministic set of P2WPKH addresses with some initial history,
+then keeps creating incoming transactions and mining blocks at the configured
+rates. Latency and rate limiting are tunable to mimic a remote instance.
+
+Usage:
+    python -m tools.mock_esplora_server --addresses 10000 --port 3006 \\
+        --export-addresses data/single_addresses.json
+"""
+
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+import bech32
+
+# Page sizes of the esplora API
+CHAIN_TXS_PAGE_SIZE = 25
+BLOCK_TXS_PAGE_SIZE = 25
+MAX_MEMPOOL_TXS = 50
+
+# Address paying all synthetic transactions
+FUNDING_ADDRESS = bech32.encode('bc', 0, hashlib.sha256(b'funding').digest()[:20])
+
+def _hash(*parts: Any) -> str:
+    """Deterministic 32-byte hex identifier."""
+    return hashlib.sha256(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+def _stats(tx_count: int, funded: int) -> Dict[str, int]:
+    """Esplora address stats block for incoming-only history."""
+    return {'funded_txo_count': tx_count, 'funded_txo_sum': funded, 'spent_txo_count': 0,
+            'spent_txo_sum': 0, 'tx_count': tx_count}
+
+class SyntheticChain:
+    """In-memory chain of incoming transactions to a set of generated addresses."""
+
+    def __init__(self, address_count: int, initial_active: float = 0.1, seed: int = 0):
+        """
+        Generate the addresses and their initial history.
+
+        Args:
+            address_count: Number of addresses
+            initial_active: Share of the addresses with confirmed history at start
+            seed: Seed of the generated data
+        """
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seed = seed
+        self._tx_counter = 0
+
+        self.addresses = [
+            bech32.encode('bc', 0, hashlib.sha256(f"{seed}:{index}".encode()).digest()[:20])
+            for index in range(address_count)
+        ]
+        self._address_set = set(self.addresses)
+        self.transactions: Dict[str, Dict[str, Any]] = {}
+        self.confirmed: Dict[str, List[str]] = {}  # Address to confirmed txids, newest first
+        self.unconfirmed: Dict[str, List[str]] = {}  # Address to unconfirmed txids, newest first
+        self.mempool: List[str] = []
+        self.blocks: List[Dict[str, Any]] = []
+        self._blocks_by_id: Dict[str, Dict[str, Any]] = {}
+        self.block_txids: Dict[str, List[str]] = {}
+        self.first_seen: Dict[str, float] = {}  # Txid to the time it was created
+
+        self.mine_block()
+        for address in self._random.sample(self.addresses, int(address_count * initial_active)):
+            for _ in range(self._random.randint(1, 3)):
+                self.create_transaction(address, seen_at=0.0)
+        self.mine_block()
+
+    @property
+    def tip(self) -> Dict[str, Any]:
+        """The latest block."""
+        return self.blocks[-1]
+
+    def create_transaction(self, address: Optional[str] = None, seen_at: Optional[float] = None) -> str:
+        """
+        Create an unconfirmed payment to an address.
+
+        Args:
+            address: The receiving address, random by default
+            seen_at: Creation time reported for latency measurements, now by default
+
+        Returns:
+            The txid
+        """
+        with self._lock:
+            address = address or self._random.choice(self.addresses)
+            self._tx_counter += 1
+            txid = _hash(self._seed, 'tx', self._tx_counter)
+            value = self._random.randint(1_000, 10_000_000)
+            fee = self._random.randint(150, 5_000)
+
+            self.transactions[txid] = {
+                'txid': txid,
+                'version': 2,
+                'locktime': 0,
+                'vin': [{
+                    'txid': _hash(self._seed, 'funding', self._tx_counter),
+                    'vout': 0,
+                    'prevout': {'scriptpubkey_address': FUNDING_ADDRESS, 'value': value + fee},
+                    'is_coinbase': False
+                }],
+                'vout': [{'scriptpubkey_address': address, 'scriptpubkey_type': 'v0_p2wpkh', 'value': value}],
+                'size': 222,
+                'weight': 561,
+                'fee': fee,
+                'fee_rate': fee / 140.25,
+                'status': {'confirmed': False}
+            }
+            self.unconfirmed.setdefault(address, []).insert(0, txid)
+            self.mempool.append(txid)
+            self.first_seen[txid] = time.time() if seen_at is None else seen_at
+            return txid
+
+    def mine_block(self) -> Dict[str, Any]:
+        """Confirm every mempool transaction in a new block."""
+        with self._lock:
+            height = len(self.blocks)
+            block = {
+                'id': _hash(self._seed, 'block', height),
+                'height': height,
+                'timestamp': int(time.time()),
+                'tx_count': len(self.mempool),
+                'previousblockhash': self.blocks[-1]['id'] if self.blocks else None
+            }
+            self.blocks.append(block)
+            self._blocks_by_id[block['id']] = block
+            self.block_txids[block['id']] = list(self.mempool)
+
+            for txid in self.mempool:
+                tx = self.transactions[txid]
+                tx['status'] = {'confirmed': True, 'block_height': height, 'block_hash': block['id'],
+                                'block_time': block['timestamp']}
+                address = tx['vout'][0]['scriptpubkey_address']
+                self.unconfirmed[address].remove(txid)
+                self.confirmed.setdefault(address, []).insert(0, txid)
+            self.mempool = []
+            return block
+
+    def _address_stats(self, address: str) -> Dict[str, Any]:
+        confirmed = self.confirmed.get(address, [])
+        unconfirmed = self.unconfirmed.get(address, [])
+        return {
+            'address': address,
+            'chain_stats': _stats(len(confirmed), sum(self.transactions[t]['vout'][0]['value'] for t in confirmed)),
+            'mempool_stats': _stats(len(unconfirmed), sum(self.transactions[t]['vout'][0]['value'] for t in unconfirmed))
+        }
+
+    def _chain_page(self, address: str, last_seen: Optional[str]) -> List[Dict[str, Any]]:
+        txids = self.confirmed.get(address, [])
+        start = txids.index(last_seen) + 1 if last_seen in txids else 0
+        return [self.transactions[txid] for txid in txids[start:start + CHAIN_TXS_PAGE_SIZE]]
+
+    def resolve(self, path: str) -> Any:
+        """
+        Answer an API path.
+
+        Args:
+            path: The path without the /api prefix
+
+        Returns:
+            The JSON-serializable response, a string for plain text, or None for 404
+        """
+        parts = path.strip('/').split('/')
+        with self._lock:
+            if parts[0] == 'address' and len(parts) >= 2:
+                address = parts[1]
+                if address not in self._address_set:
+                    return None
+                if len(parts) == 2:
+                    return self._address_stats(address)
+                mempool_txs = [self.transactions[t] for t in self.unconfirmed.get(address, [])[:MAX_MEMPOOL_TXS]]
+                if parts[2:] == ['txs']:
+                    return mempool_txs + self._chain_page(address, None)
+                if parts[2:] == ['txs', 'mempool']:
+                    return mempool_txs
+                if parts[2:4] == ['txs', 'chain']:
+                    return self._chain_page(address, parts[4] if len(parts) > 4 else None)
+                return None
+
+            if parts[0] == 'tx' and len(parts) == 2:
+                return self.transactions.get(parts[1])
+
+            if parts[0] == 'blocks' and parts[1:] == ['tip', 'hash']:
+                return self.tip['id']
+            if parts[0] == 'blocks' and parts[1:] == ['tip', 'height']:
+                return str(self.tip['height'])
+
+            if parts[0] == 'block-height' and len(parts) == 2:
+                height = int(parts[1])
+                return self.blocks[height]['id'] if height < len(self.blocks) else None
+
+            if parts[0] == 'block' and len(parts) >= 2:
+                block = self._blocks_by_id.get(parts[1])
+                if block is None:
+                    return None
+                if len(parts) == 2:
+                    return block
+                if parts[2] == 'txs':
+                    start = int(parts[3]) if len(parts) > 3 else 0
+                    return [self.transactions[t] for t in self.block_txids[block['id']][start:start + BLOCK_TXS_PAGE_SIZE]]
+                return None
+
+            if path == '/mempool/recent':
+                return [{'txid': txid, 'fee': self.transactions[txid]['fee'], 'vsize': 141,
+                         'value': self.transactions[txid]['vout'][0]['value']} for txid in self.mempool[-10:][::-1]]
+            if path == '/mempool/txids':
+                return list(self.mempool)
+            if path == '/v1/fees/recommended':
+                return {'fastestFee': 20, 'halfHourFee': 10, 'hourFee': 5, 'economyFee': 2, 'minimumFee': 1}
+
+        return None
+
+class SyntheticEsploraServer:
+    """
+    HTTP server answering esplora API requests from a SyntheticChain.
+
+    Creates `activity_rate` transactions per second and mines a block every
+    `block_interval` seconds while running.
+    """
+
+    def __init__(self, chain: SyntheticChain, port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit: float = 0.0, activity_rate: float = 0.0, block_interval: float = 0.0):
+        """
+        Initialize the server.
+
+        Args:
+            chain: The synthetic chain to serve
+            port: The port to listen on, a free one by default
+            latency: Seconds added to every response
+            jitter: Maximum random seconds added on top of the latency
+            rate_limit: Requests per second above which 429 is answered, unlimited when 0
+            activity_rate: New transactions per second
+            block_interval: Seconds between blocks, no blocks when 0
+        """
+        self.chain = chain
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.activity_rate = activity_rate
+        self.block_interval = block_interval
+        self.request_count = 0
+        self.rate_limited_count = 0
+
+        self._running = False
+        self._lock = threading.Lock()
+        self._tokens = rate_limit
+        self._tokens_at = time.monotonic()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._httpd.daemon_threads = True
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on."""
+        return self._httpd.server_address[1]
+
+    @property
+    def api_url(self) -> str:
+        """Base API URL of the server."""
+        return f"http://127.0.0.1:{self.port}/api"
+
+    def _take_token(self) -> bool:
+        """Take a token from the rate limit bucket."""
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._tokens_at) * self.rate_limit)
+            self._tokens_at = now
+            if self._tokens < 1:
+                self.rate_limited_count += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.request_count += 1
+
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if not self._take_token():
+            request.send_response(429)
+            request.end_headers()
+            return
+
+        path = request.path[len('/api'):] if request.path.startswith('/api') else request.path
+        body = self.chain.resolve(path)
+        if body is None:
+            request.send_response(404)
+            request.end_headers()
+            return
+
+        if isinstance(body, str):
+            payload, content_type = body.encode(), 'text/plain'
+        else:
+            payload, content_type = json.dumps(body).encode(), 'application/json'
+
+        request.send_response(200)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(payload)))
+        request.end_headers()
+        request.wfile.write(payload)
+
+    def _activity_task(self):
+        """Create transactions and mine blocks at the configured rates."""
+        pending = 0.0
+        last_block = time.monotonic()
+        while self._running:
+            time.sleep(0.1)
+            pending += self.activity_rate * 0.1
+            while pending >= 1:
+                self.chain.create_transaction()
+                pending -= 1
+            if self.block_interval and time.monotonic() - last_block >= self.block_interval:
+                self.chain.mine_block()
+                last_block = time.monotonic()
+
+    def start(self) -> None:
+        """Start serving and generating activity in background threads."""
+        self._running = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        threading.Thread(target=self._activity_task, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self._running = False
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def export_addresses(chain: SyntheticChain, path: str) -> None:
+    """Write the chain addresses in the single_addresses.json format."""
+    addresses = {address: {'label': f'Synthetic {index}', 'last_tx': None} for index, address in enumerate(chain.addresses)}
+    with open(path, 'w') as f:
+        json.dump(addresses, f)
+
+def main():
+    """Run the server from the command line."""
+    parser = argparse.ArgumentParser(description="Serve a synthetic esplora API for load testing")
+    parser.add_argument('--addresses', type=int, default=1000, help="Number of generated addresses")
+    parser.add_argument('--initial-active', type=float, default=0.1, help="Share of addresses with history at start")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=3006)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum random extra latency in seconds")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Requests per second before answering 429")
+    parser.add_argument('--activity', type=float, default=0.1, help="New transactions per second")
+    parser.add_argument('--block-interval', type=float, default=600, help="Seconds between blocks")
+    parser.add_argument('--export-addresses', help="Write the addresses to this single_addresses.json file")
+    args = parser.parse_args()
+
+    chain = SyntheticChain(args.addresses, args.initial_active, args.seed)
+    if args.export_addresses:
+        export_addresses(chain, args.export_addresses)
+
+    server = SyntheticEsploraServer(chain, args.port, args.latency, args.jitter, args.rate_limit,
+                                    args.activity, args.block_interval)
+    server.start()
+    print(f"Serving {len(chain.addresses)} synthetic addresses at {server.api_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()